@@ -0,0 +1,113 @@
+"""
+Single-article analysis for News Impact Analyzer
+The interactive path shared by the Streamlit app and its background
+jobs: relevance gate, result cache, near-duplicate reuse, then OpenAI
+requests at INTERACTIVE priority (BACKGROUND for articles the relevance
+classifier deferred). Nothing here touches Streamlit;
+errors are raised for the caller to report.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from cascade import answering_model
+from core import build_messages, is_deferred, is_market_relevant
+from chunking import chunk_text, merge_results
+from client_pool import get_client
+from dedup import get_dedup_index, minhash
+from entity_index import resolve_companies
+from llm_cache import get_result_cache
+from rate_limiter import BACKGROUND, INTERACTIVE
+from structured import request_companies
+from streaming import stream_companies
+from token_accounting import completion_budget, note_model, track_usage
+from environment import CHUNK_CONCURRENCY
+
+def _reused(content):
+    """Cached or near-duplicate analysis of content, plus the dedup signature"""
+    cache = get_result_cache()
+    if cache:
+        cached = cache.get(content)
+        if cached is not None:
+            note_model(cached[1])
+            return cached[0], None
+
+    # Syndicated copies reuse the analysis of their cluster representative
+    dedup = get_dedup_index()
+    signature = minhash(content) if dedup else None
+    if dedup:
+        match = dedup.lookup(signature)
+        if match is not None:
+            note_model(match[2])
+            return match[0], None
+    return None, signature
+
+def _remember(content, signature, companies, usage):
+    model = answering_model(usage.models)
+    cache = get_result_cache()
+    if cache:
+        cache.put(content, companies, model)
+    dedup = get_dedup_index()
+    if dedup:
+        dedup.add(signature, companies, model)
+
+def analyze_content(content, api_key):
+    """Analyze content and return the impacted companies as ImpactRecords
+
+    Raises ValueError for unusable model output and the OpenAI client's
+    exceptions for failed requests.
+    """
+    # Skip articles that mention no listed company or market topic
+    if not is_market_relevant(content):
+        return []
+
+    companies, signature = _reused(content)
+    if companies is not None:
+        return companies
+
+    # Shared client for this key, keeps connections alive between calls
+    client = get_client(api_key)
+    priority = BACKGROUND if is_deferred(content) else INTERACTIVE
+
+    def analyze_chunk(chunk):
+        # Scheduled ahead of batch work, retried on rate limits, repaired if malformed
+        return request_companies(client, build_messages(chunk), priority=priority,
+                                 max_tokens=completion_budget(chunk))
+
+    # Long documents are analyzed chunk by chunk in parallel, then merged
+    chunks = chunk_text(content)
+    with track_usage() as usage:
+        if len(chunks) == 1:
+            companies = analyze_chunk(content)
+        else:
+            # Each chunk runs in a copy of this context so its token usage is attributed here
+            contexts = [contextvars.copy_context() for _ in chunks]
+            with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as pool:
+                companies = merge_results(pool.map(lambda ctx, chunk: ctx.run(analyze_chunk, chunk), contexts, chunks))
+
+    # Canonical names, tickers and industries come from the listing
+    companies = resolve_companies(companies)
+    _remember(content, signature, companies, usage)
+    return companies
+
+def stream_content(content, api_key):
+    """Yield impacted companies one by one as the LLM produces them"""
+
+    # Gated and multi-chunk analyses have nothing to stream
+    if not is_market_relevant(content) or len(chunk_text(content)) > 1:
+        yield from analyze_content(content, api_key)
+        return
+
+    companies, signature = _reused(content)
+    if companies is not None:
+        yield from companies
+        return
+
+    rows = []
+    priority = BACKGROUND if is_deferred(content) else INTERACTIVE
+    with track_usage() as usage:
+        for company in stream_companies(get_client(api_key), content, priority=priority):
+            for row in resolve_companies([company]):
+                rows.append(row)
+                yield row
+
+    _remember(content, signature, resolve_companies(rows), usage)
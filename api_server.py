@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+HTTP API for News Impact Analyzer
+An async FastAPI service for tools that need impact analyses
+programmatically. It uses the same fetch, extraction, caching and LLM
+layers as the Streamlit app; each worker process keeps one engine
+Analyzer per priority lane, so page and OpenAI connections, packing and
+near-duplicate coalescing are shared by all requests to that worker.
+
+Endpoints:
+    GET  /health          Liveness and model
+    GET  /metrics         Prometheus metrics (needs prometheus_client)
+    GET  /cascade         Requests, escalation rate, latency and cost per model tier of this worker
+    GET  /usage           Tokens and cost of this worker, per article and prompt overhead
+    POST /analyze         {"url": ...} or {"content": ...} -> one result
+    POST /analyze/batch   {"urls": [...]} -> all results, in input order
+    POST /analyze/stream  {"urls": [...]} -> server-sent events, one per finished URL
+
+Single analyses run in the rate limiter's interactive lane, batches in
+the batch lane. Results have the same fields as batch_cli.py output
+lines; per-URL failures are reported in "error", never as HTTP errors.
+
+Usage:
+    python api_server.py                        # API_HOST:API_PORT with API_WORKERS processes
+    python api_server.py --port 8080 --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from batch_cli import to_record
+from cascade import get_cascade
+from client_pool import close_async_clients
+from engine import Analyzer
+from metrics import prometheus_text
+from rate_limiter import BATCH, INTERACTIVE
+from token_accounting import get_usage_tracker
+from environment import (
+    API_AUTH_TOKEN,
+    API_HOST,
+    API_MAX_BATCH_URLS,
+    API_PORT,
+    API_WORKERS,
+    APP_VERSION,
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    OPENAI_RPM_LIMIT,
+    OPENAI_TPM_LIMIT,
+    validate_config,
+)
+
+class AnalyzeRequest(BaseModel):
+    url: Optional[str] = None
+    content: Optional[str] = None  # Article text, analyzed without fetching
+    include_content: bool = False
+
+class BatchRequest(BaseModel):
+    urls: List[str]
+    include_content: bool = False
+
+def normalize(url):
+    url = url.strip()
+    return url if url.startswith(('http://', 'https://')) else 'https://' + url
+
+def check_batch(request):
+    urls = [normalize(url) for url in request.urls if url.strip()]
+    if not urls:
+        raise HTTPException(status_code=422, detail="urls must contain at least one URL")
+    if len(urls) > API_MAX_BATCH_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {API_MAX_BATCH_URLS} URLs per request")
+    return urls
+
+async def authorize(authorization: Optional[str] = Header(default=None)):
+    """Require `Authorization: Bearer API_AUTH_TOKEN` when a token is configured"""
+    if API_AUTH_TOKEN and authorization != f"Bearer {API_AUTH_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid or missing API token")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Analyzers are bound to this worker's event loop; single analyses never wait to be packed
+    app.state.interactive = Analyzer(OPENAI_API_KEY, priority=INTERACTIVE, packing=False)
+    app.state.batch = Analyzer(OPENAI_API_KEY, priority=BATCH)
+    try:
+        yield
+    finally:
+        await app.state.interactive.aclose()
+        await app.state.batch.aclose()
+        await close_async_clients()
+
+app = FastAPI(title="News Impact Analyzer API", version=APP_VERSION, lifespan=lifespan)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "model": OPENAI_MODEL}
+
+@app.get("/metrics", dependencies=[Depends(authorize)])
+async def metrics():
+    exposition = prometheus_text()
+    if exposition is None:
+        raise HTTPException(status_code=404, detail="Install prometheus_client to export metrics")
+    body, content_type = exposition
+    return Response(body, media_type=content_type)
+
+@app.get("/cascade", dependencies=[Depends(authorize)])
+async def cascade():
+    tiers = get_cascade()
+    if tiers is None:
+        raise HTTPException(status_code=404, detail="Set CASCADE_MODELS to enable the model cascade")
+    return {"tiers": tiers.stats()}
+
+@app.get("/usage", dependencies=[Depends(authorize)])
+async def usage():
+    return get_usage_tracker().stats()
+
+@app.post("/analyze", dependencies=[Depends(authorize)])
+async def analyze(body: AnalyzeRequest, request: Request):
+    if (body.url is None) == (body.content is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of url or content")
+    analyzer = request.app.state.interactive
+    if body.content is not None:
+        result = await analyzer.analyze_text(body.content)
+    else:
+        result = await analyzer.analyze_url(normalize(body.url))
+    return to_record(result, body.include_content)
+
+@app.post("/analyze/batch", dependencies=[Depends(authorize)])
+async def analyze_batch(body: BatchRequest, request: Request):
+    urls = check_batch(body)
+    results = {}
+    async for result in request.app.state.batch.analyze_many(urls):
+        results[result["url"]] = to_record(result, body.include_content)
+    return {"results": [results[url] for url in urls]}
+
+@app.post("/analyze/stream", dependencies=[Depends(authorize)])
+async def analyze_stream(body: BatchRequest, request: Request):
+    urls = check_batch(body)
+    analyzer = request.app.state.batch
+
+    async def events():
+        count = 0
+        # A disconnecting client cancels this generator and the URLs still in flight
+        async for result in analyzer.analyze_many(urls):
+            count += 1
+            yield f"event: result\ndata: {json.dumps(to_record(result, body.include_content))}\n\n"
+        yield f"event: done\ndata: {json.dumps({'count': count})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve impact analyses over HTTP")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Worker processes")
+    args = parser.parse_args()
+
+    if not validate_config():
+        sys.exit(1)
+
+    # Every worker has its own rate limiter, so each gets a share of the account limits
+    if args.workers > 1:
+        os.environ["OPENAI_RPM_LIMIT"] = str(OPENAI_RPM_LIMIT // args.workers)
+        os.environ["OPENAI_TPM_LIMIT"] = str(OPENAI_TPM_LIMIT // args.workers)
+
+    import uvicorn  # Only the launcher needs it; workers import this module by name
+
+    print(f"🚀 Serving News Impact Analyzer API on http://{args.host}:{args.port} ({args.workers} workers)")
+    uvicorn.run(
+        "api_server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        log_level="warning",
+    )
+
+if __name__ == "__main__":
+    main()
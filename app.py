@@ -1,94 +1,207 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import json
-from openai import OpenAI
-import os
-import re
-import pandas as pd
-from environment import *
+from environment import JOB_POLL_INTERVAL, JOB_WORKERS, LAYOUT, PAGE_ICON, PAGE_TITLE
+from analysis import analyze_content
+from cascade import get_cascade
+from core import extract_text
+from client_pool import validate_api_key
+from dedup import get_dedup_index
+from fetcher import fetch
+from jobs import CANCELLED, DONE, FAILED, QUEUED, JobManager
+from llm_cache import get_result_cache
+from metrics import get_metrics
+from records import to_dicts
+from results_store import get_results_store
+from token_accounting import get_usage_tracker
+
+STATUS_ICONS = {QUEUED: "⏳", "running": "🔄", DONE: "✅", FAILED: "❌", CANCELLED: "🚫"}
 
 def scrape_webpage(url):
     """Scrape content from a webpage"""
     try:
-        headers = {
-            'User-Agent': USER_AGENT
-        }
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text content
-        text = soup.get_text()
-        
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        return text[:MAX_CONTENT_LENGTH]  # Limit content length for API efficiency
+        return extract_text(fetch(url))
     except Exception as e:
         st.error(f"Error scraping webpage: {str(e)}")
         return None
 
 def analyze_content_with_llm(content, api_key):
     """Analyze content using OpenAI to identify impacted Indian companies"""
-    
-    # Create OpenAI client with provided key
-    client = OpenAI(api_key=api_key)
-    
-    prompt = DEFAULT_PROMPT_TEMPLATE.format(content=content)
-    
     try:
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a financial analyst specializing in Indian markets and company analysis."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=OPENAI_MAX_TOKENS,
-            temperature=OPENAI_TEMPERATURE
-        )
-        
-        result = response.choices[0].message.content
-        if result:
-            result = result.strip()
-        
-        # Extract JSON from the response
-        if result:
-            json_match = re.search(r'\[.*\]', result, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
-                st.error("Could not parse LLM response as JSON")
-                return []
-        else:
-            st.error("Empty response from OpenAI API")
-            return []
-            
+        return analyze_content(content, api_key)
+    except ValueError as e:
+        st.error(str(e))
+        return []
     except Exception as e:
         st.error(f"Error calling OpenAI API: {str(e)}")
         return []
 
-def validate_api_key(api_key):
-    """Validate OpenAI API key by making a simple test call"""
-    try:
-        client = OpenAI(api_key=api_key)
-        # Make a minimal test call
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": "Hello"}],
-            max_tokens=5
+@st.cache_resource
+def get_job_manager():
+    """Worker pool shared by all sessions, survives script reruns"""
+    return JobManager()
+
+def job_view(job):
+    """Plain copy of a job for rendering and for session state"""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "label": job.label,
+        "status": job.status,
+        "stage": job.stage,
+        "done": job.done,
+        "total": job.total,
+        "rows": job.snapshot(),
+        "content": job.content,
+        "error": job.error,
+        "usage": job.usage,
+        "elapsed": job.elapsed,
+    }
+
+def render_url_job(view):
+    """Content preview and impacted companies of a single-link job"""
+    if view["content"]:
+        with st.expander("📄 Content Preview"):
+            content = view["content"]
+            st.text(content[:500] + "..." if len(content) > 500 else content)
+    
+    results = to_dicts(view["rows"])
+    if view["status"] == DONE:
+        # Rows for the same company may arrive separately, merge them
+        results = to_dicts(view["result"])
+        if not results:
+            st.info("ℹ️ No relevant Indian companies found in the analyzed content")
+            return
+        st.success(f"✅ Analysis complete! Found {len(results)} impacted companies")
+    
+    usage = view.get("usage")
+    if usage:
+        st.caption(
+            f"🪙 {usage['prompt_tokens']} prompt ({usage.get('content_tokens', 0)} article) + "
+            f"{usage['completion_tokens']} completion tokens · "
+            f"${usage['cost_usd']:.4f}"
         )
-        return True
-    except Exception as e:
-        print(f"API Key validation error: {str(e)}")  # Debug print
-        return False
+    
+    if results:
+        st.dataframe(results, use_container_width=True)
+    
+    if view["status"] == DONE:
+        st.subheader("📋 JSON Output")
+        st.json(results)
+        st.download_button(
+            label="📥 Download Results as JSON",
+            data=json.dumps(results, indent=2),
+            file_name="impact_analysis_results.json",
+            mime="application/json",
+            key=f"download-{view['id']}"
+        )
+
+def render_batch_job(view):
+    """Progress, per-link errors and impacted companies of a batch job"""
+    if view["status"] not in (DONE, FAILED, CANCELLED):
+        st.progress(view["done"] / max(view["total"], 1), text=f"{view['done']} / {view['total']} links")
+    
+    rows = []
+    for result in view["rows"]:
+        if result["error"]:
+            st.error(f"❌ {result['url']}: {result['error']}")
+        for company in result["companies"]:
+            rows.append({"url": result["url"], **company.to_dict()})
+    
+    if rows:
+        if view["status"] == DONE:
+            st.success(f"✅ Batch complete! Found {len(rows)} impacted companies across {view['total']} links")
+        st.dataframe(rows, use_container_width=True)
+    elif view["status"] == DONE:
+        st.info("ℹ️ No relevant Indian companies found in the analyzed links")
+    
+    if view["status"] == DONE:
+        st.download_button(
+            label="📥 Download Batch Results as JSON",
+            data=json.dumps([{**r, "companies": to_dicts(r["companies"])} for r in view["rows"]], indent=2),
+            file_name="batch_impact_analysis_results.json",
+            mime="application/json",
+            key=f"download-{view['id']}"
+        )
+
+def render_latency():
+    """Latency percentiles of each analysis stage and the main counters"""
+    stats = get_metrics().stats()
+    if not stats["stages"]:
+        st.caption("No analyses timed yet")
+        return
+    rows = [
+        {"stage": name, **{key: round(value, 1) for key, value in values.items()}}
+        for name, values in stats["stages"].items()
+    ]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    counters = stats["counters"]
+    st.caption(
+        f"Pages: {counters.get('page_bytes', 0) / 1024:.0f} KB · "
+        f"Cache hits: {counters.get('llm_cache_hits', 0) + counters.get('dedup_hits', 0)} · "
+        f"Retries: {counters.get('llm_retries', 0) + counters.get('repair_requests', 0)}"
+    )
+
+def render_cascade(cascade):
+    """Requests, escalation rate, latency and cost of each model tier"""
+    rows = [
+        {
+            "model": row["model"],
+            "requests": row["requests"],
+            "escalated %": round(row["escalation_rate"] * 100, 1),
+            "p50_ms": round(row["p50_ms"], 1),
+            "p95_ms": round(row["p95_ms"], 1),
+            "cost $": round(row["cost_usd"], 4),
+        }
+        for row in cascade.stats()
+    ]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+def render_jobs():
+    """Every job of this session, newest first
+    
+    Finished jobs are copied into session state, so their results stay
+    after the shared pool has dropped them. Returns True while any job
+    is still queued or running.
+    """
+    manager = get_job_manager()
+    finished = st.session_state.finished_jobs
+    active = False
+    
+    for job_id in reversed(st.session_state.job_ids):
+        view = finished.get(job_id)
+        if view is None:
+            job = manager.get(job_id)
+            if job is None:
+                # Dropped from the pool (e.g. the server restarted) before this session saw it finish
+                finished[job_id] = view = {
+                    "id": job_id, "kind": job_id.split("-")[0], "label": job_id, "status": FAILED,
+                    "stage": "Lost", "done": 0, "total": 0, "rows": [], "content": None,
+                    "error": "This analysis is no longer available, please run it again", "elapsed": 0.0,
+                }
+            elif job.finished:
+                # Checked before taking the view, so the cached view is the final one
+                view = job_view(job)
+                view["result"] = job.result
+                finished[job_id] = view
+            else:
+                view = job_view(job)
+                active = True
+        
+        icon = STATUS_ICONS.get(view["status"], "🔄")
+        title = f"{icon} {view['label']} · {view['stage']}"
+        if view["elapsed"]:
+            title += f" · {view['elapsed']:.1f}s"
+        with st.expander(title, expanded=view["status"] != DONE or job_id == st.session_state.job_ids[-1]):
+            if view["status"] == FAILED:
+                st.error(f"❌ {view['error']}")
+            elif view["status"] == QUEUED:
+                if st.button("🚫 Cancel", key=f"cancel-{job_id}"):
+                    manager.cancel(job_id)
+            if view["kind"] == "url":
+                render_url_job(view)
+            else:
+                render_batch_job(view)
+    return active
 
 def main():
     st.set_page_config(
@@ -102,6 +215,10 @@ def main():
         st.session_state.api_key_validated = False
     if 'api_key' not in st.session_state:
         st.session_state.api_key = ""
+    if 'job_ids' not in st.session_state:
+        st.session_state.job_ids = []
+    if 'finished_jobs' not in st.session_state:
+        st.session_state.finished_jobs = {}
     
     # API Key Input Section
     if not st.session_state.api_key_validated:
@@ -132,12 +249,20 @@ def main():
         
         if submit_button and api_key:
             with st.spinner("🔍 Validating API key..."):
-                if validate_api_key(api_key):
+                try:
+                    valid = validate_api_key(api_key)
+                except ConnectionError as e:
+                    valid = None
+                    st.warning(f"⚠️ {e}. Please check your connection and try again.")
+                except Exception as e:  # Rate limited or an OpenAI outage, not a verdict on the key
+                    valid = None
+                    st.warning(f"⚠️ OpenAI could not validate the API key right now: {e}")
+                if valid:
                     st.session_state.api_key = api_key
                     st.session_state.api_key_validated = True
                     st.success("✅ API key validated successfully!")
                     st.rerun()
-                else:
+                elif valid is False:
                     st.error("❌ Invalid API key. Please check and try again.")
         
         # Show help if no key entered
@@ -158,6 +283,49 @@ def main():
             st.session_state.api_key_validated = False
             st.session_state.api_key = ""
             st.rerun()
+        
+        cache = get_result_cache()
+        if cache:
+            st.header("🗄️ Analysis Cache")
+            cache_stats = cache.stats()
+            st.caption(
+                f"Hits: {cache_stats['hits']} · Misses: {cache_stats['misses']} · "
+                f"Stored: {cache_stats['entries']}"
+            )
+        
+        dedup = get_dedup_index()
+        if dedup:
+            dedup_stats = dedup.stats()
+            st.caption(
+                f"Near-duplicates reused: {dedup_stats['hits']} · "
+                f"Stories indexed: {dedup_stats['entries']}"
+            )
+        
+        usage_stats = get_usage_tracker().stats()
+        if usage_stats["requests"]:
+            st.header("🪙 Token Usage")
+            st.caption(
+                f"Requests: {usage_stats['requests']:.0f} · "
+                f"Tokens: {usage_stats['prompt_tokens'] + usage_stats['completion_tokens']} · "
+                f"Cost: ${usage_stats['cost_usd']:.4f}"
+            )
+            if usage_stats["articles"]:
+                st.caption(
+                    f"Per article: ${usage_stats['cost_per_article']:.5f} · "
+                    f"{usage_stats['prompt_tokens_per_article']:.0f} prompt + "
+                    f"{usage_stats['completion_tokens_per_article']:.0f} completion tokens"
+                )
+                st.caption(
+                    f"Instructions: {usage_stats['overhead_share']:.0%} of prompt tokens · "
+                    f"Cached: {usage_stats['cached_share']:.0%}"
+                )
+        
+        st.header("⚙️ Analysis Jobs")
+        job_stats = get_job_manager().stats()
+        st.caption(
+            f"Running: {job_stats['running']} of {JOB_WORKERS} workers · "
+            f"Queued: {job_stats['queued']}"
+        )
     
     # Input section
     st.header("🔗 Enter Web Link")
@@ -171,52 +339,76 @@ def main():
     if st.button("🚀 Analyze Impact", type="primary"):
         if not url:
             st.warning("Please enter a valid URL")
-            return
+        else:
+            if not url.startswith(('http://', 'https://')):
+                url = 'https://' + url
+            # Runs in the background, the page stays usable meanwhile
+            st.session_state.job_ids.append(get_job_manager().submit_url(url, st.session_state.api_key))
+    
+    # Batch section
+    st.header("🗂️ Batch Analysis")
+    batch_input = st.text_area(
+        "Paste one web link per line:",
+        placeholder="https://example.com/news-article-1\nhttps://example.com/news-article-2",
+        help="All links are fetched and analyzed concurrently"
+    )
+    
+    if st.button("🚀 Analyze All Links"):
+        urls = [line.strip() for line in batch_input.splitlines() if line.strip()]
+        urls = [u if u.startswith(('http://', 'https://')) else 'https://' + u for u in urls]
+        if not urls:
+            st.warning("Please enter at least one valid URL")
+        else:
+            st.session_state.job_ids.append(get_job_manager().submit_batch(urls, st.session_state.api_key))
+    
+    # Results of this session's analyses, refreshed while any is in progress
+    active = any(job_id not in st.session_state.finished_jobs for job_id in st.session_state.job_ids)
+    if st.session_state.job_ids:
+        st.header("📈 Impact Analysis Results")
         
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
+        @st.fragment(run_every=JOB_POLL_INTERVAL if active else None)
+        def jobs_panel():
+            if not render_jobs() and active:
+                st.rerun()  # Last job finished, stop polling and refresh the history
         
-        with st.spinner("🔍 Scraping webpage..."):
-            content = scrape_webpage(url)
+        jobs_panel()
+    
+    # Placed after the job buttons so a job submitted on this run is already counted as active
+    cascade = get_cascade()
+    if get_metrics() or cascade:
+        @st.fragment(run_every=JOB_POLL_INTERVAL if active else None)
+        def performance_panel():
+            if get_metrics():
+                st.header("⏱️ Stage Latency")
+                render_latency()
+            if cascade:
+                st.header("🪜 Model Cascade")
+                render_cascade(cascade)
         
-        if content:
-            st.success("✅ Webpage content retrieved successfully!")
-            
-            # Display content preview
-            with st.expander("📄 Content Preview"):
-                st.text(content[:500] + "..." if len(content) > 500 else content)
-            
-            with st.spinner("🤖 Analyzing content with AI..."):
-                results = analyze_content_with_llm(content, st.session_state.api_key)
-            
-            if results:
-                st.success(f"✅ Analysis complete! Found {len(results)} impacted companies")
-                
-                # Display results
-                st.header("📈 Impact Analysis Results")
-                
-                # Create a DataFrame for better display
-                df = pd.DataFrame(results)
-                
-                # Display as table
-                st.dataframe(df, use_container_width=True)
-                
-                # Display JSON
-                st.subheader("📋 JSON Output")
-                st.json(results)
-                
-                # Download button
-                st.download_button(
-                    label="📥 Download Results as JSON",
-                    data=json.dumps(results, indent=2),
-                    file_name="impact_analysis_results.json",
-                    mime="application/json"
-                )
-                
-            else:
-                st.info("ℹ️ No relevant Indian companies found in the analyzed content")
+        with st.sidebar:
+            performance_panel()
+    
+    # Trends across every stored analysis
+    store = get_results_store()
+    if store and store.stats()["analyses"]:
+        st.header("📉 Impact History")
+        dimension = st.radio("Track:", ["company", "industry"], horizontal=True, format_func=str.title)
+        
+        st.subheader("🔥 Top Movers (last 7 days vs previous 30)")
+        movers = store.top_movers(dimension, days=7, baseline_days=30)
+        if movers.empty:
+            st.info("ℹ️ Not enough recent analyses to compare yet")
         else:
-            st.error("❌ Failed to retrieve webpage content")
+            st.dataframe(movers.round(2), use_container_width=True, hide_index=True)
+        
+        selected = st.multiselect(
+            f"Chart average impact per {dimension}:",
+            store.names(dimension),
+            default=movers["name"].head(3).tolist(),
+            help="Daily net impact score, averaged over a rolling 7-day window"
+        )
+        if selected:
+            st.line_chart(store.time_series(dimension, selected, window=7))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
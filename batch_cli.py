@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Headless batch analysis for News Impact Analyzer
+Reads URLs from a file or stdin and writes one JSON line per article.
+
+Every finished URL is recorded in a journal file. Re-running the same
+command after a crash or Ctrl+C skips journaled URLs, so completed
+articles are neither fetched nor billed again. Failed URLs are not
+journaled and are retried on the next run.
+
+Uses the same fetch, extraction, caching and LLM layers as the
+Streamlit app and reads its settings from environment.py / .env.
+
+Usage:
+    python batch_cli.py urls.txt -o results.jsonl
+    cat urls.txt | python batch_cli.py - -o results.jsonl --concurrency 16 --rate 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from engine import analyze_many
+from client_pool import close_async_clients
+from records import to_dicts
+from environment import FETCH_CONCURRENCY, LLM_CONCURRENCY, OPENAI_API_KEY
+
+PROGRESS_EVERY = 100  # Print a progress line every N articles
+
+def read_urls(source):
+    """Yield unique URLs from a file object, skipping blanks and comments"""
+    seen = set()
+    for line in source:
+        url = line.strip()
+        if not url or url.startswith('#'):
+            continue
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        if url not in seen:
+            seen.add(url)
+            yield url
+
+def load_journal(path):
+    """URLs already completed by a previous run"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["url"])
+            except (ValueError, KeyError):
+                continue  # Torn last line from a killed run
+    return done
+
+def to_record(result, include_content=False):
+    """Output JSON line for one engine result"""
+    record = {
+        "url": result["url"],
+        "analyzed_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "model": result["model"],
+        "companies": to_dicts(result["companies"]),
+        "cached": result["cached"],
+        "deduplicated": result["deduplicated"],
+        "skipped": result["skipped"],
+        "error": result["error"],
+        "usage": result["usage"],
+    }
+    if include_content:
+        record["content"] = result["content"]
+    return record
+
+async def run_batch(urls, output, journal, api_key, concurrency, fetch_concurrency, rate, include_content):
+    """Analyze urls, appending results and journal entries as they finish"""
+    counts = {"done": 0, "failed": 0}
+    started = time.time()
+    try:
+        async for result in analyze_many(urls, api_key, fetch_concurrency=fetch_concurrency,
+                                         llm_concurrency=concurrency, rate=rate):
+            output.write(json.dumps(to_record(result, include_content), ensure_ascii=False) + '\n')
+            output.flush()
+
+            # Journal only after the result line is written, so a crash in
+            # between re-runs the URL (the LLM result cache avoids re-billing)
+            if result["error"]:
+                counts["failed"] += 1
+            else:
+                counts["done"] += 1
+                journal.write(json.dumps({"url": result["url"], "at": time.time()}) + '\n')
+                journal.flush()
+
+            finished = counts["done"] + counts["failed"]
+            if finished % PROGRESS_EVERY == 0:
+                rate_now = finished / (time.time() - started)
+                print(f"⏳ {finished} articles ({counts['failed']} failed, {rate_now:.1f}/s)", file=sys.stderr)
+    finally:
+        await close_async_clients()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze news URLs without the Streamlit UI")
+    parser.add_argument("input", nargs="?", default="-", help="File with one URL per line, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (appended), or - for stdout")
+    parser.add_argument("--journal", help="Journal of completed URLs (default: <output>.journal)")
+    parser.add_argument("--concurrency", type=int, default=LLM_CONCURRENCY, help="Simultaneous OpenAI requests")
+    parser.add_argument("--fetch-concurrency", type=int, default=FETCH_CONCURRENCY, help="Simultaneous page downloads")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum articles started per second")
+    parser.add_argument("--api-key", default=OPENAI_API_KEY, help="OpenAI API key (default: OPENAI_API_KEY)")
+    parser.add_argument("--include-content", action="store_true", help="Include extracted article text in the output")
+    args = parser.parse_args()
+
+    if args.api_key == "your_openai_api_key_here":
+        print("❌ OpenAI API key not configured. Set OPENAI_API_KEY or pass --api-key", file=sys.stderr)
+        sys.exit(1)
+
+    journal_path = args.journal or ("batch.journal" if args.output == "-" else args.output + ".journal")
+    done = load_journal(journal_path)
+    if done:
+        print(f"↩️  Resuming: {len(done)} URLs already completed", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output == "-" else open(args.output, 'a', encoding='utf-8')
+    urls = (url for url in read_urls(source) if url not in done)
+
+    try:
+        with open(journal_path, 'a', encoding='utf-8') as journal:
+            counts = asyncio.run(run_batch(
+                urls, output, journal, args.api_key, args.concurrency,
+                args.fetch_concurrency, args.rate, args.include_content
+            ))
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted. Re-run the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"✅ Finished: {counts['done']} analyzed, {counts['failed']} failed", file=sys.stderr)
+    if counts["failed"]:
+        print("   Re-run the same command to retry failed URLs", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Offline load test for the HTTP API (api_server.py)
+Starts the API server with its OpenAI and page traffic pointed at the
+local stand-in servers, then drives it with concurrent clients and
+reports latency percentiles and throughput per endpoint. Caches and
+client-side rate limits are disabled so every request reaches the mock
+LLM as soon as the server sends it.
+
+Scenarios:
+- analyze:  POST /analyze, one URL per request, `--concurrency` clients
+- batch:    POST /analyze/batch with the whole corpus per request
+- stream:   POST /analyze/stream, time to first event and to completion
+
+Usage:
+    python benchmarks/api_load.py
+    python benchmarks/api_load.py --requests 500 --concurrency 64 --workers 4 --llm-latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from servers import CorpusServer, MockOpenAIServer
+from run_benchmarks import CORPUS_DIR, packing_counts, print_report, summarize
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_api(port, workers, llm_url):
+    """Launch api_server.py against the mock LLM and wait until it answers"""
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="sk-benchmark",
+        OPENAI_BASE_URL=llm_url,
+        LLM_CACHE_ENABLED="false",
+        HTTP_CACHE_ENABLED="false",
+        DEDUP_ENABLED="false",
+        RESULTS_STORE_ENABLED="false",
+        OPENAI_RPM_LIMIT="0",  # The mock has no account limits to respect
+        OPENAI_TPM_LIMIT="0",
+        API_AUTH_TOKEN="",
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, "api_server.py"), "--port", str(port), "--workers", str(workers)],
+        env=env,
+        cwd=ROOT_DIR,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not start")
+
+async def load_analyze(base_url, urls, requests, concurrency):
+    """Latency samples of POST /analyze from `concurrency` parallel clients"""
+    samples, errors = [], []
+    queue = iter(range(requests))
+
+    async def client_loop(client):
+        for index in queue:
+            start = time.perf_counter()
+            response = await client.post("/analyze", json={"url": urls[index % len(urls)]})
+            samples.append(time.perf_counter() - start)
+            if response.status_code != 200 or response.json()["error"]:
+                errors.append(response.text[:200])
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return samples, elapsed, errors
+
+async def load_batch(base_url, urls, rounds):
+    """Latency samples of POST /analyze/batch, one corpus per request"""
+    samples = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            response = await client.post("/analyze/batch", json={"urls": urls})
+            response.raise_for_status()
+            samples.append(time.perf_counter() - start)
+    return samples
+
+async def load_stream(base_url, urls, rounds):
+    """Time to first SSE result and to the final event of POST /analyze/stream"""
+    first, total = [], []
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            seen_first = False
+            async with client.stream("POST", "/analyze/stream", json={"urls": urls}) as response:
+                async for line in response.aiter_lines():
+                    if line == "event: result" and not seen_first:
+                        first.append(time.perf_counter() - start)
+                        seen_first = True
+            total.append(time.perf_counter() - start)
+    return first, total
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the HTTP API")
+    parser.add_argument("--requests", type=int, default=200, help="POST /analyze requests")
+    parser.add_argument("--concurrency", type=int, default=32, help="Parallel clients")
+    parser.add_argument("--workers", type=int, default=2, help="API worker processes")
+    parser.add_argument("--rounds", type=int, default=5, help="Batch and stream requests")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Mock OpenAI latency in seconds")
+    args = parser.parse_args()
+
+    print("🧪 News Impact Analyzer API load test")
+    print(f"   {args.workers} workers, {args.concurrency} clients, mock LLM latency: {args.llm_latency * 1000:.0f} ms\n")
+
+    with CorpusServer(CORPUS_DIR) as pages, MockOpenAIServer(latency=args.llm_latency) as llm:
+        port = free_port()
+        api = start_api(port, args.workers, llm.base_url)
+        base_url = f"http://127.0.0.1:{port}"
+        urls = pages.urls()
+        try:
+            results = {}
+            asyncio.run(load_analyze(base_url, urls, args.concurrency, args.concurrency))  # Warm-up
+            packing = packing_counts(llm)
+            samples, elapsed, errors = asyncio.run(load_analyze(base_url, urls, args.requests, args.concurrency))
+            if errors:
+                print(f"⚠️  {len(errors)} /analyze errors, first: {errors[0]}")
+            results["analyze"] = summarize(samples, 0)
+            results["analyze"]["throughput_per_s"] = len(samples) / elapsed
+            results["analyze"].update(packing_counts(llm, packing))
+
+            packing = packing_counts(llm)
+            samples = asyncio.run(load_batch(base_url, urls, args.rounds))
+            results["batch"] = summarize(samples, 0)
+            results["batch"].update(packing_counts(llm, packing))
+
+            packing = packing_counts(llm)
+            first, total = asyncio.run(load_stream(base_url, urls, args.rounds))
+            results["stream_first"] = summarize(first, 0)
+            results["stream_total"] = summarize(total, 0)
+            results["stream_total"].update(packing_counts(llm, packing))
+        finally:
+            api.terminate()
+            api.wait(timeout=10)
+
+    print_report(results)
+
+if __name__ == "__main__":
+    main()
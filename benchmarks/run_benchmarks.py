@@ -0,0 +1,236 @@
+"""
+Offline per-stage benchmarks for News Impact Analyzer
+Runs the real scraping and analysis code against the bundled corpus, a
+local HTTP server and a mock OpenAI server, so numbers are reproducible
+and no internet access or API key is needed.
+
+Stages timed separately:
+- fetch:            full page download through fetcher.fetch
+- fetch_304:        conditional re-fetch answered with 304 Not Modified
+- extract:          article extraction in scrape_webpage (core.extract_text)
+- prompt_build:     core.build_messages
+- llm_round_trip:   chat completion request to the mock server
+- json_decode:      core.parse_llm_response
+- end_to_end:       engine.run_analyze_many over the whole corpus, with
+                    the packed requests and fallbacks it caused
+- import_<module>:  cold import of each entry point in a fresh interpreter
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from servers import CorpusServer, MockOpenAIServer
+
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+COMPARED_METRICS = ("p50_ms", "p95_ms")
+ENTRY_MODULES = ("environment", "core", "engine", "batch_cli", "feed_poller", "jobs", "api_server", "app")
+IMPORT_TIMER = "import importlib, sys, time; start = time.perf_counter(); importlib.import_module(sys.argv[1]); print(time.perf_counter() - start)"
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def summarize(samples, peak_bytes, items=None):
+    """Latency percentiles, throughput and peak memory for one stage"""
+    total = sum(samples)
+    count = items if items is not None else len(samples)
+    return {
+        "count": count,
+        "throughput_per_s": count / total if total else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "peak_kb": peak_bytes / 1024,
+    }
+
+def packing_counts(llm, before=None):
+    """Packed requests, their articles and fallbacks the mock LLM answered since `before`"""
+    counts = {
+        "packed_requests": llm.packed_requests,
+        "packed_articles": llm.packed_articles,
+        "pack_fallbacks": llm.pack_fallbacks,
+    }
+    if before:
+        counts = {name: value - before[name] for name, value in counts.items()}
+    return counts
+
+def measure(func, inputs, iterations):
+    """Time func over inputs, then measure peak memory in a separate pass"""
+    samples = []
+    for _ in range(iterations):
+        for item in inputs:
+            start = time.perf_counter()
+            func(item)
+            samples.append(time.perf_counter() - start)
+
+    # tracemalloc slows everything down, so it gets its own pass
+    tracemalloc.start()
+    for item in inputs:
+        func(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(samples, peak)
+
+def measure_import(module, runs):
+    """Cold import time of module, each run in a new interpreter"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_TIMER, module],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.split()[-1]))
+    return summarize(samples, 0)
+
+def run(iterations, llm_latency):
+    """Run every stage and return {stage: stats}"""
+    results = {}
+    with CorpusServer(CORPUS_DIR) as pages, MockOpenAIServer(latency=llm_latency) as llm:
+        # Settings are read at import time, so point them at the stand-ins first
+        cache_dir = tempfile.mkdtemp(prefix="nia-bench-")
+        os.environ["OPENAI_BASE_URL"] = llm.base_url
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+        os.environ["HTTP_CACHE_ENABLED"] = "false"
+        os.environ["DEDUP_ENABLED"] = "false"
+        os.environ["RESULTS_STORE_ENABLED"] = "false"
+
+        import core
+        import engine
+        from client_pool import get_client
+        from fetcher import HTTPCache, fetch
+
+        urls = pages.urls()
+        htmls = [fetch(url) for url in urls]
+        contents = [core.extract_text(html) for html in htmls]
+        client = get_client("sk-benchmark")
+
+        def llm_call(content):
+            response = client.chat.completions.create(messages=core.build_messages(content), **core.completion_kwargs())
+            return response.choices[0].message.content
+
+        completions = [llm_call(content) for content in contents]
+
+        http_cache = HTTPCache(os.path.join(cache_dir, "pages.sqlite3"))
+        for url in urls:
+            fetch(url, cache=http_cache)
+
+        results["fetch"] = measure(fetch, urls, iterations)
+        results["fetch_304"] = measure(lambda url: fetch(url, cache=http_cache), urls, iterations)
+        results["extract"] = measure(core.extract_text, htmls, iterations)
+        results["prompt_build"] = measure(core.build_messages, contents, iterations)
+        results["llm_round_trip"] = measure(llm_call, contents, max(1, iterations // 10))
+        results["json_decode"] = measure(core.parse_llm_response, completions, iterations)
+
+        # Warm up lazily built state (gazetteer, clients) before timing
+        engine.run_analyze_many(urls, "sk-benchmark")
+        batch = urls * max(1, iterations)
+        packing = packing_counts(llm)
+        start = time.perf_counter()
+        batch_results = engine.run_analyze_many(batch, "sk-benchmark")
+        elapsed = time.perf_counter() - start
+        packing = packing_counts(llm, packing)
+        errors = [r["error"] for r in batch_results if r["error"]]
+        if errors:
+            print(f"⚠️  {len(errors)} end-to-end errors, first: {errors[0]}")
+
+        tracemalloc.start()
+        engine.run_analyze_many(batch, "sk-benchmark")
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        # One wall-clock sample for the whole batch, reported per article
+        per_item = elapsed / len(batch)
+        results["end_to_end"] = summarize([elapsed], peak, items=len(batch))
+        results["end_to_end"].update(p50_ms=per_item * 1000, p95_ms=per_item * 1000, p99_ms=per_item * 1000)
+        results["end_to_end"].update(packing)
+
+    # Start-up cost of the CLIs, workers and app, without cached modules
+    for module in ENTRY_MODULES:
+        results[f"import_{module}"] = measure_import(module, max(1, iterations // 4))
+    return results
+
+def print_report(results):
+    print(f"{'stage':<22}{'count':>8}{'items/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KB':>10}")
+    print("-" * 82)
+    for stage, stats in results.items():
+        print(
+            f"{stage:<22}{stats['count']:>8}{stats['throughput_per_s']:>12.1f}{stats['p50_ms']:>10.2f}"
+            f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['peak_kb']:>10.0f}"
+        )
+    for stage, stats in results.items():
+        if "packed_requests" in stats:
+            print(
+                f"📦 {stage}: {stats['packed_requests']} packed requests ({stats['packed_articles']} articles), "
+                f"{stats['pack_fallbacks']} fallbacks"
+            )
+
+def compare(results, baseline, tolerance):
+    """Print regressions against a saved baseline, return True if any"""
+    regressed = False
+    for stage, stats in results.items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            if base[metric] and stats[metric] > base[metric] * (1 + tolerance):
+                change = (stats[metric] / base[metric] - 1) * 100
+                print(f"❌ {stage} {metric}: {base[metric]:.2f} -> {stats[metric]:.2f} (+{change:.0f}%)")
+                regressed = True
+    if not regressed:
+        print(f"✅ No regressions beyond {tolerance:.0%} against baseline")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline per-stage benchmarks")
+    parser.add_argument("--iterations", type=int, default=20, help="Passes over the corpus per stage")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Mock OpenAI latency in seconds")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    print("🧪 News Impact Analyzer benchmarks")
+    print(f"   Iterations: {args.iterations}, mock LLM latency: {args.llm_latency * 1000:.0f} ms\n")
+    results = run(args.iterations, args.llm_latency)
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "iterations": args.iterations,
+                "llm_latency": args.llm_latency,
+                "stages": results,
+            }, f, indent=2)
+        print(f"\n📤 Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Local stand-in servers for offline benchmarks
+- CorpusServer serves the saved news pages with ETag support
+- MockOpenAIServer speaks enough of the OpenAI chat completions API
+  (plain and streamed) to exercise the real client code paths, and
+  answers packed requests (see packing.py) with one entry per article id
+
+Both run on 127.0.0.1 in a background thread:
+
+    with CorpusServer("benchmarks/corpus") as pages, MockOpenAIServer(latency=0.2) as llm:
+        fetch(pages.url("economictimes_rbi_policy.html"))
+        OpenAI(api_key="sk-mock", base_url=llm.base_url)
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = [
+    {
+        "company name": "Tata Motors",
+        "impact type": "positive",
+        "company industry": "Automotive",
+        "impact score": 7,
+        "listed": "Y"
+    },
+    {
+        "company name": "Maruti Suzuki",
+        "impact type": "positive",
+        "company industry": "Automotive",
+        "impact score": 6,
+        "listed": "Y"
+    }
+]
+
+_PACKED_ARTICLE = re.compile(r'<article id="(A\d+)">')
+
+def packed_article_ids(request):
+    """Article ids of a packed request, or [] for a single-article one"""
+    ids = []
+    for message in request.get("messages", []):
+        if message.get("role") == "user" and isinstance(message.get("content"), str):
+            ids.extend(_PACKED_ARTICLE.findall(message["content"]))
+    return ids
+
+def default_reply(request):
+    """DEFAULT_REPLY, as an {"A1": [...], ...} object for packed requests"""
+    ids = packed_article_ids(request)
+    if ids:
+        return {article_id: DEFAULT_REPLY for article_id in ids}
+    return DEFAULT_REPLY
+
+def _unanswered(ids, content):
+    """Article ids the packer has to analyze again on their own"""
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return len(ids)
+    if not isinstance(payload, dict):
+        return len(ids)
+    return sum(1 for article_id in ids if not isinstance(payload.get(article_id), list))
+
+class _Server:
+    """Threaded HTTP server lifecycle shared by both stand-ins"""
+
+    handler = None
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), self.handler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; without this, Nagle
+        # plus delayed ACKs adds ~40 ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+class _CorpusHandler(_Handler):
+
+    def do_GET(self):
+        owner = self.server.owner
+        owner.requests += 1
+        if owner.latency:
+            time.sleep(owner.latency)
+
+        name = os.path.basename(self.path.split('?')[0])
+        page = owner.pages.get(name)
+        if page is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body, etag = page
+        if self.headers.get('If-None-Match') == etag:
+            owner.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class CorpusServer(_Server):
+    """Serves every .html file in corpus_dir, optionally with added latency"""
+
+    handler = _CorpusHandler
+
+    def __init__(self, corpus_dir, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.pages = {}
+        for name in sorted(os.listdir(corpus_dir)):
+            if name.endswith('.html'):
+                with open(os.path.join(corpus_dir, name), 'rb') as f:
+                    body = f.read()
+                self.pages[name] = (body, '"%s"' % hashlib.md5(body).hexdigest())
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.port}/{name}"
+
+    def urls(self):
+        return [self.url(name) for name in self.pages]
+
+class _OpenAIHandler(_Handler):
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        owner = self.server.owner
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        with owner.lock:
+            owner.requests += 1
+            request_number = owner.requests
+            owner.received.append(request)
+
+        if owner.rate_limit_every and request_number % owner.rate_limit_every == 0:
+            owner.rate_limited += 1
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"Retry-After": str(owner.retry_after)}
+            )
+            return
+
+        if owner.latency:
+            time.sleep(owner.latency + random.uniform(0, owner.jitter))
+
+        content = owner.reply(request) if callable(owner.reply) else owner.reply
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        model = request.get("model", "gpt-3.5-turbo")
+
+        ids = packed_article_ids(request)
+        if ids:
+            with owner.lock:
+                owner.packed_requests += 1
+                owner.packed_articles += len(ids)
+                owner.pack_fallbacks += _unanswered(ids, content)
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            self._stream(model, content, usage if include_usage else None)
+            return
+
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{request_number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, model, content, usage=None):
+        """Send content as server-sent chat.completion.chunk events
+
+        With usage (stream_options include_usage), a last chunk with no
+        choices carries it, as the OpenAI API sends it.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        step = self.server.owner.stream_chunk_chars
+        for start in range(0, len(content), step):
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}],
+            }
+            self.wfile.write(b"data: " + json.dumps(chunk).encode('utf-8') + b"\n\n")
+            self.wfile.flush()
+        if usage is not None:
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+            self.wfile.write(b"data: " + json.dumps(chunk).encode('utf-8') + b"\n\n")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+class MockOpenAIServer(_Server):
+    """OpenAI-compatible chat completions endpoint with configurable behaviour
+
+    latency/jitter: seconds added to each completion
+    reply: completion text, a JSON-serialisable object, or a callable
+           taking the request body and returning either
+           (default_reply when None)
+    rate_limit_every: answer every Nth request with 429 and Retry-After
+
+    packed_requests/packed_articles count the packed requests answered,
+    pack_fallbacks the articles their replies left out.
+    """
+
+    handler = _OpenAIHandler
+
+    def __init__(self, latency=0.0, jitter=0.0, reply=None, rate_limit_every=0, retry_after=1,
+                 stream_chunk_chars=16):
+        self.latency = latency
+        self.jitter = jitter
+        self.reply = default_reply if reply is None else reply
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.stream_chunk_chars = stream_chunk_chars
+        self.requests = 0
+        self.rate_limited = 0
+        self.packed_requests = 0
+        self.packed_articles = 0
+        self.pack_fallbacks = 0
+        self.received = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
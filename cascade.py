@@ -0,0 +1,141 @@
+"""
+Model cascade for News Impact Analyzer
+With CASCADE_MODELS set (cheapest first), every analysis request goes to
+the first model and only moves up a tier when its answer is doubtful:
+
+- malformed: not valid JSON, or entries that fail ImpactRecord
+  validation (cheap tiers are not asked to repair, the next tier answers)
+- high_impact: a company scored CASCADE_ESCALATE_SCORE or more
+- conflict: the same company named with more than one impact type
+- many_companies: more than CASCADE_ESCALATE_COMPANIES companies
+
+The last tier's answer is always kept, repaired if needed. Each tier's
+requests, escalations, latency and cost are tracked, so the cascade's
+savings can be checked against what it gives up.
+
+Streamed answers are shown as they arrive and cannot be taken back, so
+streaming uses OPENAI_MODEL; packed requests go to the first tier and
+doubtful articles are escalated one by one. The model that answered an
+article is the strongest one its usage scope saw (answering_model).
+"""
+
+import threading
+from collections import deque
+from metrics import count, percentile
+from records import decode_companies
+from environment import (
+    CASCADE_ESCALATE_COMPANIES,
+    CASCADE_ESCALATE_CONFLICTS,
+    CASCADE_ESCALATE_SCORE,
+    CASCADE_MODELS,
+    METRICS_WINDOW,
+    OPENAI_MODEL,
+)
+
+def escalation_reason(records):
+    """Why a cheaper tier's validated records need a stronger model, or None"""
+    if any(record.impact_score >= CASCADE_ESCALATE_SCORE for record in records):
+        return "high_impact"
+    if CASCADE_ESCALATE_CONFLICTS:
+        types = {}
+        for record in records:
+            types.setdefault(record.company_name.strip().lower(), set()).add(record.impact_type)
+        if any(len(seen) > 1 for seen in types.values()):
+            return "conflict"
+    if len(records) > CASCADE_ESCALATE_COMPANIES:
+        return "many_companies"
+    return None
+
+def review(text):
+    """(records, escalation reason) of a cheaper tier's completion
+
+    Malformed output is not repaired here; the next tier answers instead.
+    """
+    try:
+        records, rejected = decode_companies(text)
+    except ValueError:
+        return None, "malformed"
+    if rejected:
+        return None, "malformed"
+    return records, escalation_reason(records)
+
+def answering_model(models):
+    """Model whose answer an analysis kept, from its Usage.models
+
+    Tiers are only tried cheapest first, so the answer kept is the
+    strongest tier's. A model outside the cascade (OPENAI_MODEL for
+    streamed answers) counts as stronger than every tier.
+    """
+    if not models:
+        return OPENAI_MODEL
+    return max(models, key=lambda model: CASCADE_MODELS.index(model) if model in CASCADE_MODELS else len(CASCADE_MODELS))
+
+class _Tier:
+    __slots__ = ("model", "requests", "escalations", "reasons", "cost", "latencies")
+
+    def __init__(self, model, window):
+        self.model = model
+        self.requests = 0
+        self.escalations = 0
+        self.reasons = {}
+        self.cost = 0.0
+        self.latencies = deque(maxlen=window)
+
+class Cascade:
+    """Models tried in order, and what each tier did"""
+
+    def __init__(self, models=CASCADE_MODELS, window=METRICS_WINDOW):
+        self.models = tuple(models)
+        self._tiers = [_Tier(model, window) for model in self.models]
+        self._lock = threading.Lock()
+
+    def tiers(self):
+        """(tier, model, is last tier) in escalation order"""
+        last = len(self.models) - 1
+        return [(tier, model, tier == last) for tier, model in enumerate(self.models)]
+
+    def record(self, tier, seconds, cost, reason=None):
+        """One request answered by tier, escalated for reason unless None"""
+        with self._lock:
+            stats = self._tiers[tier]
+            stats.requests += 1
+            stats.cost += cost
+            stats.latencies.append(seconds)
+            if reason is not None:
+                stats.escalations += 1
+                stats.reasons[reason] = stats.reasons.get(reason, 0) + 1
+        if reason is not None:
+            count("cascade_escalations")
+            count(f"cascade_{reason}")
+
+    def stats(self):
+        """Requests, escalation rate, latency and cost of each tier"""
+        with self._lock:
+            rows = []
+            for tier, stats in enumerate(self._tiers):
+                latencies = list(stats.latencies)
+                rows.append({
+                    "tier": tier,
+                    "model": stats.model,
+                    "requests": stats.requests,
+                    "escalations": stats.escalations,
+                    "escalation_rate": stats.escalations / stats.requests if stats.requests else 0.0,
+                    "reasons": dict(stats.reasons),
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "cost_usd": round(stats.cost, 6),
+                })
+        return rows
+
+_cascade = None
+_cascade_lock = threading.Lock()
+
+def get_cascade():
+    """Process-wide cascade, or None when CASCADE_MODELS is unset"""
+    global _cascade
+    if not CASCADE_MODELS:
+        return None
+    with _cascade_lock:
+        if _cascade is None:
+            _cascade = Cascade()
+    return _cascade
@@ -0,0 +1,124 @@
+"""
+Token-aware chunking and result merging for long articles
+Long documents (budget speeches, RBI policy statements, earnings
+reports) are split on paragraph boundaries into chunks that fit the
+per-request token budget. Each chunk is analyzed separately and the
+per-chunk company lists are merged back into one list.
+"""
+
+import re
+from environment import CHUNK_MAX_TOKENS, OPENAI_MODEL
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4  # Rough average for English news text
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+COMPANY_SUFFIXES = re.compile(r'\b(ltd|limited|inc|corp|corporation|co|company|pvt|private|plc)\b\.?', re.I)
+
+_encoding = None
+
+def _get_encoding():
+    """tiktoken encoding of OPENAI_MODEL, or False when unavailable"""
+    global _encoding
+    if _encoding is None:
+        try:
+            try:
+                _encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+            except KeyError:  # Unknown model name
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # BPE files cannot be downloaded, e.g. offline
+            _encoding = False
+    return _encoding
+
+def count_tokens(text):
+    """Number of tokens in text for the OpenAI chat models"""
+    encoding = _get_encoding() if tiktoken is not None else False
+    if not encoding:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _split_long(paragraph, max_tokens):
+    """Split an oversized paragraph on sentences, then hard-wrap"""
+    pieces = []
+    for sentence in SENTENCE_END.split(paragraph):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        step = max_tokens * CHARS_PER_TOKEN
+        pieces.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+    return pieces
+
+def chunk_text(text, max_tokens=CHUNK_MAX_TOKENS):
+    """Split text into chunks of at most max_tokens, keeping paragraphs whole"""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    units = []
+    for paragraph in text.split('\n\n'):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) > max_tokens:
+            units.extend(_split_long(paragraph, max_tokens))
+        else:
+            units.append(paragraph)
+
+    chunks, current, current_tokens = [], [], 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append('\n\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+def company_key(name):
+    """Normalised company name used to match mentions across chunks"""
+    name = COMPANY_SUFFIXES.sub(' ', name.lower().replace('&', ' and '))
+    return ' '.join(re.sub(r'[^a-z0-9 ]', ' ', name).split())
+
+def _score(company):
+    return company.impact_score
+
+def merge_results(results):
+    """Reduce per-chunk ImpactRecord lists into one deduplicated list
+
+    Mentions of the same company are reconciled by a score-weighted vote
+    on impact type; the reported score is the strongest mention in the
+    winning direction, so a company hit hard in one section of a long
+    report is not diluted by passing mentions elsewhere.
+    """
+    groups = {}
+    for companies in results:
+        for company in companies:
+            name = company.company_name
+            groups.setdefault(company_key(name) or name.lower(), []).append(company)
+
+    merged = []
+    for mentions in groups.values():
+        if len(mentions) == 1:
+            merged.append(mentions[0])
+            continue
+        balance = sum(_score(m) if m.impact_type == "positive" else -_score(m) for m in mentions)
+        if balance:
+            impact_type = "positive" if balance > 0 else "negative"
+        else:
+            impact_type = max(mentions, key=_score).impact_type
+        agreeing = [m for m in mentions if m.impact_type == impact_type] or mentions
+        strongest = max(agreeing, key=_score)
+
+        merged.append(strongest.replace(
+            company_name=max((m.company_name for m in mentions), key=len),
+            impact_type=impact_type,
+            company_industry=next((m.company_industry for m in mentions if m.company_industry), strongest.company_industry),
+            listed="Y" if any(m.listed == "Y" for m in mentions) else strongest.listed,
+        ))
+
+    merged.sort(key=_score, reverse=True)
+    return merged
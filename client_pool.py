@@ -0,0 +1,136 @@
+"""
+Shared OpenAI clients for News Impact Analyzer
+One client per API key for the whole process, each with its own pool of
+keep-alive HTTP connections, instead of a fresh client per request.
+Clients never retry on their own; rate_limiter schedules and retries
+every completion request.
+
+Async clients are bound to the event loop that created them, so they
+are kept per (loop, API key). API key validation uses the zero-token
+models endpoint and remembers the outcome for API_KEY_VALIDATION_TTL.
+
+The openai package takes most of a second to import, so it and httpx
+are loaded when the first client is created rather than with this module.
+"""
+
+import hashlib
+import threading
+import time
+import weakref
+import asyncio
+from metrics import count
+from environment import (
+    API_KEY_VALIDATION_TTL,
+    OPENAI_BASE_URL,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_POOL_MAX_CONNECTIONS,
+    OPENAI_POOL_MAX_KEEPALIVE,
+    OPENAI_REQUEST_TIMEOUT,
+)
+
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()
+_validated = {}  # Key id -> (valid, checked at), oldest first
+MAX_VALIDATED_KEYS = 1024
+_lock = threading.Lock()
+
+def _key_id(api_key):
+    """Registry key that avoids holding raw API keys in dict keys"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+def _limits():
+    """Connection pool limits shared by sync and async clients"""
+    import httpx
+
+    return httpx.Limits(
+        max_connections=OPENAI_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+def get_client(api_key):
+    """Process-wide OpenAI client for api_key"""
+    key_id = _key_id(api_key)
+    with _lock:
+        client = _clients.get(key_id)
+        if client is None:
+            import httpx
+            from openai import OpenAI
+
+            client = OpenAI(
+                api_key=api_key,
+                base_url=OPENAI_BASE_URL,
+                timeout=OPENAI_REQUEST_TIMEOUT,
+                max_retries=0,
+                http_client=httpx.Client(limits=_limits(), timeout=OPENAI_REQUEST_TIMEOUT),
+            )
+            _clients[key_id] = client
+    return client
+
+def get_async_client(api_key):
+    """AsyncOpenAI client for api_key on the running event loop"""
+    loop = asyncio.get_running_loop()
+    key_id = _key_id(api_key)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key_id)
+        if client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=OPENAI_BASE_URL,
+                timeout=OPENAI_REQUEST_TIMEOUT,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=_limits(), timeout=OPENAI_REQUEST_TIMEOUT),
+            )
+            clients[key_id] = client
+    return client
+
+async def close_async_clients():
+    """Close the async clients of the running loop before it shuts down"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.pop(loop, {})
+    for client in clients.values():
+        await client.close()
+
+def validate_api_key(api_key):
+    """Check an API key with the zero-token models endpoint
+
+    Valid and rejected keys are cached for API_KEY_VALIDATION_TTL
+    seconds, at most MAX_VALIDATED_KEYS of them. When OpenAI cannot be
+    reached the key is neither valid nor rejected: ConnectionError is
+    raised and nothing is cached, so a flaky connection does not lock
+    out a good key. Other API errors (429, 5xx) are raised as they are.
+    """
+    key_id = _key_id(api_key)
+    now = time.time()
+    cached = _validated.get(key_id)
+    if cached and now - cached[1] < API_KEY_VALIDATION_TTL:
+        return cached[0]
+
+    import openai
+
+    try:
+        get_client(api_key).models.list()
+        valid = True
+    except (openai.AuthenticationError, openai.PermissionDeniedError):
+        valid = False
+    except (openai.APIConnectionError, openai.APITimeoutError) as e:
+        count("api_key_validation_errors")
+        raise ConnectionError(f"Could not reach OpenAI to validate the API key: {e}") from e
+    except openai.APIError:
+        count("api_key_validation_errors")
+        raise
+
+    with _lock:
+        # Drop expired outcomes, then the oldest ones beyond the bound
+        for stale_id in [k for k, (_, checked) in _validated.items() if now - checked >= API_KEY_VALIDATION_TTL]:
+            del _validated[stale_id]
+        _validated.pop(key_id, None)
+        _validated[key_id] = (valid, now)
+        while len(_validated) > MAX_VALIDATED_KEYS:
+            del _validated[next(iter(_validated))]
+    return valid
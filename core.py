@@ -0,0 +1,116 @@
+"""
+Core scraping and analysis helpers for News Impact Analyzer
+Shared by the Streamlit app, the async engine and command-line tools.
+Nothing in here touches Streamlit, so it is safe to import from scripts.
+"""
+
+from environment import (
+    ANALYSIS_INSTRUCTIONS,
+    DEFAULT_PROMPT_TEMPLATE,
+    GAZETTEER_MAX_HINTS,
+    GAZETTEER_SKIP_IRRELEVANT,
+    MAX_DOCUMENT_LENGTH,
+    OPENAI_MAX_TOKENS,
+    OPENAI_MODEL,
+    OPENAI_TEMPERATURE,
+    RELEVANCE_ACTION,
+    RELEVANCE_THRESHOLD,
+    STRUCTURED_OUTPUT,
+)
+from extractor import extract_paragraphs
+from gazetteer import get_gazetteer
+from metrics import count, stage
+from records import decode_companies, response_format
+
+SYSTEM_PROMPT = "You are a financial analyst specializing in Indian markets and company analysis."
+OBJECT_WRAPPER_INSTRUCTION = 'Wrap the array in a JSON object under the key "companies": {"companies": [...]}\n'
+
+# Identical for every article, so it forms the cacheable prompt prefix.
+# JSON modes return an object, never a bare array.
+ANALYSIS_SYSTEM_PROMPT = SYSTEM_PROMPT + "\n" + ANALYSIS_INSTRUCTIONS + (
+    OBJECT_WRAPPER_INSTRUCTION if STRUCTURED_OUTPUT in ("json_object", "json_schema") else ""
+)
+
+def extract_text(html):
+    """Extract the article text from raw HTML, limited to MAX_DOCUMENT_LENGTH"""
+    text = '\n\n'.join(extract_paragraphs(html))
+    return text[:MAX_DOCUMENT_LENGTH]
+
+def relevance_score(content):
+    """Market-relevance probability from the local classifier, or None without a model"""
+    from relevance import get_relevance_model  # NumPy, loaded with the first article
+
+    model = get_relevance_model()
+    if model is None:
+        return None
+    with stage("relevance"):
+        return model.score(content)
+
+def is_market_relevant(content):
+    """False when the gazetteer finds no listed company or sector keyword,
+    or the classifier scores content below RELEVANCE_THRESHOLD (skip mode)"""
+    gazetteer = get_gazetteer()
+    if gazetteer is not None and GAZETTEER_SKIP_IRRELEVANT and not gazetteer.is_relevant(content):
+        count("irrelevant_skipped")
+        return False
+    if RELEVANCE_ACTION == "skip":
+        score = relevance_score(content)
+        if score is not None and score < RELEVANCE_THRESHOLD:
+            count("classifier_skipped")
+            return False
+    return True
+
+def is_deferred(content):
+    """True when the classifier scores content below RELEVANCE_THRESHOLD (defer mode),
+    so its analysis should wait behind every other request"""
+    if RELEVANCE_ACTION != "defer":
+        return False
+    score = relevance_score(content)
+    deferred = score is not None and score < RELEVANCE_THRESHOLD
+    if deferred:
+        count("classifier_deferred")
+    return deferred
+
+def company_hints(content):
+    """Listed companies the gazetteer found in content"""
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return []
+    return gazetteer.hints(content)[:GAZETTEER_MAX_HINTS]
+
+def build_messages(content):
+    """Build the chat messages for an impact analysis request
+
+    Static instructions come first and the article last, so requests
+    share the longest possible prefix.
+    """
+    with stage("prompt_build"):
+        prompt = DEFAULT_PROMPT_TEMPLATE.format(content=content)
+        hints = company_hints(content)
+        if hints:
+            prompt += "\nListed companies mentioned in the content: " + ", ".join(hints) + "\n"
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def completion_kwargs():
+    """Model parameters shared by every analysis request"""
+    kwargs = {
+        "model": OPENAI_MODEL,
+        "max_tokens": OPENAI_MAX_TOKENS,
+        "temperature": OPENAI_TEMPERATURE,
+    }
+    fmt = response_format()
+    if fmt:
+        kwargs["response_format"] = fmt
+    return kwargs
+
+def parse_llm_response(result):
+    """Parse an LLM completion into validated ImpactRecords
+
+    Entries that fail validation are dropped; use records.decode_companies
+    to see them. Raises ValueError when the completion is empty or
+    contains no company array.
+    """
+    return decode_companies(result)[0]
@@ -0,0 +1,229 @@
+"""
+Near-duplicate detection for News Impact Analyzer
+Syndicated stories (PTI, Reuters, IANS) appear on many sites with small
+edits. Each article gets a MinHash signature of its word shingles, and
+signatures are banded into an LSH index stored in SQLite. An article
+whose estimated Jaccard similarity to an already analyzed one reaches
+DEDUP_THRESHOLD reuses that cluster representative's analysis instead
+of calling OpenAI again.
+
+Only representatives are stored, so the index grows with the number of
+distinct stories, not the number of copies.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from llm_cache import cache_key
+from metrics import count
+from records import dumps, from_dicts, loads, to_dicts
+from environment import (
+    DEDUP_ENABLED,
+    DEDUP_MAX_ENTRIES,
+    DEDUP_PATH,
+    DEDUP_THRESHOLD,
+    DEDUP_TTL,
+    OPENAI_MODEL,
+)
+
+NUM_PERM = 128  # MinHash permutations
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows; candidates from ~0.7 similarity up
+SHINGLE_SIZE = 5  # Words per shingle
+MIN_SHINGLES = 20  # Shorter texts are too noisy to compare
+EVICT_EVERY = 32  # Run eviction on every Nth write
+
+_WORD = re.compile(r'\w+')
+
+SHINGLE_MULT = 0x100000001B3
+_permutations = None
+
+def _hash_family():
+    """(a, b) of the multiply-shift hashes h(x) = ((a * x + b) mod 2^64) >> 32, a odd
+
+    Built on first use, so importing this module does not load NumPy.
+    """
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+
+        rng = np.random.default_rng(0x5EED)
+        a = rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+        b = rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+        _permutations = (a, b)
+    return _permutations
+
+def shingle_hashes(content, size=SHINGLE_SIZE):
+    """Unique 32-bit hashes of the word shingles of content"""
+    import numpy as np
+
+    words = _WORD.findall(content.lower())
+    if len(words) < size:
+        return np.empty(0, dtype=np.uint64)
+    tokens = np.fromiter((zlib.crc32(w.encode('utf-8')) for w in words), dtype=np.uint64, count=len(words))
+
+    # Polynomial combination of `size` consecutive word hashes, vectorized
+    count = len(words) - size + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        combined = combined * np.uint64(SHINGLE_MULT) + tokens[offset:offset + count]
+    return np.unique(combined & np.uint64(0xFFFFFFFF))
+
+def minhash(content):
+    """MinHash signature of content, or None when it is too short"""
+    import numpy as np
+
+    shingles = shingle_hashes(content)
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    a, b = _hash_family()
+    # (NUM_PERM, n) matrix; uint64 arithmetic wraps, which is the "mod 2^64"
+    hashed = (a[:, None] * shingles[None, :] + b[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    import numpy as np
+
+    return float(np.count_nonzero(a == b)) / len(a)
+
+def band_keys(signature):
+    """One LSH bucket key per band"""
+    rows = len(signature) // BANDS
+    return [
+        (band << 32) | zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes())
+        for band in range(BANDS)
+    ]
+
+class NearDuplicateIndex:
+    """SQLite-backed LSH index of analyzed articles and their results
+
+    Entries are tied to the current model/prompt settings, so changing
+    either never serves an analysis produced under the old ones.
+    """
+
+    def __init__(self, path=DEDUP_PATH, threshold=DEDUP_THRESHOLD, ttl=DEDUP_TTL, max_entries=DEDUP_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._settings = cache_key('')
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            " id INTEGER PRIMARY KEY,"
+            " settings TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " companies TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " model TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(articles)")]
+        if "model" not in columns:
+            self._conn.execute("ALTER TABLE articles ADD COLUMN model TEXT")  # NULL: answered by OPENAI_MODEL
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " bucket INTEGER NOT NULL,"
+            " article_id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets(bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_article ON buckets(article_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_created_at ON articles(created_at)")
+
+    def lookup(self, signature):
+        """Return (companies, similarity, model that answered) of the closest stored article, or None"""
+        if signature is None:
+            return None
+        import numpy as np
+
+        keys = band_keys(signature)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.signature, a.companies, a.created_at, a.model FROM articles a"
+                " WHERE a.settings = ? AND a.id IN ("
+                f"  SELECT article_id FROM buckets WHERE bucket IN ({','.join('?' * len(keys))}))",
+                [self._settings, *keys]
+            ).fetchall()
+
+            best = None
+            now = time.time()
+            for blob, companies, created_at, model in rows:
+                if self.ttl and now - created_at > self.ttl:
+                    continue
+                score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (companies, score, model)
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        count("dedup_hits")
+        return from_dicts(loads(best[0])), best[1], best[2] or OPENAI_MODEL
+
+    def add(self, signature, companies, model=OPENAI_MODEL):
+        """Store an analyzed article as a cluster representative"""
+        if signature is None:
+            return
+        with self._lock:
+            article_id = self._conn.execute(
+                "INSERT INTO articles (settings, signature, companies, created_at, model) VALUES (?, ?, ?, ?, ?)",
+                (self._settings, signature.tobytes(), dumps(to_dicts(companies)), time.time(), model)
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT INTO buckets (bucket, article_id) VALUES (?, ?)",
+                [(key, article_id) for key in band_keys(signature)]
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 1:
+                self._evict()
+
+    def _evict(self):
+        """Drop expired articles and trim to max_entries, oldest first"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM articles WHERE created_at < ?", (time.time() - self.ttl,))
+        if self.max_entries:
+            self._conn.execute(
+                "DELETE FROM articles WHERE id IN ("
+                " SELECT id FROM articles ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        self._conn.execute("DELETE FROM buckets WHERE article_id NOT IN (SELECT id FROM articles)")
+
+    def stats(self):
+        """Hit/miss counters for this process plus the stored article count"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_dedup_index():
+    """Process-wide near-duplicate index, or None when disabled"""
+    global _index
+    if not DEDUP_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex()
+    return _index
@@ -0,0 +1,328 @@
+"""
+Async analysis engine for News Impact Analyzer
+Pushes many URLs through fetch and LLM analysis concurrently.
+
+Fetching and LLM calls are separate stages with their own concurrency
+limits, so slow pages never hold back OpenAI requests (and vice versa).
+Results are yielded as soon as each URL finishes, not in input order.
+Short articles share packed requests (see packing.py), and with a model
+cascade (see cascade.py) only doubtful answers reach the stronger models.
+
+Library usage:
+    async for result in analyze_many(urls, api_key):
+        ...
+
+    results = run_analyze_many(urls, api_key)  # from synchronous code
+
+Long-running services keep an Analyzer per event loop instead (see
+api_server.py).
+"""
+
+import asyncio
+import time
+from cascade import answering_model, escalation_reason, get_cascade
+from chunking import chunk_text, merge_results
+from client_pool import close_async_clients, get_async_client
+from dedup import get_dedup_index, minhash, similarity
+from core import extract_text, build_messages, is_deferred, is_market_relevant
+from entity_index import resolve_companies
+from fetcher import fetch_async, get_http_cache
+from llm_cache import get_result_cache
+from packing import ESCALATE, Packer, build_packed_messages, is_packable, packed_max_tokens, packed_request_kwargs, parse_packed_response
+from rate_limiter import BACKGROUND, BATCH, create_completion_async
+from results_store import get_results_store
+from structured import request_companies_async
+from token_accounting import completion_budget, get_usage_tracker, note_model, track_usage
+from environment import (
+    FETCH_CONCURRENCY,
+    LLM_CONCURRENCY,
+    PACKING_ENABLED,
+    REQUEST_TIMEOUT,
+    USER_AGENT,
+)
+
+DEFERRED_SHARE = 0.25  # Requests for deferred articles in flight, as a share of llm_concurrency
+
+def _new_result(url):
+    """Result record yielded for every URL"""
+    return {
+        "url": url,
+        "content": None,
+        "companies": [],
+        "model": None,  # Model whose answer was kept
+        "cached": False,
+        "deduplicated": False,
+        "skipped": False,
+        "error": None,
+        "usage": None,
+    }
+
+async def _analyze_chunk(client, chunk, llm_slots, priority, first_tier=0):
+    """Run a single LLM analysis request, repairing malformed output"""
+    async with llm_slots:
+        return await request_companies_async(
+            client, build_messages(chunk), priority=priority, max_tokens=completion_budget(chunk),
+            first_tier=first_tier
+        )
+
+async def _analyze(client, content, llm_slots, priority=BATCH):
+    """Analyze content, mapping long documents over chunks in parallel"""
+    chunks = chunk_text(content)
+    if len(chunks) == 1:
+        companies = await _analyze_chunk(client, content, llm_slots, priority)
+    else:
+        results = await asyncio.gather(*(_analyze_chunk(client, chunk, llm_slots, priority) for chunk in chunks))
+        companies = merge_results(results)
+    return resolve_companies(companies)
+
+class _Pacer:
+    """Spaces out start times to at most `rate` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_start = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self.next_start)
+        self.next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+class Analyzer:
+    """Fetch and analysis state shared by every URL analyzed on one event loop
+
+    Holds the page download client, the concurrency limits, the packer
+    and in-flight near-duplicate coalescing, so a long-lived service can
+    keep one Analyzer per priority lane instead of rebuilding them for
+    every request. Create it inside the loop that will use it and close
+    it with aclose(). Pass packing=False where latency matters more than
+    request count, since packed articles wait up to PACK_MAX_WAIT.
+    """
+
+    def __init__(self, api_key, fetch_concurrency=FETCH_CONCURRENCY, llm_concurrency=LLM_CONCURRENCY, rate=None,
+                 priority=BATCH, packing=PACKING_ENABLED):
+        self.fetch_concurrency = fetch_concurrency
+        self.llm_concurrency = llm_concurrency
+        self.priority = priority
+        self.fetch_slots = asyncio.Semaphore(fetch_concurrency)
+        self.llm_slots = asyncio.Semaphore(llm_concurrency)
+        # Deferred articles wait in the lowest rate-limit lane; on their own
+        # slots they cannot hold llm_slots while batch work queues behind them
+        self.deferred_slots = asyncio.Semaphore(max(1, int(llm_concurrency * DEFERRED_SHARE)))
+        self.loop = asyncio.get_running_loop()
+
+        import httpx  # Deferred like pandas in results_store; only a running Analyzer needs it
+
+        limits = httpx.Limits(max_connections=fetch_concurrency, max_keepalive_connections=fetch_concurrency)
+        self.http = httpx.AsyncClient(
+            headers={'User-Agent': USER_AGENT},
+            timeout=REQUEST_TIMEOUT,
+            follow_redirects=True,
+            limits=limits,
+        )
+        self.client = get_async_client(api_key)
+        self.cache = get_result_cache()
+        self.http_cache = get_http_cache()
+        self.dedup = get_dedup_index()
+        self.store = get_results_store()
+        self.in_flight = []  # (signature, future) of representatives being analyzed
+        self.pacer = _Pacer(rate)
+        self.packer = Packer(self._analyze_pack, self._analyze_single, self._escalate) if packing else None
+
+    async def _analyze_pack(self, contents):
+        """One request for several short articles, demultiplexed per article"""
+        cascade = get_cascade()
+        model = {"model": cascade.models[0]} if cascade else {}
+        start = time.perf_counter()
+        with track_usage() as usage:
+            async with self.llm_slots:
+                response = await create_completion_async(
+                    self.client, build_packed_messages(contents), priority=self.priority,
+                    max_tokens=packed_max_tokens(contents),
+                    **model, **packed_request_kwargs(len(contents))
+                )
+        results = parse_packed_response(response.choices[0].message.content, len(contents))
+        if cascade:
+            self._review_pack(cascade, results, time.perf_counter() - start, usage.cost / len(contents))
+        return [companies if companies is None or companies is ESCALATE else resolve_companies(companies) for companies in results]
+
+    def _review_pack(self, cascade, results, seconds, cost):
+        """Mark doubtful first-tier answers in results for escalation"""
+        for index, companies in enumerate(results):
+            if companies is None:
+                continue  # Analyzed again on its own, from the first tier
+            reason = escalation_reason(companies)
+            cascade.record(0, seconds, cost, reason)
+            if reason is not None:
+                results[index] = ESCALATE
+
+    async def _escalate(self, content):
+        """Answer a packed article the first tier was doubtful about from the next tier on"""
+        return resolve_companies(await _analyze_chunk(self.client, content, self.llm_slots, self.priority, first_tier=1))
+
+    async def _analyze_single(self, content):
+        return await _analyze(self.client, content, self.llm_slots, self.priority)
+
+    async def _analyze(self, content):
+        """Short articles share packed requests, the rest go out alone"""
+        if is_deferred(content):
+            # Likely irrelevant: alone, and only when no other request wants the capacity
+            return await _analyze(self.client, content, self.deferred_slots, BACKGROUND)
+        if self.packer and is_packable(content):
+            return await self.packer.submit(content)
+        return await self._analyze_single(content)
+
+    async def _analyze_once(self, content):
+        """Analyze content unless a near-duplicate was or is being analyzed"""
+        dedup = self.dedup
+        signature = minhash(content) if dedup else None
+        if signature is None:
+            return await self._analyze(content), False
+
+        match = dedup.lookup(signature)
+        if match is not None:
+            note_model(match[2])
+            return match[0], True
+
+        # Copies of one story often arrive in the same batch; wait for the first
+        for other, future in list(self.in_flight):
+            if similarity(signature, other) >= dedup.threshold:
+                try:
+                    companies, model = await asyncio.shield(future)
+                except Exception:
+                    break  # Representative failed, analyze this copy itself
+                note_model(model)
+                return companies, True
+
+        entry = (signature, self.loop.create_future())
+        self.in_flight.append(entry)
+        try:
+            with track_usage() as usage:
+                companies = await self._analyze(content)
+            model = answering_model(usage.models)
+            dedup.add(signature, companies, model)
+            entry[1].set_result((companies, model))
+            return companies, False
+        except BaseException as e:
+            # Waiting copies fall back to their own analysis on any failure
+            error = e if isinstance(e, Exception) else RuntimeError("Representative analysis cancelled")
+            entry[1].set_exception(error)
+            entry[1].exception()  # Mark retrieved when no copy is waiting
+            raise
+        finally:
+            self.in_flight.remove(entry)
+
+    async def analyze_content(self, content, result):
+        """Fill result with the analysis of already extracted content"""
+        result["content"] = content
+        if not content:
+            result["error"] = "No text content found"
+            return result
+
+        # Articles with no listed company or market topic never reach the LLM
+        if not is_market_relevant(content):
+            result["skipped"] = True
+            return result
+
+        cached = self.cache.get(content) if self.cache else None
+        if cached is not None:
+            result["companies"], result["model"] = cached
+            result["cached"] = True
+        else:
+            with track_usage() as usage:
+                result["companies"], result["deduplicated"] = await self._analyze_once(content)
+            result["model"] = answering_model(usage.models)
+            if usage.requests:
+                get_usage_tracker().add_article(usage, content)
+                result["usage"] = usage.to_dict()
+            if self.cache:
+                self.cache.put(content, result["companies"], result["model"])
+
+        # Every analyzed URL counts towards trends, however it was answered
+        if self.store and result["url"]:
+            self.store.record(result["url"], result["companies"], model=result["model"])
+        return result
+
+    async def analyze_url(self, url):
+        """Fetch and analyze one URL; failures are reported in the result"""
+        result = _new_result(url)
+        await self.pacer.wait()
+        try:
+            async with self.fetch_slots:
+                html = await fetch_async(self.http, url, self.http_cache)
+
+            # HTML parsing is CPU-bound, keep it off the event loop
+            content = await self.loop.run_in_executor(None, extract_text, html)
+            await self.analyze_content(content, result)
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    async def analyze_text(self, content, url=None):
+        """Analyze text supplied by the caller instead of a fetched page"""
+        result = _new_result(url)
+        try:
+            await self.analyze_content(content, result)
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    async def analyze_many(self, urls):
+        """Analyze many URLs concurrently, yielding results as they complete"""
+        # Keep enough work queued to saturate both stages without
+        # materialising a task per URL for very large inputs
+        window = 2 * (self.fetch_concurrency + self.llm_concurrency)
+        pending = set()
+        url_iter = iter(urls)
+
+        try:
+            while True:
+                for url in url_iter:
+                    pending.add(asyncio.create_task(self.analyze_url(url)))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+async def analyze_many(urls, api_key, fetch_concurrency=FETCH_CONCURRENCY, llm_concurrency=LLM_CONCURRENCY, rate=None,
+                       priority=BATCH):
+    """Analyze many URLs concurrently, yielding results as they complete
+
+    Each yielded result is a dict with "url", "content", "companies",
+    "cached", "deduplicated", "skipped", "error" and "usage" keys; "usage"
+    holds tokens and cost when the article reached OpenAI. Failures are
+    reported per URL and never stop the run. `urls` may be any iterable, including a lazy
+    generator; only a bounded window of URLs is in flight at any time.
+    `rate` caps how many URLs start per second (None for no limit).
+    `priority` is the rate_limiter lane for the OpenAI requests.
+    """
+    analyzer = Analyzer(api_key, fetch_concurrency, llm_concurrency, rate, priority)
+    try:
+        async for result in analyzer.analyze_many(urls):
+            yield result
+    finally:
+        await analyzer.aclose()
+
+def run_analyze_many(urls, api_key, **kwargs):
+    """Synchronous wrapper around analyze_many that returns a list"""
+    async def collect():
+        try:
+            return [result async for result in analyze_many(urls, api_key, **kwargs)]
+        finally:
+            await close_async_clients()
+    return asyncio.run(collect())
@@ -0,0 +1,159 @@
+"""
+Company entity resolution for News Impact Analyzer
+Maps the free-text "company name" returned by the LLM ("Tata Motors",
+"Tata Motors Ltd", "TAMO") to one canonical listed entity, so results
+from different articles can be joined and aggregated.
+
+Lookups go through three tiers, cheapest first:
+- exact: names, aliases, NSE symbols and ISINs as written
+- normalized: lowercase with punctuation and legal suffixes removed
+- fuzzy: character-trigram Dice similarity over the normalized names
+
+Resolved companies take their name, ticker, ISIN, industry and listed
+status from the index instead of from the LLM.
+"""
+
+import math
+import os
+import threading
+from functools import lru_cache
+from chunking import company_key, merge_results
+from environment import ENTITY_FUZZY_THRESHOLD, ENTITY_RESOLUTION_ENABLED, GAZETTEER_CSV
+from gazetteer import load_listings
+
+MAX_COMMON_POSTINGS = 256  # Trigrams shared by more names than this are "common"
+
+def _trigrams(key):
+    """Character trigrams of a normalized name, padded at word edges"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class EntityIndex:
+    """In-memory name -> listed entity index"""
+
+    def __init__(self, listings, fuzzy_threshold=ENTITY_FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.entities = []
+        self._exact = {}
+        self._normalized = {}
+        self._postings = {}
+        self._keys = []
+
+        for company in listings:
+            entity = {
+                "ticker": company["symbol"],
+                "isin": company["isin"],
+                "name": company["name"],
+                "industry": company["industry"],
+            }
+            entity_id = len(self.entities)
+            self.entities.append(entity)
+
+            names = [company["name"]] + company["aliases"]
+            for identifier in (company["isin"], company["symbol"]):
+                if identifier:
+                    self._exact[identifier] = entity_id
+            self._normalized.setdefault(company_key(company["symbol"]), entity_id)
+
+            # Symbols are too short for trigram matching ("RELIANCE" would
+            # swallow "Reliance Jio"), so only full names go in the fuzzy tier
+            for name in names:
+                self._exact.setdefault(name, entity_id)
+                key = company_key(name)
+                if key and key not in self._normalized:
+                    self._normalized[key] = entity_id
+                    self._add_fuzzy(key, entity_id)
+
+        self.resolve = lru_cache(maxsize=65536)(self._resolve)
+
+    def _add_fuzzy(self, key, entity_id):
+        """Index the trigrams of one normalized name"""
+        grams = frozenset(_trigrams(key))
+        key_id = len(self._keys)
+        self._keys.append((grams, entity_id))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(key_id)
+
+    def _fuzzy(self, key):
+        """Best entity by trigram Dice similarity, if above the threshold
+
+        Uses prefix filtering: any name reaching the threshold must share
+        at least one of the query's rarest trigrams, so only those posting
+        lists are scanned and candidates are scored exactly. Very common
+        trigrams ("ind", "ban") are skipped once rarer ones have produced
+        candidates, which keeps lookups well under a millisecond but makes
+        the search approximate: a name sharing only such common trigrams
+        with the query is not considered, even if it would pass the
+        threshold.
+        """
+        grams = _trigrams(key)
+        threshold = self.fuzzy_threshold
+        min_overlap = math.ceil(threshold * len(grams) / (2 - threshold))
+        rare = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+        candidates = set()
+        for gram in rare[:len(grams) - min_overlap + 1]:
+            postings = self._postings.get(gram, ())
+            if candidates and len(postings) > MAX_COMMON_POSTINGS:
+                break
+            candidates.update(postings)
+
+        # Names much shorter or longer than the query cannot reach the threshold
+        min_size = threshold * len(grams) / (2 - threshold)
+        max_size = (2 - threshold) * len(grams) / threshold
+
+        best_id, best_score = None, threshold
+        for key_id in candidates:
+            other, entity_id = self._keys[key_id]
+            if not min_size <= len(other) <= max_size:
+                continue
+            score = 2 * len(grams & other) / (len(grams) + len(other))
+            if score >= best_score:
+                best_id, best_score = entity_id, score
+        return best_id
+
+    def _resolve(self, name):
+        """Canonical entity for a company name, or None"""
+        name = name.strip()
+        entity_id = self._exact.get(name)
+        if entity_id is None:
+            key = company_key(name)
+            if not key:
+                return None
+            entity_id = self._normalized.get(key)
+            if entity_id is None:
+                entity_id = self._fuzzy(key)
+        return None if entity_id is None else self.entities[entity_id]
+
+    def resolve_companies(self, companies):
+        """Canonicalise LLM ImpactRecords and merge records for the same entity"""
+        resolved = []
+        for company in companies:
+            entity = self.resolve(company.company_name)
+            if entity:
+                company = company.replace(
+                    company_name=entity["name"],
+                    company_industry=entity["industry"] or company.company_industry,
+                    listed="Y",
+                    ticker=entity["ticker"],
+                    isin=entity["isin"],
+                )
+            resolved.append(company)
+        return merge_results([resolved])
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_entity_index():
+    """Process-wide entity index, or None when disabled or no listing exists"""
+    global _index
+    if not ENTITY_RESOLUTION_ENABLED or not os.path.exists(GAZETTEER_CSV):
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = EntityIndex(load_listings())
+    return _index
+
+def resolve_companies(companies):
+    """Resolve companies against the shared index when it is available"""
+    index = get_entity_index()
+    return index.resolve_companies(companies) if index else companies
@@ -1,74 +1,303 @@
 """
 Environment Configuration for News Impact Analyzer
 Store all environment variables here for easy management
+
+Every setting is a typed field of the frozen Settings dataclass, read
+from the environment (and a .env file) once, when this module is first
+imported, and validated there. `settings` holds the result; the same
+values are also available as module constants named like their
+environment variables (settings.openai_model is OPENAI_MODEL).
 """
 
 import os
+import typing
+from dataclasses import dataclass, field, fields
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 
-# Load environment variables from .env file if it exists
-load_dotenv()
+DEFAULT_API_KEY = "your_openai_api_key_here"
+DEFAULT_FEED_URLS = (
+    "https://economictimes.indiatimes.com/markets/rssfeeds/1977021501.cms",
+    "https://www.moneycontrol.com/rss/business.xml",
+    "https://www.livemint.com/rss/markets",
+)
+STRUCTURED_OUTPUT_MODES = ("json_schema", "json_object", "off")
+RELEVANCE_ACTIONS = ("skip", "defer")
+TYPE_NAMES = {int: "an integer", float: "a number"}
+
+@dataclass(frozen=True)
+class Settings:
+    """All environment-driven settings; each field is read from its upper-cased name"""
+
+    # OpenAI API Configuration
+    openai_api_key: str = field(default=DEFAULT_API_KEY, repr=False)
+    openai_model: str = "gpt-3.5-turbo"
+    openai_max_tokens: int = 1000
+    openai_temperature: float = 0.3
+    openai_base_url: Optional[str] = None  # Override for proxies or local OpenAI-compatible servers
+    openai_request_timeout: float = 60
+    openai_pool_max_connections: int = 50  # Per API key
+    openai_pool_max_keepalive: int = 20
+    openai_keepalive_expiry: float = 30  # Seconds an idle connection is kept
+    api_key_validation_ttl: int = 900  # Seconds a key check is remembered
+
+    # OpenAI Rate Limit Configuration (limits of your account tier, 0 = unlimited)
+    openai_rpm_limit: int = 3500  # Requests per minute
+    openai_tpm_limit: int = 200000  # Tokens per minute
+    rate_limit_headroom: float = 0.9  # Share of the limits actually used
+    rate_limit_interactive_reserve: float = 0.1  # Capacity batch work leaves for the UI
+    openai_max_retries: int = 5  # Retries after 429s and transient errors
+    openai_backoff_base: float = 1.0  # Seconds, doubled per retry
+    openai_backoff_max: float = 60
+
+    # Application Configuration
+    app_name: str = "News Impact Analyzer"
+    app_version: str = "1.0.0"
+
+    # Web Scraping Configuration
+    user_agent: str = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    request_timeout: int = 10
+    max_content_length: int = 4000  # Characters per LLM request
+    max_document_length: int = 60000  # Characters kept from a scraped page
+    content_extractor: str = "lxml"  # "lxml" (article body) or "soup" (whole page)
+    http_pool_connections: int = 32  # Hosts with pooled connections
+    http_pool_maxsize: int = 16  # Kept-alive connections per host
+    http_cache_enabled: bool = True
+    http_cache_path: str = ".cache/http_pages.sqlite3"
+    http_cache_max_entries: int = 20000
+
+    # Long Document Configuration
+    chunk_max_tokens: Optional[int] = None  # Content tokens per LLM request, default MAX_CONTENT_LENGTH / 4
+    chunk_concurrency: int = 8  # Chunks of one document analyzed at once
+
+    # Batch Analysis Configuration
+    fetch_concurrency: int = 16  # Simultaneous page downloads
+    llm_concurrency: int = 8  # Simultaneous OpenAI requests
+    packing_enabled: bool = True  # Share one request between short articles
+    pack_max_article_tokens: int = 300  # Longer articles get their own request
+    pack_token_budget: int = 2000  # Article tokens per packed request
+    pack_max_articles: int = 8
+    pack_output_tokens_per_article: int = 300  # max_tokens share per article
+    pack_max_wait: float = 0.25  # Seconds a short article waits for companions
+
+    # Feed Poller Configuration
+    feed_urls: Tuple[str, ...] = DEFAULT_FEED_URLS  # RSS/Atom feeds or news sitemaps, comma-separated
+    feed_default_interval: float = 300  # Seconds between polls of a new feed
+    feed_min_interval: float = 60
+    feed_max_interval: float = 1800
+    seen_index_path: str = ".cache/seen_urls.bloom"
+    seen_index_capacity: int = 1000000  # URLs before false positives exceed the rate
+    seen_index_error_rate: float = 0.001
+
+    # Company Gazetteer Configuration
+    gazetteer_enabled: bool = True
+    gazetteer_csv: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nse_companies.csv")
+    gazetteer_skip_irrelevant: bool = True  # Skip the LLM when nothing matches
+    gazetteer_max_hints: int = 20  # Company hints added to the prompt
+
+    # Relevance Classifier Configuration (inactive until a model is trained)
+    relevance_model_path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "relevance_model.npy")
+    relevance_threshold: float = 0.2  # Market-relevance probability below which the action applies
+    relevance_action: str = "skip"  # "skip" the LLM call or "defer" it to the lowest-priority lane
+
+    # Entity Resolution Configuration (uses the GAZETTEER_CSV listing)
+    entity_resolution_enabled: bool = True
+    entity_fuzzy_threshold: float = 0.75  # Trigram similarity for fuzzy matches
+
+    # LLM Result Cache Configuration
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = ".cache/llm_results.sqlite3"
+    llm_cache_ttl: int = 7 * 24 * 3600  # Seconds, 0 = never expire
+    llm_cache_max_entries: int = 50000
+
+    # Results Store Configuration
+    results_store_enabled: bool = True
+    results_store_path: str = "results/impacts.sqlite3"  # Every analysis, kept for trend queries
+
+    # Near-Duplicate Detection Configuration
+    dedup_enabled: bool = True
+    dedup_path: str = ".cache/near_duplicates.sqlite3"
+    dedup_threshold: float = 0.8  # Estimated Jaccard similarity to reuse an analysis
+    dedup_ttl: int = 3 * 24 * 3600  # Seconds, syndicated copies appear within days
+    dedup_max_entries: int = 20000
+
+    # Streamlit Configuration
+    page_title: str = "News Impact Analyzer"
+    page_icon: str = "📊"
+    layout: str = "wide"
+    streamlit_server_port: int = 8501
+    streamlit_server_address: str = "localhost"
+    job_workers: int = 4  # Analyses running at once across all sessions
+    job_poll_interval: float = 1.0  # Seconds between progress refreshes
+    job_history: int = 200  # Finished jobs kept for polling
+
+    # API Server Configuration
+    api_host: str = "127.0.0.1"
+    api_port: int = 8000
+    api_workers: int = 2  # Worker processes, each with its own event loop
+    api_max_batch_urls: int = 1000  # URLs per batch or stream request
+    api_auth_token: str = field(default="", repr=False)  # Bearer token required by the API, empty = no auth
 
-# OpenAI API Configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "your_openai_api_key_here")
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
-OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "1000"))
-OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
+    # Work Queue Configuration (queue_worker.py backfills)
+    queue_path: str = "results/work_queue.sqlite3"  # Durable queue of fetch, extract and analyze tasks
+    queue_url: str = ""  # Queue broker (python queue_worker.py serve) to use instead of QUEUE_PATH
+    queue_shared_file: bool = False  # QUEUE_PATH is on a network filesystem: rollback journal instead of WAL
+    queue_visibility_timeout: float = 300  # Seconds a leased task stays hidden from other workers
+    queue_max_attempts: int = 5  # Attempts before a task is marked failed
+    queue_retry_delay: float = 30  # Seconds before a failed task is retried, doubled per attempt
+    queue_poll_interval: float = 0.5  # Seconds between lease attempts on an empty stage
+    queue_fetch_workers: int = 2  # Worker processes per stage started by `queue_worker.py work`
+    queue_extract_workers: int = 2
+    queue_analyze_workers: int = 2
+    queue_broker_host: str = "127.0.0.1"
+    queue_broker_port: int = 8765
+    queue_broker_token: str = field(default="", repr=False)  # Bearer token required by the broker, empty = no auth
 
-# Application Configuration
-APP_NAME = os.getenv("APP_NAME", "News Impact Analyzer")
-APP_VERSION = os.getenv("APP_VERSION", "1.0.0")
+    # Token Accounting Configuration
+    dynamic_max_tokens: bool = True  # Size max_tokens from expected companies
+    completion_tokens_per_company: int = 60  # One JSON company entry
+    completion_extra_companies: int = 4  # Expected beyond listed mentions
+    openai_input_price: Optional[float] = None  # USD per 1M prompt tokens, empty = built-in price list
+    openai_cached_input_price: Optional[float] = None  # USD per 1M cached prompt tokens
+    openai_output_price: Optional[float] = None  # USD per 1M completion tokens
 
-# Web Scraping Configuration
-USER_AGENT = os.getenv("USER_AGENT", 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "10"))
-MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", "4000"))
+    # Instrumentation Configuration
+    metrics_enabled: bool = True  # Per-stage timings and counters
+    metrics_window: int = 1000  # Latest timings per stage kept for percentiles
+    metrics_port: int = 0  # Serve Prometheus metrics on this port, 0 = off
+    tracing_enabled: bool = False  # OpenTelemetry span per stage
 
-# Streamlit Configuration
-PAGE_TITLE = os.getenv("PAGE_TITLE", "News Impact Analyzer")
-PAGE_ICON = os.getenv("PAGE_ICON", "📊")
-LAYOUT = os.getenv("LAYOUT", "wide")
-STREAMLIT_SERVER_PORT = int(os.getenv("STREAMLIT_SERVER_PORT", "8501"))
-STREAMLIT_SERVER_ADDRESS = os.getenv("STREAMLIT_SERVER_ADDRESS", "localhost")
+    # Model Cascade Configuration (cheap model first, stronger ones only for doubtful answers)
+    cascade_models: Tuple[str, ...] = ()  # Cheapest first, e.g. "gpt-4.1-nano,gpt-4.1-mini"; empty = OPENAI_MODEL only
+    cascade_escalate_score: int = 8  # Escalate when a company's impact score reaches this
+    cascade_escalate_companies: int = 10  # Escalate when more companies than this are named
+    cascade_escalate_conflicts: bool = True  # Escalate when a company is named as both positive and negative
+
+    # Structured Output Configuration
+    structured_output: str = "json_object"  # "json_schema", "json_object" or "off"
+    structured_repair_retries: int = 1  # Repair requests for invalid output
+
+    def __post_init__(self):
+        if self.chunk_max_tokens is None:
+            object.__setattr__(self, "chunk_max_tokens", self.max_content_length // 4)
+        object.__setattr__(self, "structured_output", self.structured_output.lower())
+        object.__setattr__(self, "relevance_action", self.relevance_action.lower())
+
+        problems = []
+        if self.structured_output not in STRUCTURED_OUTPUT_MODES:
+            problems.append(f"STRUCTURED_OUTPUT must be one of {', '.join(STRUCTURED_OUTPUT_MODES)}")
+        for name in ("rate_limit_headroom", "dedup_threshold", "entity_fuzzy_threshold", "seen_index_error_rate"):
+            if not 0 < getattr(self, name) <= 1:
+                problems.append(f"{name.upper()} must be above 0 and at most 1")
+        if self.relevance_action not in RELEVANCE_ACTIONS:
+            problems.append(f"RELEVANCE_ACTION must be one of {', '.join(RELEVANCE_ACTIONS)}")
+        if not 0 <= self.relevance_threshold <= 1:
+            problems.append("RELEVANCE_THRESHOLD must be between 0 and 1")
+        for name in ("queue_visibility_timeout", "queue_poll_interval"):
+            if getattr(self, name) <= 0:
+                problems.append(f"{name.upper()} must be above 0")
+        if len(self.cascade_models) == 1:
+            problems.append("CASCADE_MODELS needs at least two models, cheapest first")
+        if not 0 <= self.rate_limit_interactive_reserve < 1:
+            problems.append("RATE_LIMIT_INTERACTIVE_RESERVE must be at least 0 and below 1")
+        for name in ("chunk_max_tokens", "chunk_concurrency", "fetch_concurrency", "llm_concurrency",
+                     "pack_max_articles", "job_workers", "api_workers", "metrics_window", "openai_max_tokens",
+                     "cascade_escalate_companies", "queue_max_attempts"):
+            if getattr(self, name) < 1:
+                problems.append(f"{name.upper()} must be at least 1")
+        for name in ("openai_rpm_limit", "openai_tpm_limit", "openai_max_retries", "structured_repair_retries",
+                     "queue_retry_delay", "queue_fetch_workers", "queue_extract_workers", "queue_analyze_workers"):
+            if getattr(self, name) < 0:
+                problems.append(f"{name.upper()} must not be negative")
+        if problems:
+            raise ValueError("Invalid configuration: " + "; ".join(problems))
+
+def _parse(name, kind, value):
+    """Convert the environment string value to the field type kind"""
+    if typing.get_origin(kind) is typing.Union:  # Optional[...]: empty means unset
+        if not value.strip():
+            return None
+        kind = typing.get_args(kind)[0]
+    if kind is bool:
+        return value.strip().lower() == "true"
+    if kind is Tuple[str, ...]:
+        return tuple(part.strip() for part in value.split(",") if part.strip())
+    try:
+        return kind(value)
+    except ValueError:
+        raise ValueError(f"Invalid configuration: {name} must be {TYPE_NAMES[kind]}, got {value!r}") from None
+
+def load_settings(environ=None):
+    """Settings from environ (default: os.environ plus the .env file)"""
+    if environ is None:
+        load_dotenv()
+        environ = os.environ
+    values = {}
+    for setting in fields(Settings):
+        name = setting.name.upper()
+        if name in environ:
+            values[setting.name] = _parse(name, setting.type, environ[name])
+    return Settings(**values)
+
+settings = load_settings()
+
+# Module-level names for `from environment import OPENAI_MODEL`
+globals().update({setting.name.upper(): getattr(settings, setting.name) for setting in fields(Settings)})
 
 # Analysis Configuration
 IMPACT_SCORE_RANGE = (0, 10)  # Min and max impact scores
 LISTED_OPTIONS = ["Y", "N"]  # Listed status options
 IMPACT_TYPES = ["positive", "negative"]  # Valid impact types
 
-# Default prompt template
-DEFAULT_PROMPT_TEMPLATE = """
-Analyze the following news content and identify Indian companies that could be impacted by this news.
-
-Content: {content}
-
-For each identified company, provide the following information in JSON format:
-- company name: The exact name of the company
-- impact type: "positive" or "negative" based on how the news affects the company
-- company industry: The industry sector the company operates in
-- impact score: A score from 0-10 where 10 is the highest impact
-- listed: "Y" if the company is listed on BSE/NSE, "N" if not
-
-Focus only on Indian companies and provide realistic impact assessments.
-Return the results as a JSON array with the exact format specified above.
-
-Example format:
-[
-    {{
-        "company name": "Tata Motors",
-        "impact type": "positive",
-        "company industry": "Automotive",
-        "impact score": 7,
-        "listed": "Y"
-    }}
-]
-
-If no relevant Indian companies are found, return an empty array [].
+# Analysis instructions, sent ahead of the article in the system message.
+# They never contain per-article text, so every request starts with the
+# same prefix and the API can serve it from its prompt cache.
+# "company industry" and "listed" stay even though entity_index replaces
+# them for companies it resolves: unresolved companies (and every company
+# when no gazetteer is installed) only have the model's values, and the
+# records schema requires both fields.
+ANALYSIS_INSTRUCTIONS = """
+Identify Indian companies that could be impacted by the news content the user sends.
+
+For each company give:
+- "company name": the exact name of the company
+- "impact type": "positive" or "negative" depending on how the news affects the company
+- "company industry": the industry sector the company operates in
+- "impact score": integer from 0 to 10, 10 being the highest impact
+- "listed": "Y" if listed on BSE/NSE, "N" if not
+
+Focus only on Indian companies and give realistic impact assessments.
+Return a JSON array of these objects, e.g. [{"company name": "Tata Motors", "impact type": "positive", "company industry": "Automotive", "impact score": 7, "listed": "Y"}], or [] if no relevant Indian company is found.
+"""
+
+# Default prompt template (the per-article part of the request)
+DEFAULT_PROMPT_TEMPLATE = """News content:
+{content}
+"""
+
+# Instructions for several short articles analyzed in one request
+PACKED_ANALYSIS_INSTRUCTIONS = """
+Analyze each news article the user sends separately and identify Indian companies that could be impacted by that article.
+
+For each company give:
+- "company name": the exact name of the company
+- "impact type": "positive" or "negative" depending on how the news affects the company
+- "company industry": the industry sector the company operates in
+- "impact score": integer from 0 to 10, 10 being the highest impact
+- "listed": "Y" if listed on BSE/NSE, "N" if not
+
+Focus only on Indian companies and give realistic impact assessments.
+Return a single JSON object with one key per article id and that article's companies as a JSON array, e.g. {"A1": [{"company name": "Tata Motors", "impact type": "positive", "company industry": "Automotive", "impact score": 7, "listed": "Y"}], "A2": []}.
+Include every article id, with an empty array [] when an article has no relevant Indian companies.
+"""
+
+# Prompt for several short articles analyzed in one request
+PACKED_PROMPT_TEMPLATE = """{articles}
 """
 
 def validate_config():
     """Validate that all required configuration is set"""
-    if OPENAI_API_KEY == "your_openai_api_key_here":
+    if settings.openai_api_key == DEFAULT_API_KEY:
         print("⚠️  Warning: OpenAI API key not configured!")
         print("   Please set OPENAI_API_KEY in your .env file")
         return False
@@ -77,13 +306,19 @@ def validate_config():
 def get_config_summary():
     """Get a summary of current configuration"""
     return {
-        "app_name": APP_NAME,
-        "app_version": APP_VERSION,
-        "openai_model": OPENAI_MODEL,
-        "openai_max_tokens": OPENAI_MAX_TOKENS,
-        "openai_temperature": OPENAI_TEMPERATURE,
-        "request_timeout": REQUEST_TIMEOUT,
-        "max_content_length": MAX_CONTENT_LENGTH,
-        "streamlit_port": STREAMLIT_SERVER_PORT,
-        "api_key_configured": OPENAI_API_KEY != "your_openai_api_key_here"
-    } 
\ No newline at end of file
+        "app_name": settings.app_name,
+        "app_version": settings.app_version,
+        "openai_model": settings.openai_model,
+        "cascade_models": list(settings.cascade_models),
+        "openai_max_tokens": settings.openai_max_tokens,
+        "openai_temperature": settings.openai_temperature,
+        "request_timeout": settings.request_timeout,
+        "max_content_length": settings.max_content_length,
+        "max_document_length": settings.max_document_length,
+        "chunk_max_tokens": settings.chunk_max_tokens,
+        "fetch_concurrency": settings.fetch_concurrency,
+        "llm_concurrency": settings.llm_concurrency,
+        "llm_cache_enabled": settings.llm_cache_enabled,
+        "streamlit_port": settings.streamlit_server_port,
+        "api_key_configured": settings.openai_api_key != DEFAULT_API_KEY
+    }
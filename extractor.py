@@ -0,0 +1,174 @@
+"""
+Main-article extraction for News Impact Analyzer
+Pulls the article body out of a news page and drops navigation, footers,
+"related stories" rails and other boilerplate before anything reaches
+the LLM.
+
+Extractors are plain functions taking raw HTML (bytes or str) and
+returning a list of paragraphs. The default "lxml" extractor scores
+blocks by text density, link density and class/id hints; "soup" is the
+original BeautifulSoup whole-page flattening. Choose one with the
+CONTENT_EXTRACTOR setting or add your own with register_extractor().
+"""
+
+import re
+import lxml.html
+from lxml import etree
+from metrics import stage
+from environment import CONTENT_EXTRACTOR
+
+# Elements that never hold article text
+DROP_TAGS = [
+    'script', 'style', 'noscript', 'iframe', 'form', 'nav', 'footer', 'aside',
+    'header', 'svg', 'button', 'select', 'input', 'textarea', 'template',
+]
+
+# Block elements whose text is treated as one paragraph
+PARAGRAPH_TAGS = {'p', 'pre', 'blockquote', 'h2', 'h3', 'h4', 'li', 'td'}
+BLOCK_TAGS = PARAGRAPH_TAGS | {'div', 'ul', 'ol', 'table', 'section', 'article'}
+
+BOILERPLATE_HINTS = re.compile(
+    r'comment|footer|footnote|masthead|menu|navbar|breadcrumb|related|sidebar|share|social|'
+    r'promo|sponsor|advert|\bads?\b|subscribe|newsletter|popup|cookie|widget|trending|'
+    r'recommend|also-read|read-more|outbrain|taboola|disclaimer|copyright|login|signup',
+    re.I
+)
+CONTENT_HINTS = re.compile(r'article|artText|body|content|entry|main|post|story|text', re.I)
+
+MIN_PARAGRAPH_CHARS = 25  # Shorter blocks are usually captions, bylines or buttons
+MAX_LINK_DENSITY = 0.5  # Blocks that are mostly link text are navigation
+MIN_ARTICLE_CHARS = 200  # Below this the page is probably not an article
+
+def _text(element):
+    """Whitespace-collapsed text of an element and its descendants"""
+    return ' '.join(element.text_content().split())
+
+def _link_density(element, text_length):
+    """Fraction of an element's text that sits inside links"""
+    if not text_length:
+        return 1.0
+    link_length = sum(len(_text(a)) for a in element.iter('a'))
+    return min(link_length / text_length, 1.0)
+
+def _class_weight(element):
+    """Score adjustment from class/id naming conventions"""
+    hints = ' '.join(filter(None, (element.get('class'), element.get('id'))))
+    if not hints:
+        return 0
+    weight = 0
+    if BOILERPLATE_HINTS.search(hints):
+        weight -= 25
+    if CONTENT_HINTS.search(hints):
+        weight += 25
+    return weight
+
+def _paragraph_elements(root):
+    """Innermost paragraph-like blocks, including bare text divs"""
+    for element in root.iter(*PARAGRAPH_TAGS, 'div'):
+        if any(isinstance(d.tag, str) and d.tag in BLOCK_TAGS for d in element.iterdescendants()):
+            continue
+        yield element
+
+def _best_candidate(root):
+    """Container whose paragraphs score highest, readability-style"""
+    scores = {}
+    for paragraph in _paragraph_elements(root):
+        text = _text(paragraph)
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+
+        # Long, comma-rich text is prose; short, link-heavy text is chrome
+        score = 1 + text.count(',') + min(len(text) // 100, 3)
+        for level, ancestor in enumerate(paragraph.iterancestors()):
+            if level > 2:
+                break
+            if ancestor not in scores:
+                scores[ancestor] = _class_weight(ancestor)
+            scores[ancestor] += score / (level + 1)
+
+    best, best_score = None, 0.0
+    for element, score in scores.items():
+        score *= 1 - _link_density(element, len(_text(element)))
+        if score > best_score:
+            best, best_score = element, score
+    return best
+
+def _article_paragraphs(root):
+    """Headline and body paragraphs of the densest content block"""
+    # Headlines often sit in <header>, so read it before stripping chrome
+    headline = root.find('.//h1')
+    title = _text(headline) if headline is not None else ''
+
+    etree.strip_elements(root, etree.Comment, *DROP_TAGS, with_tail=False)
+    candidate = _best_candidate(root)
+    if candidate is None:
+        return []
+
+    paragraphs = [title] if title else []
+
+    seen = set(paragraphs)
+    for paragraph in _paragraph_elements(candidate):
+        text = _text(paragraph)
+        if len(text) < MIN_PARAGRAPH_CHARS or text in seen:
+            continue
+        if _class_weight(paragraph) < 0 or _link_density(paragraph, len(text)) > MAX_LINK_DENSITY:
+            continue
+        seen.add(text)
+        paragraphs.append(text)
+
+    if sum(len(p) for p in paragraphs) < MIN_ARTICLE_CHARS:
+        return []
+    return paragraphs
+
+def extract_lxml(html):
+    """Extract article paragraphs with lxml using density scoring"""
+    with stage("parse"):
+        root = lxml.html.fromstring(html)
+
+    with stage("extract"):
+        return _article_paragraphs(root)
+
+def extract_soup(html):
+    """Flatten the whole page with BeautifulSoup (original behaviour)"""
+    from bs4 import BeautifulSoup
+
+    with stage("parse"):
+        soup = BeautifulSoup(html, 'html.parser')
+
+    with stage("extract"):
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+
+        # Get text content
+        text = soup.get_text()
+
+        # Clean up whitespace
+        lines = (line.strip() for line in text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        text = ' '.join(chunk for chunk in chunks if chunk)
+    return [text] if text else []
+
+EXTRACTORS = {
+    "lxml": extract_lxml,
+    "soup": extract_soup,
+}
+
+def register_extractor(name, extractor):
+    """Make a custom extractor available under CONTENT_EXTRACTOR=name"""
+    EXTRACTORS[name] = extractor
+
+def extract_paragraphs(html, name=None):
+    """Run the configured extractor, falling back to whole-page text
+
+    Pages the article extractor cannot make sense of (index pages,
+    unusual markup) still yield the flattened page text.
+    """
+    extractor = EXTRACTORS[name or CONTENT_EXTRACTOR]
+    try:
+        paragraphs = extractor(html)
+    except (etree.ParserError, ValueError):
+        paragraphs = []
+    if not paragraphs and extractor is not extract_soup:
+        paragraphs = extract_soup(html)
+    return paragraphs
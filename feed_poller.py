@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Feed poller for News Impact Analyzer
+Watches RSS/Atom feeds and news sitemaps and analyzes only new articles.
+
+Each feed is polled on its own schedule. The interval shrinks while a
+feed keeps publishing and grows while it stays quiet, bounded by
+FEED_MIN_INTERVAL and FEED_MAX_INTERVAL. Feed downloads go through the
+shared fetcher, so unchanged feeds cost one conditional request and are
+not even re-parsed.
+
+Article URLs already handled are kept in an on-disk Bloom filter
+(SEEN_INDEX_PATH), a few MB for a million URLs, so restarts never
+re-analyze old articles. On the very first run the current feed items
+are only recorded, not analyzed, unless --backfill is given.
+
+Usage:
+    python feed_poller.py -o feed_results.jsonl
+    python feed_poller.py --feeds https://www.livemint.com/rss/markets --once
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from lxml import etree
+from batch_cli import to_record
+from engine import run_analyze_many
+from fetcher import fetch
+from environment import (
+    FEED_DEFAULT_INTERVAL,
+    FEED_MAX_INTERVAL,
+    FEED_MIN_INTERVAL,
+    FEED_URLS,
+    FETCH_CONCURRENCY,
+    LLM_CONCURRENCY,
+    OPENAI_API_KEY,
+    SEEN_INDEX_CAPACITY,
+    SEEN_INDEX_ERROR_RATE,
+    SEEN_INDEX_PATH,
+)
+
+SITEMAP_CHILD_LIMIT = 3  # Child sitemaps followed per sitemap index (newest are listed first)
+MAX_ATTEMPTS = 3  # Analysis attempts before a failing article is marked seen anyway
+TRACKING_PARAMS = {'fbclid', 'gclid', 'ref', 'from'}
+
+def normalize_url(url):
+    """Canonical form used for the seen index: no fragment or tracking parameters"""
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ''))
+
+class BloomFilter:
+    """Fixed-size Bloom filter stored in a memory-mapped file
+
+    Sized for `capacity` URLs at `error_rate` false positives when the
+    file is created; an existing file keeps its original sizing. A false
+    positive only means an article is skipped, never analyzed twice.
+    """
+
+    MAGIC = b'NIABLOOM'
+    HEADER = struct.Struct('<8sQIQ')  # magic, bits, hash count, items added
+
+    def __init__(self, path=SEEN_INDEX_PATH, capacity=SEEN_INDEX_CAPACITY, error_rate=SEEN_INDEX_ERROR_RATE):
+        self.path = path
+        self.created = not os.path.exists(path)
+        if self.created:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            bits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+            hashes = max(1, round(bits / capacity * math.log(2)))
+            with open(path, 'wb') as f:
+                f.write(self.HEADER.pack(self.MAGIC, bits, hashes, 0))
+                f.truncate(self.HEADER.size + (bits + 7) // 8)
+
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self.bits, self.hashes, self.count = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not a seen-URL index")
+        self.capacity = capacity
+
+    def _positions(self, url):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, url):
+        offset = self.HEADER.size
+        data = self._map
+        return all(data[offset + (p >> 3)] & (1 << (p & 7)) for p in self._positions(url))
+
+    def add(self, url):
+        """Add url, returning False if it was (probably) already present"""
+        offset = self.HEADER.size
+        data = self._map
+        added = False
+        for p in self._positions(url):
+            index = offset + (p >> 3)
+            mask = 1 << (p & 7)
+            if not data[index] & mask:
+                data[index] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def flush(self):
+        """Persist the item count and bits to disk"""
+        self.HEADER.pack_into(self._map, 0, self.MAGIC, self.bits, self.hashes, self.count)
+        self._map.flush()
+
+    def close(self):
+        self.flush()
+        self._map.close()
+        self._file.close()
+
+def _local(tag):
+    """Tag name without its XML namespace"""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+def parse_feed(body):
+    """Return (article_urls, child_sitemap_urls) from RSS, Atom or sitemap XML"""
+    parser = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+    root = etree.fromstring(body, parser)
+    if root is None:
+        return [], []
+
+    kind = _local(root.tag)
+    articles, children = [], []
+    if kind == 'sitemapindex':
+        children = [el.text.strip() for el in root.iter() if _local(el.tag) == 'loc' and el.text]
+    elif kind == 'urlset':
+        articles = [el.text.strip() for el in root.iter() if _local(el.tag) == 'loc' and el.text]
+    else:
+        for item in root.iter():
+            name = _local(item.tag)
+            if name not in ('item', 'entry'):
+                continue
+            for child in item:
+                if _local(child.tag) != 'link':
+                    continue
+                link = child.get('href') or (child.text or '').strip()
+                # Atom entries may carry several links; the article is rel="alternate"
+                if link and child.get('rel', 'alternate') == 'alternate':
+                    articles.append(link)
+                    break
+    return articles, children
+
+class Feed:
+    """Polling state for one feed"""
+
+    def __init__(self, url, interval=FEED_DEFAULT_INTERVAL):
+        self.url = url
+        self.interval = interval
+        self.next_poll = 0.0
+        self.digests = {}  # Document URL -> body hash from the last poll
+        self.polls = 0
+        self.new_items = 0
+
+    def reschedule(self, new_count, now):
+        """Adapt the interval to how often the feed publishes"""
+        if new_count:
+            self.interval = max(FEED_MIN_INTERVAL, self.interval / 2)
+        else:
+            self.interval = min(FEED_MAX_INTERVAL, self.interval * 1.5)
+        self.next_poll = now + self.interval
+
+def _fetch_changed(feed, url):
+    """Body of url, or None when it is identical to the previous poll"""
+    body = fetch(url)
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    if feed.digests.get(url) == digest:
+        return None
+    feed.digests[url] = digest
+    return body
+
+def poll_feed(feed):
+    """Fetch a feed and return the article URLs of any changed documents"""
+    body = _fetch_changed(feed, feed.url)
+    if body is None:
+        return []
+    articles, children = parse_feed(body)
+    # News sitemaps usually keep a stable index and update its children
+    for child in children[:SITEMAP_CHILD_LIMIT]:
+        child_body = _fetch_changed(feed, child)
+        if child_body is not None:
+            articles.extend(parse_feed(child_body)[0])
+    return articles
+
+class FeedPoller:
+    """Schedules feed polls and sends unseen articles to the analysis engine"""
+
+    def __init__(self, feed_urls, api_key, output, seen=None, backfill=False,
+                 concurrency=LLM_CONCURRENCY, fetch_concurrency=FETCH_CONCURRENCY):
+        self.feeds = [Feed(url) for url in feed_urls]
+        self.api_key = api_key
+        self.output = output
+        self.seen = seen if seen is not None else BloomFilter()
+        self.prime = self.seen.created and not backfill
+        self.concurrency = concurrency
+        self.fetch_concurrency = fetch_concurrency
+        self._attempts = {}
+        self._retry = []  # Failed articles analyzed again on the next round
+        self._pool = ThreadPoolExecutor(max_workers=min(len(self.feeds) or 1, fetch_concurrency))
+
+    def poll_due(self, now=None):
+        """Poll every due feed and analyze their new articles, returning the count"""
+        now = time.time() if now is None else now
+        due = [feed for feed in self.feeds if feed.next_poll <= now]
+        if not due:
+            return 0
+
+        def safe_poll(feed):
+            try:
+                return poll_feed(feed)
+            except Exception as e:
+                print(f"⚠️  {feed.url}: {e}", file=sys.stderr)
+                return None
+
+        fresh, self._retry = self._retry, []
+        queued = {normalize_url(url) for url in fresh}
+        for feed, articles in zip(due, self._pool.map(safe_poll, due)):
+            count = 0
+            for url in articles or ():
+                key = normalize_url(url)
+                if key in self.seen or key in queued:
+                    continue
+                queued.add(key)
+                fresh.append(url)
+                count += 1
+            feed.polls += 1
+            feed.new_items += count
+            feed.reschedule(count, time.time())
+
+        if self.prime:
+            # First run: remember what is already published, analyze only what comes next
+            for url in fresh:
+                self.seen.add(normalize_url(url))
+            self.seen.flush()
+            self.prime = False
+            print(f"📌 Recorded {len(fresh)} existing articles, watching for new ones", file=sys.stderr)
+            return 0
+
+        if fresh:
+            self.analyze(fresh)
+        return len(fresh)
+
+    def analyze(self, urls):
+        """Analyze new articles and mark them seen"""
+        results = run_analyze_many(urls, self.api_key, fetch_concurrency=self.fetch_concurrency,
+                                   llm_concurrency=self.concurrency)
+        for result in results:
+            self.output.write(json.dumps(to_record(result), ensure_ascii=False) + '\n')
+            key = normalize_url(result["url"])
+            if result["error"]:
+                attempts = self._attempts.get(key, 0) + 1
+                self._attempts[key] = attempts
+                if attempts < MAX_ATTEMPTS:
+                    self._retry.append(result["url"])
+                    continue
+            self._attempts.pop(key, None)
+            self.seen.add(key)
+        self.output.flush()
+        self.seen.flush()
+        failed = sum(1 for r in results if r["error"])
+        print(f"📰 Analyzed {len(results)} new articles ({failed} failed)", file=sys.stderr)
+
+    def next_due(self):
+        return min((feed.next_poll for feed in self.feeds), default=time.time())
+
+    def run(self, once=False):
+        """Poll until interrupted (or a single round with once=True)"""
+        while True:
+            self.poll_due()
+            if once:
+                return
+            time.sleep(max(0.0, self.next_due() - time.time()))
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.seen.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll news feeds and analyze new articles")
+    parser.add_argument("--feeds", nargs="+", default=FEED_URLS, help="RSS/Atom feed or sitemap URLs")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (appended), or - for stdout")
+    parser.add_argument("--once", action="store_true", help="Poll every feed once and exit")
+    parser.add_argument("--backfill", action="store_true", help="On the first run, analyze articles already in the feeds")
+    parser.add_argument("--concurrency", type=int, default=LLM_CONCURRENCY, help="Simultaneous OpenAI requests")
+    parser.add_argument("--api-key", default=OPENAI_API_KEY, help="OpenAI API key (default: OPENAI_API_KEY)")
+    args = parser.parse_args()
+
+    if args.api_key == "your_openai_api_key_here":
+        print("❌ OpenAI API key not configured. Set OPENAI_API_KEY or pass --api-key", file=sys.stderr)
+        sys.exit(1)
+
+    output = sys.stdout if args.output == "-" else open(args.output, 'a', encoding='utf-8')
+    poller = FeedPoller(args.feeds, args.api_key, output, backfill=args.backfill, concurrency=args.concurrency)
+    print(f"📡 Watching {len(poller.feeds)} feeds", file=sys.stderr)
+    try:
+        poller.run(once=args.once)
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped", file=sys.stderr)
+    finally:
+        poller.close()
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+HTTP fetch layer for News Impact Analyzer
+Shared, pooled sessions plus an on-disk conditional-request cache.
+
+Every page download goes through here. A single requests.Session keeps
+TCP/TLS connections alive per host, and pages that carry an ETag or
+Last-Modified header are stored on disk so the next fetch can send
+If-None-Match / If-Modified-Since and reuse the stored body on a 304.
+gzip/deflate are always accepted; brotli is accepted whenever the
+`brotli` package is installed (requests and httpx both pick it up).
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import count, stage
+from environment import (
+    HTTP_CACHE_ENABLED,
+    HTTP_CACHE_MAX_ENTRIES,
+    HTTP_CACHE_PATH,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    REQUEST_TIMEOUT,
+    USER_AGENT,
+)
+
+EVICT_EVERY = 32  # Run eviction on every Nth write
+PROCESS_CACHE = object()  # Default cache argument: get_http_cache(); None or False for no cache
+
+class HTTPCache:
+    """SQLite store of page bodies and their validators"""
+
+    def __init__(self, path=HTTP_CACHE_PATH, max_entries=HTTP_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.revalidated = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " body BLOB NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages(fetched_at)")
+
+    def conditional_headers(self, url):
+        """Validator headers for a conditional GET, empty if url is not cached"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        headers = {}
+        if row:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def body(self, url):
+        """Stored body for url after a 304, refreshing its timestamp"""
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM pages WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self.revalidated += 1
+        return row[0]
+
+    def store(self, url, headers, body):
+        """Remember body when the response carries a validator"""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, time.time())
+            )
+            self._writes += 1
+            if self.max_entries and self._writes % EVICT_EVERY == 1:
+                self._conn.execute(
+                    "DELETE FROM pages WHERE url IN ("
+                    " SELECT url FROM pages ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+_session = None
+_http_cache = None
+_lock = threading.Lock()
+
+def get_session():
+    """Process-wide requests session with per-host connection pooling"""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+    return _session
+
+def get_http_cache():
+    """Process-wide page cache, or None when HTTP caching is disabled"""
+    global _http_cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _lock:
+        if _http_cache is None:
+            _http_cache = HTTPCache()
+    return _http_cache
+
+def fetch(url, session=None, cache=PROCESS_CACHE):
+    """Download url and return the raw body, revalidating cached copies
+
+    Uses the process-wide page cache unless another HTTPCache, or None
+    for none, is passed. Raises requests.HTTPError for error statuses.
+    """
+    session = session or get_session()
+    if cache is PROCESS_CACHE:
+        cache = get_http_cache()
+
+    with stage("fetch"):
+        headers = cache.conditional_headers(url) if cache else {}
+        response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+        if response.status_code == 304 and cache:
+            body = cache.body(url)
+            if body is not None:
+                count("http_cache_revalidated")
+                return body
+            # Entry vanished between the lookup and the 304, fetch it again
+            response = session.get(url, timeout=REQUEST_TIMEOUT)
+
+        response.raise_for_status()
+        count("page_bytes", len(response.content))
+        if cache:
+            cache.store(url, response.headers, response.content)
+        return response.content
+
+async def fetch_async(http, url, cache=PROCESS_CACHE):
+    """Async counterpart of fetch() for an httpx.AsyncClient
+
+    SQLite cache reads and writes run in the loop's default executor, so
+    a busy cache file never blocks other downloads.
+    """
+    if cache is PROCESS_CACHE:
+        cache = get_http_cache()
+    loop = asyncio.get_running_loop()
+    with stage("fetch"):
+        headers = await loop.run_in_executor(None, cache.conditional_headers, url) if cache else {}
+        response = await http.get(url, headers=headers)
+
+        if response.status_code == 304 and cache:
+            body = await loop.run_in_executor(None, cache.body, url)
+            if body is not None:
+                count("http_cache_revalidated")
+                return body
+            response = await http.get(url)
+
+        response.raise_for_status()
+        count("page_bytes", len(response.content))
+        if cache:
+            await loop.run_in_executor(None, cache.store, url, response.headers, response.content)
+        return response.content
@@ -0,0 +1,191 @@
+"""
+Local gazetteer of NSE/BSE listed companies
+Scans article text for company names, aliases, tickers and market
+sector keywords with an Aho-Corasick automaton, in a single linear pass.
+
+Articles that mention no listed company and no sector keyword are
+skipped before the LLM call; the companies that are mentioned are
+passed to the prompt as hints.
+
+The listing CSV follows NSE's EQUITY_L.csv column names (SYMBOL,
+NAME OF COMPANY, ISIN NUMBER), with optional INDUSTRY and ALIASES
+(semicolon-separated) columns. data/nse_companies.csv is a small
+sample; point GAZETTEER_CSV at a full listing for production use.
+"""
+
+import csv
+import os
+import threading
+from collections import deque
+from environment import GAZETTEER_CSV, GAZETTEER_ENABLED
+
+try:
+    import ahocorasick
+except ImportError:  # Use the pure-Python automaton below
+    ahocorasick = None
+
+# Market-moving topics that make an article worth analyzing even
+# when it names no company directly
+SECTOR_KEYWORDS = [
+    "rbi", "reserve bank", "repo rate", "monetary policy", "inflation", "cpi", "wpi", "gdp",
+    "union budget", "fiscal deficit", "gst", "customs duty", "excise duty", "tariff", "subsidy",
+    "sebi", "sensex", "nifty", "stock market", "ipo", "fii", "fpi", "rupee", "forex",
+    "crude oil", "oil prices", "monsoon", "kharif", "rabi", "msp", "pli scheme",
+    "banking", "nbfc", "telecom", "pharma", "automobile", "auto sales", "steel", "cement",
+    "power sector", "renewable energy", "infrastructure", "real estate", "fmcg", "it services",
+]
+
+SHORT_TOKEN_LENGTH = 4  # Tickers this short only match in their exact case
+
+def _split_aliases(value):
+    """Aliases column as a list of non-empty names"""
+    return [alias.strip() for alias in (value or '').split(';') if alias.strip()]
+
+def load_listings(path=GAZETTEER_CSV):
+    """Read a listing CSV into a list of company dicts"""
+    listings = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().upper(): (value or '').strip() for key, value in row.items() if key}
+            symbol = row.get('SYMBOL', '')
+            name = row.get('NAME OF COMPANY', '')
+            if not symbol or not name:
+                continue
+            listings.append({
+                "symbol": symbol,
+                "name": name,
+                "isin": row.get('ISIN NUMBER', ''),
+                "industry": row.get('INDUSTRY', ''),
+                "aliases": _split_aliases(row.get('ALIASES')),
+            })
+    return listings
+
+class Automaton:
+    """Case-insensitive Aho-Corasick matcher over whole words
+
+    Patterns map to arbitrary payloads; find() yields (start, end,
+    payload) for every occurrence bounded by non-word characters.
+    """
+
+    def __init__(self):
+        self._patterns = {}
+        self._built = None
+
+    def add(self, pattern, payload):
+        """Register a pattern; later payloads for the same pattern win"""
+        key = pattern.lower()
+        case_sensitive = len(pattern) <= SHORT_TOKEN_LENGTH and pattern.isupper()
+        self._patterns[key] = (pattern, case_sensitive, payload)
+        self._built = None
+
+    def _build(self):
+        """Compile the patterns into goto/fail/output tables"""
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for key, entry in self._patterns.items():
+                automaton.add_word(key, (len(key), entry))
+            automaton.make_automaton()
+            return automaton
+
+        goto, fail, output = [{}], [0], [[]]
+        for key, entry in self._patterns.items():
+            state = 0
+            for char in key:
+                if char not in goto[state]:
+                    goto.append({})
+                    fail.append(0)
+                    output.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state].append((len(key), entry))
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0)
+                output[child] = output[child] + output[fail[child]]
+        return goto, fail, output
+
+    def _raw_matches(self, text):
+        """(end, length, entry) for every pattern occurrence in lowered text"""
+        if ahocorasick is not None:
+            for end, (length, entry) in self._built.iter(text):
+                yield end + 1, length, entry
+            return
+
+        goto, fail, output = self._built
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, entry in output[state]:
+                yield index + 1, length, entry
+
+    def find(self, text):
+        """Yield (start, end, payload) for whole-word matches in text"""
+        if self._built is None:
+            self._built = self._build()
+        lowered = text.lower()
+        for end, length, (pattern, case_sensitive, payload) in self._raw_matches(lowered):
+            start = end - length
+            if start > 0 and lowered[start - 1].isalnum():
+                continue
+            if end < len(lowered) and lowered[end].isalnum():
+                continue
+            if case_sensitive and text[start:end] != pattern:
+                continue
+            yield start, end, payload
+
+class Gazetteer:
+    """Company and sector keyword scanner built from a listing"""
+
+    def __init__(self, listings, sector_keywords=SECTOR_KEYWORDS):
+        self.companies = {company["symbol"]: company for company in listings}
+        self._automaton = Automaton()
+        for keyword in sector_keywords:
+            self._automaton.add(keyword, ("sector", keyword))
+        for company in listings:
+            names = [company["name"], company["symbol"]] + company["aliases"]
+            for name in names:
+                self._automaton.add(name, ("company", company["symbol"]))
+
+    def scan(self, text):
+        """Companies (by symbol) and sector keywords mentioned in text"""
+        companies, sectors = {}, set()
+        for _, _, (kind, value) in self._automaton.find(text):
+            if kind == "company":
+                companies[value] = companies.get(value, 0) + 1
+            else:
+                sectors.add(value)
+        return {"companies": companies, "sectors": sectors}
+
+    def hints(self, text):
+        """Names of listed companies mentioned in text, most mentioned first"""
+        companies = self.scan(text)["companies"]
+        ranked = sorted(companies, key=companies.get, reverse=True)
+        return [self.companies[symbol]["name"] for symbol in ranked]
+
+    def is_relevant(self, text):
+        """Whether text mentions any listed company or sector keyword"""
+        for _ in self._automaton.find(text):
+            return True
+        return False
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """Process-wide gazetteer, or None when disabled or no listing exists"""
+    global _gazetteer
+    if not GAZETTEER_ENABLED or not os.path.exists(GAZETTEER_CSV):
+        return None
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer(load_listings())
+    return _gazetteer
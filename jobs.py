@@ -0,0 +1,220 @@
+"""
+Background analysis jobs for the Streamlit app
+Streamlit reruns the whole script on every interaction, so analyses
+cannot run inline without freezing the session and losing work on a
+rerun. Instead each analysis is submitted to a process-wide worker pool
+as a Job with an id. The script only keeps job ids in session state and
+polls the jobs for progress, partial rows and results.
+
+    manager = JobManager()
+    job_id = manager.submit_url(url, api_key)
+    job = manager.get(job_id)  # job.status, job.stage, job.rows, job.result
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from analysis import stream_content
+from cascade import answering_model
+from client_pool import close_async_clients
+from core import extract_text
+from engine import analyze_many
+from entity_index import resolve_companies
+from fetcher import fetch
+from results_store import get_results_store
+from token_accounting import get_usage_tracker, track_usage
+from environment import JOB_HISTORY, JOB_WORKERS
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class Job:
+    """One analysis run by the worker pool
+
+    Workers update stage, progress and rows while the job runs; result
+    and error are set once it finishes. Readers get consistent copies of
+    rows through snapshot().
+    """
+
+    def __init__(self, job_id, kind, label, total=1):
+        self.id = job_id
+        self.kind = kind
+        self.label = label
+        self.status = QUEUED
+        self.stage = "Waiting for a worker"
+        self.done = 0
+        self.total = total
+        self.rows = []
+        self.content = None
+        self.result = None
+        self.usage = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def update(self, stage=None, done=None):
+        if stage is not None:
+            self.stage = stage
+        if done is not None:
+            self.done = done
+
+    def add_row(self, row):
+        with self._lock:
+            self.rows.append(row)
+
+    def snapshot(self):
+        """Rows produced so far"""
+        with self._lock:
+            return list(self.rows)
+
+def analyze_url_job(job, url, api_key):
+    """Scrape one page and stream its impacted companies into job.rows"""
+    job.update("Scraping webpage")
+    try:
+        content = extract_text(fetch(url))
+    except Exception as e:
+        raise RuntimeError(f"Error scraping webpage: {str(e)}") from e
+    if not content:
+        raise RuntimeError("Failed to retrieve webpage content")
+    job.content = content
+
+    job.update("Analyzing content with AI")
+    try:
+        with track_usage() as usage:
+            for company in stream_content(content, api_key):
+                job.add_row(company)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Error calling OpenAI API: {str(e)}") from e
+    if usage.requests:
+        get_usage_tracker().add_article(usage, content)
+        job.usage = usage.to_dict()
+
+    # Rows for the same company may arrive separately, merge them
+    companies = resolve_companies(job.snapshot())
+    store = get_results_store()
+    # Articles without impacts count towards trends too; gated ones never
+    # reached a model and are left out, as in the engine
+    if store and usage.models:
+        store.record(url, companies, model=answering_model(usage.models))
+    job.update("Analysis complete", done=1)
+    return companies
+
+def analyze_batch_job(job, urls, api_key):
+    """Run the async engine over urls, one job row per finished URL"""
+    job.update(f"Analyzing {len(urls)} links")
+
+    async def collect():
+        try:
+            async for result in analyze_many(urls, api_key):
+                job.add_row(result)
+                job.update(done=job.done + 1)
+        finally:
+            await close_async_clients()
+
+    asyncio.run(collect())
+    job.update("Batch complete")
+    return job.snapshot()
+
+class JobManager:
+    """Worker pool shared by every session of the app
+
+    At most `workers` jobs run at once, the rest wait in submission
+    order. Finished jobs are kept for polling until more than `history`
+    of them have accumulated, oldest dropped first.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, kind, label, fn, *args, total=1):
+        """Run fn(job, *args) in the pool and return the new job's id"""
+        with self._lock:
+            job = Job(f"{kind}-{next(self._ids)}", kind, label, total)
+            self._jobs[job.id] = job
+            self._evict()
+        job.future = self._pool.submit(self._run, job, fn, args)
+        return job.id
+
+    def submit_url(self, url, api_key):
+        return self.submit("url", url, analyze_url_job, url, api_key)
+
+    def submit_batch(self, urls, api_key):
+        label = f"{len(urls)} links"
+        return self.submit("batch", label, analyze_batch_job, urls, api_key, total=len(urls))
+
+    def _run(self, job, fn, args):
+        with job._lock:
+            if job.status == CANCELLED:
+                return
+            job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args)
+            status = DONE
+        except Exception as e:
+            job.error = str(e)
+            status = FAILED
+        # Everything a finished job shows is in place before its status says so
+        job.finished_at = time.time()
+        job.status = status
+
+    def get(self, job_id):
+        """Job by id, or None once it has been dropped"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started yet; running jobs finish"""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        with job._lock:
+            if job.status != QUEUED:
+                return False
+            job.status = CANCELLED
+        job.stage = "Cancelled"
+        job.finished_at = time.time()
+        job.future.cancel()
+        return True
+
+    def _evict(self):
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.id]
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "queued": sum(job.status == QUEUED for job in jobs),
+            "running": sum(job.status == RUNNING for job in jobs),
+            "finished": sum(job.finished for job in jobs),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
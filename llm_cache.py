@@ -0,0 +1,163 @@
+"""
+Persistent cache for LLM impact analysis results
+Stores validated ImpactRecord lists in SQLite, keyed on a hash of the cleaned
+content together with every setting that changes the model output.
+
+Repeat analyses of the same article (another user pasting the same link,
+a Streamlit rerun, a batch retry) are answered from disk instead of
+calling OpenAI again.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from core import ANALYSIS_SYSTEM_PROMPT
+from metrics import count
+from records import dumps, from_dicts, loads, to_dicts
+from environment import (
+    CASCADE_MODELS,
+    DEFAULT_PROMPT_TEMPLATE,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    OPENAI_MODEL,
+    OPENAI_TEMPERATURE,
+)
+
+EVICT_EVERY = 32  # Run eviction on every Nth write
+
+def _clean(content):
+    """Normalise whitespace so cosmetic differences share a cache entry"""
+    return ' '.join(content.split())
+
+def cache_key(content, model=OPENAI_MODEL, temperature=OPENAI_TEMPERATURE, template=DEFAULT_PROMPT_TEMPLATE,
+              cascade=CASCADE_MODELS):
+    """Content-addressed key for an analysis request
+
+    The model cascade's tiers are part of the key, so answers are never
+    reused across cascade settings; without one, keys are unchanged.
+    """
+    digest = hashlib.sha256()
+    models = ",".join((model, *cascade))
+    for part in (models, repr(float(temperature)), ANALYSIS_SYSTEM_PROMPT, template, _clean(content)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class ResultCache:
+    """SQLite-backed result cache with TTL and LRU eviction
+
+    ttl is in seconds (0 disables expiry); max_entries bounds the number
+    of stored results, evicting the least recently used ones first.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " model TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(results)")]
+        if "model" not in columns:
+            self._conn.execute("ALTER TABLE results ADD COLUMN model TEXT")  # NULL: answered by OPENAI_MODEL
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)")
+
+    def get(self, content):
+        """Return (company list, model that answered) for content, or None on a miss"""
+        key = cache_key(content)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, model FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and self.ttl and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self.misses += 1
+                count("llm_cache_misses")
+                return None
+
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        count("llm_cache_hits")
+        return from_dicts(loads(row[0])), row[2] or OPENAI_MODEL
+
+    def put(self, content, companies, model=OPENAI_MODEL):
+        """Store the company list for content and evict old entries"""
+        key = cache_key(content)
+        now = time.time()
+        value = dumps(to_dicts(companies))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created_at, last_used, model) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, now, model)
+            )
+            # Trimming scans the LRU index, so only do it every few writes
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 1:
+                self._evict()
+
+    def _evict(self):
+        """Drop expired entries and trim to max_entries by last use"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl,))
+        if self.max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """Remove every cached result"""
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def stats(self):
+        """Hit/miss counters for this process plus the stored entry count"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_result_cache():
+    """Process-wide result cache, or None when caching is disabled"""
+    global _default_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+    return _default_cache
@@ -0,0 +1,176 @@
+"""
+Per-stage instrumentation for News Impact Analyzer
+Times every stage an article passes through and counts what flows
+through them, so slowness can be traced to the page download, the HTML
+parse or OpenAI instead of guessed at.
+
+Stages:
+- fetch:            page download (including 304 revalidations)
+- parse:            HTML to element tree, decoding the page's charset
+- extract:          article paragraphs out of the tree
+- relevance:        local classifier score before any OpenAI request
+- prompt_build:     chat messages for one analysis request
+- rate_limit_wait:  time a request waits for RPM/TPM capacity
+- llm_call:         OpenAI request; time to first token for streams
+- json_decode:      completion to validated ImpactRecords
+
+Counters include page bytes, prompt/completion tokens, cache and
+near-duplicate hits, and retries. The latest METRICS_WINDOW timings per
+stage are kept in memory for the percentiles the app's sidebar shows.
+With `prometheus_client` installed everything is also exported as
+Prometheus metrics (GET /metrics on the API server, or METRICS_PORT for
+the other entry points); with the OpenTelemetry API installed and
+TRACING_ENABLED, each stage is a span exported by the process's SDK.
+Both are imported when the first stage is timed, not with this module.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from environment import METRICS_ENABLED, METRICS_PORT, METRICS_WINDOW, TRACING_ENABLED
+
+METRIC_PREFIX = "news_impact"
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+class Metrics:
+    """Stage timings and event counters of this process"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._samples = {}  # Stage -> latest durations in seconds
+        self._counts = {}  # Stage -> all-time observations
+        self._counters = {}
+        self._prometheus_counters = {}
+        self._lock = threading.Lock()
+
+        try:
+            import prometheus_client
+        except ImportError:  # In-memory metrics only
+            prometheus_client = None
+        self.prometheus = prometheus_client
+        self._histogram = None
+        if prometheus_client is not None:
+            self._histogram = prometheus_client.Histogram(
+                f"{METRIC_PREFIX}_stage_seconds", "Duration of each analysis stage",
+                ["stage"], buckets=LATENCY_BUCKETS
+            )
+
+        self.tracer = None
+        if TRACING_ENABLED:
+            try:
+                from opentelemetry import trace
+            except ImportError:  # No spans
+                trace = None
+            self.tracer = trace.get_tracer("news_impact_analyzer") if trace is not None else None
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+        if self._histogram is not None:
+            self._histogram.labels(stage).observe(seconds)
+
+    def count(self, event, amount=1):
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + amount
+            counter = self._prometheus_counters.get(event)
+            if counter is None and self.prometheus is not None:
+                counter = self._prometheus_counters[event] = self.prometheus.Counter(
+                    f"{METRIC_PREFIX}_{event}", event.replace("_", " ").capitalize()
+                )
+        if counter is not None:
+            counter.inc(amount)
+
+    def stats(self):
+        """Latency percentiles per stage over the window, plus all counters"""
+        with self._lock:
+            samples = {stage: list(durations) for stage, durations in self._samples.items()}
+            counts = dict(self._counts)
+            counters = dict(self._counters)
+        stages = {}
+        for stage, durations in samples.items():
+            stages[stage] = {
+                "count": counts[stage],
+                "p50_ms": percentile(durations, 50) * 1000,
+                "p95_ms": percentile(durations, 95) * 1000,
+                "p99_ms": percentile(durations, 99) * 1000,
+            }
+        return {"stages": stages, "counters": counters}
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    """Process-wide metrics, or None when instrumentation is disabled"""
+    global _metrics
+    if not METRICS_ENABLED:
+        return None
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+            if METRICS_PORT and _metrics.prometheus is not None:
+                try:
+                    _metrics.prometheus.start_http_server(METRICS_PORT)
+                except OSError as e:  # Another process already serves the port
+                    print(f"⚠️  Warning: Prometheus metrics not served on port {METRICS_PORT}: {e}")
+    return _metrics
+
+@contextmanager
+def stage(name):
+    """Time the block as one run of stage name (failures are counted too)"""
+    metrics = get_metrics()
+    if metrics is None:
+        yield
+        return
+    span = metrics.tracer.start_as_current_span(name) if metrics.tracer else nullcontext()
+    start = time.perf_counter()
+    try:
+        with span:
+            yield
+    except BaseException:
+        metrics.count(f"{name}_errors")
+        raise
+    finally:
+        metrics.observe(name, time.perf_counter() - start)
+
+def count(event, amount=1):
+    """Add amount to counter event, and note it on the current span"""
+    metrics = get_metrics()
+    if metrics is None or not amount:
+        return
+    metrics.count(event, amount)
+    if metrics.tracer:
+        from opentelemetry import trace
+
+        trace.get_current_span().set_attribute(event, amount)
+
+def prometheus_text():
+    """(body, content type) of the Prometheus exposition, or None without prometheus_client
+
+    With PROMETHEUS_MULTIPROC_DIR set, the metrics of every worker
+    process are aggregated.
+    """
+    metrics = get_metrics()  # Registers the stage histogram before the first analysis
+    prometheus_client = metrics.prometheus if metrics else None
+    if prometheus_client is None:
+        return None
+    registry = prometheus_client.REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,186 @@
+"""
+Request packing for short articles
+Market briefs are often a few hundred characters, so the system message
+and prompt template cost more tokens than the article itself. Short
+articles are grouped, up to PACK_TOKEN_BUDGET, into one prompt where
+each article carries an id (A1, A2, ...). The JSON object that comes
+back is split into per-article company lists again.
+
+When a packed response cannot be parsed, or leaves articles out, those
+articles fall back to individual requests, so packing never loses an
+analysis.
+"""
+
+import asyncio
+from chunking import count_tokens
+from core import SYSTEM_PROMPT, company_hints
+from metrics import stage
+from records import ImpactRecord, decode_json, packed_response_format
+from token_accounting import attach_scopes, completion_budget, current_scopes, track_usage
+from environment import (
+    DYNAMIC_MAX_TOKENS,
+    OPENAI_MAX_TOKENS,
+    PACK_MAX_ARTICLE_TOKENS,
+    PACK_MAX_ARTICLES,
+    PACK_MAX_WAIT,
+    PACK_OUTPUT_TOKENS_PER_ARTICLE,
+    PACK_TOKEN_BUDGET,
+    PACKED_ANALYSIS_INSTRUCTIONS,
+    PACKED_PROMPT_TEMPLATE,
+)
+
+ESCALATE = object()  # analyze_pack result for an answer the model cascade doubted
+
+def is_packable(content):
+    """True for articles short enough to share a request"""
+    return count_tokens(content) <= PACK_MAX_ARTICLE_TOKENS
+
+def article_ids(count):
+    return [f"A{i + 1}" for i in range(count)]
+
+def build_packed_messages(contents):
+    """Build the chat messages for several articles in one request"""
+    with stage("prompt_build"):
+        blocks = []
+        for article_id, content in zip(article_ids(len(contents)), contents):
+            block = f'<article id="{article_id}">\n{content}\n'
+            hints = company_hints(content)
+            if hints:
+                block += "Listed companies mentioned in this article: " + ", ".join(hints) + "\n"
+            blocks.append(block + "</article>")
+        prompt = PACKED_PROMPT_TEMPLATE.format(articles="\n\n".join(blocks))
+    return [
+        # Instructions first, so packed requests share a cacheable prefix
+        {"role": "system", "content": SYSTEM_PROMPT + "\n" + PACKED_ANALYSIS_INSTRUCTIONS},
+        {"role": "user", "content": prompt}
+    ]
+
+def packed_max_tokens(contents):
+    """Completion budget for a packed request of these articles"""
+    if DYNAMIC_MAX_TOKENS:
+        return sum(completion_budget(content) for content in contents)
+    return max(OPENAI_MAX_TOKENS, PACK_OUTPUT_TOKENS_PER_ARTICLE * len(contents))
+
+def packed_request_kwargs(count):
+    """Extra request parameters for a packed request of count articles"""
+    return {"response_format": packed_response_format(article_ids(count))}
+
+def parse_packed_response(result, count):
+    """Split a packed completion into per-article ImpactRecord lists
+
+    Returns a list with one entry per article: its records, or None when
+    the response has no valid entry for it. Raises ValueError when the
+    completion contains no JSON object at all.
+    """
+    with stage("json_decode"):
+        if not result or not result.strip():
+            raise ValueError("Empty response from OpenAI API")
+        payload = decode_json(result)
+        if not isinstance(payload, dict):
+            raise ValueError("Could not parse LLM response as JSON")
+
+        companies = []
+        for article_id in article_ids(count):
+            entry = payload.get(article_id)
+            try:
+                if not isinstance(entry, list):
+                    raise ValueError("missing article")
+                companies.append([ImpactRecord.from_dict(row) for row in entry])
+            except ValueError:
+                companies.append(None)  # Analyzed again on its own
+        return companies
+
+class Packer:
+    """Collects short articles on an event loop and analyzes them in packs
+
+    analyze_pack(contents) returns per-article company lists (None for
+    articles it could not answer, ESCALATE for doubtful answers);
+    analyze_single(content) is the regular one-article analysis used for
+    lone articles and fallbacks, escalate(content) re-analyzes doubtful
+    ones. Token usage of a pack is shared equally by its articles' usage
+    scopes; fallbacks and escalations count towards their article only.
+    """
+
+    def __init__(self, analyze_pack, analyze_single, escalate=None, budget=PACK_TOKEN_BUDGET,
+                 max_articles=PACK_MAX_ARTICLES, max_wait=PACK_MAX_WAIT):
+        self.analyze_pack = analyze_pack
+        self.analyze_single = analyze_single
+        self.escalate = escalate
+        self.budget = budget
+        self.max_articles = max_articles
+        self.max_wait = max_wait
+        self.packs = 0
+        self.packed_articles = 0
+        self.fallbacks = 0
+        self._pending = []
+        self._tokens = 0
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, content):
+        """Analyze content as part of a pack and return its companies"""
+        tokens = count_tokens(content)
+        if self._pending and self._tokens + tokens > self.budget:
+            self._flush()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((content, future, current_scopes()))
+        self._tokens += tokens
+        if len(self._pending) >= self.max_articles:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._tokens = self._pending, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        contents = [content for content, _, _ in batch]
+        results = [None] * len(batch)
+        if len(batch) > 1:
+            with track_usage(isolated=True) as usage:
+                try:
+                    results = await self.analyze_pack(contents)
+                    self.packs += 1
+                except ValueError:
+                    pass  # Unparseable pack, every article is retried alone
+                except Exception as e:
+                    for _, future, _ in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    return
+                finally:
+                    for _, _, scopes in batch:
+                        for scope in scopes:
+                            scope.add(usage, share=1 / len(batch))
+
+        async def resolve(content, future, scopes, companies):
+            try:
+                if companies is ESCALATE:
+                    with attach_scopes(scopes):
+                        companies = await self.escalate(content)
+                elif companies is None:
+                    if len(batch) > 1:
+                        self.fallbacks += 1
+                    with attach_scopes(scopes):
+                        companies = await self.analyze_single(content)
+                else:
+                    self.packed_articles += 1
+                if not future.done():
+                    future.set_result(companies)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+        await asyncio.gather(*(
+            resolve(content, future, scopes, companies)
+            for (content, future, scopes), companies in zip(batch, results)
+        ))
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Queue workers for News Impact Analyzer backfills
+Splits analysis into three stages on the durable work queue
+(work_queue.py), each with its own pool of worker processes:
+
+- fetch:    page downloads, I/O-bound: FETCH_CONCURRENCY per process
+- extract:  HTML parsing, CPU-bound: one article at a time per process,
+            so parsing scales with processes instead of fighting the GIL
+- analyze:  OpenAI requests, I/O-bound: 2 x LLM_CONCURRENCY per process,
+            through the engine's Analyzer (cache, dedup, packing)
+
+Throughput grows with the number of workers of the slowest stage; add
+processes, or machines pointed at the same queue, until OpenAI rate
+limits are the bottleneck. The rate limiter is per process, so divide
+OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT between analyze workers.
+
+Usage:
+    python queue_worker.py enqueue urls.txt              # Idempotent: queued URLs are not added twice
+    python queue_worker.py work                          # QUEUE_*_WORKERS processes per stage
+    python queue_worker.py work --fetch 4 --extract 2 --analyze 0 --drain
+    python queue_worker.py status
+    python queue_worker.py export -o results.jsonl
+    python queue_worker.py retry-failed
+    python queue_worker.py serve                         # Broker for workers on other machines
+
+Every command reads QUEUE_PATH, or the broker at QUEUE_URL when set.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+from environment import (
+    FETCH_CONCURRENCY,
+    LLM_CONCURRENCY,
+    OPENAI_API_KEY,
+    QUEUE_ANALYZE_WORKERS,
+    QUEUE_BROKER_HOST,
+    QUEUE_BROKER_PORT,
+    QUEUE_EXTRACT_WORKERS,
+    QUEUE_FETCH_WORKERS,
+    QUEUE_PATH,
+    QUEUE_POLL_INTERVAL,
+    QUEUE_URL,
+    QUEUE_VISIBILITY_TIMEOUT,
+)
+from work_queue import QueueBroker, WorkQueue, open_queue
+
+FETCH = "fetch"
+EXTRACT = "extract"
+ANALYZE = "analyze"
+STAGES = (FETCH, EXTRACT, ANALYZE)
+EXTRACT_BATCH = 4  # Extract tasks leased at once, parsed one after another
+ENQUEUE_BATCH = 1000  # URLs per enqueue transaction
+PROGRESS_INTERVAL = 10  # Seconds between status lines of `work`
+ERROR_BACKOFF_MAX = 30  # Seconds between polls while the queue keeps failing
+
+def _permanent(error):
+    """Failures a retry cannot fix: HTTP client errors other than timeouts and rate limits"""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+async def _call(function, *args, **kwargs):
+    """Queue operation off the event loop (SQLite or broker round trip)"""
+    return await asyncio.to_thread(function, *args, **kwargs)
+
+async def _process(queue, task, handle):
+    """Run one leased task and report the outcome to the queue"""
+    try:
+        outcome = await handle(task)
+    except Exception as e:
+        outcome = None
+        error = e
+    try:
+        if outcome is None:
+            await _call(queue.fail, task.id, task.lease, str(error) or type(error).__name__, not _permanent(error))
+        elif not await _call(queue.complete, task.id, task.lease, **outcome):
+            print(f"⚠️  Lease of {task.stage} task {task.id} expired, its result was dropped", file=sys.stderr)
+    except Exception as e:  # The lease expires and the task is handed out again
+        print(f"⚠️  Could not report {task.stage} task {task.id} to the queue: {e}", file=sys.stderr)
+
+async def _heartbeat(queue, running):
+    """Extend the leases of running tasks well before they expire
+
+    A failed extension is tried again on the next beat; a lease already
+    lost to another worker is not extended any more.
+    """
+    lost = set()
+    while True:
+        await asyncio.sleep(QUEUE_VISIBILITY_TIMEOUT / 3)
+        tasks = list(running.values())
+        lost &= {task.id for task in tasks}
+        for task in tasks:
+            if task.id in lost:
+                continue
+            try:
+                if not await _call(queue.extend, task.id, task.lease, QUEUE_VISIBILITY_TIMEOUT):
+                    lost.add(task.id)
+            except Exception as e:
+                print(f"⚠️  Could not extend the lease of {task.stage} task {task.id}: {e}", file=sys.stderr)
+
+async def serve_stage(queue, stage, handle, concurrency, drain=False):
+    """Keep up to concurrency tasks of stage running through handle(task)
+
+    handle returns the keyword arguments of queue.complete. With drain,
+    return once this stage and every stage before it has no pending task.
+    """
+    upstream = STAGES[:STAGES.index(stage) + 1]
+    running = {}  # asyncio task -> queue Task
+    wake = asyncio.Event()
+
+    def finished(job):
+        running.pop(job, None)
+        wake.set()
+
+    heartbeat = asyncio.create_task(_heartbeat(queue, running))
+    errors = 0
+    try:
+        while True:
+            free = concurrency - len(running)
+            try:
+                leased = await _call(queue.lease, stage, free, QUEUE_VISIBILITY_TIMEOUT) if free > 0 else []
+                idle = not leased and not running
+                drained = idle and drain and not await _call(queue.pending, upstream)
+                errors = 0
+            except Exception as e:  # Busy database or unreachable broker: keep polling
+                errors += 1
+                leased, drained = [], False
+                print(f"⚠️  {stage} worker could not reach the queue: {e}", file=sys.stderr)
+            for task in leased:
+                job = asyncio.create_task(_process(queue, task, handle))
+                running[job] = task
+                job.add_done_callback(finished)
+            if leased:
+                continue  # Fill the remaining slots before waiting
+            if drained:
+                return
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), min(ERROR_BACKOFF_MAX, QUEUE_POLL_INTERVAL * 2 ** errors))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        heartbeat.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+async def run_stage(queue, stage, drain=False, api_key=OPENAI_API_KEY, include_content=False):
+    """Serve one stage in this process until drained (or forever)"""
+    if stage == FETCH:
+        import httpx
+        from fetcher import fetch_async, get_http_cache
+        from environment import REQUEST_TIMEOUT, USER_AGENT
+
+        cache = get_http_cache()
+        limits = httpx.Limits(max_connections=FETCH_CONCURRENCY, max_keepalive_connections=FETCH_CONCURRENCY)
+        async with httpx.AsyncClient(headers={'User-Agent': USER_AGENT}, timeout=REQUEST_TIMEOUT,
+                                     follow_redirects=True, limits=limits) as http:
+            async def fetch_page(task):
+                body = await fetch_async(http, task.key, cache)
+                return {"next_stage": EXTRACT, "payload": {"url": task.key}, "body": body}
+
+            await serve_stage(queue, FETCH, fetch_page, FETCH_CONCURRENCY, drain)
+
+    elif stage == EXTRACT:
+        from core import extract_text
+
+        async def extract_page(task):
+            if task.body is None:
+                raise ValueError("Fetched page is missing from the queue")
+            # Parsed on the loop thread: this process exists to give parsing its own CPU
+            content = extract_text(task.body)
+            return {"next_stage": ANALYZE, "payload": {"url": task.key, "content": content}}
+
+        await serve_stage(queue, EXTRACT, extract_page, EXTRACT_BATCH, drain)
+
+    elif stage == ANALYZE:
+        from batch_cli import to_record
+        from client_pool import close_async_clients
+        from engine import Analyzer
+
+        analyzer = Analyzer(api_key, llm_concurrency=LLM_CONCURRENCY)
+
+        async def analyze_article(task):
+            content = task.payload["content"]
+            result = await analyzer.analyze_text(content, task.key)
+            if result["error"] and content:
+                raise RuntimeError(result["error"])  # Retried; an empty page is a final answer
+            return {"result": to_record(result, include_content)}
+
+        try:
+            # Twice the request slots, so short articles can be packed together
+            await serve_stage(queue, ANALYZE, analyze_article, 2 * LLM_CONCURRENCY, drain)
+        finally:
+            await analyzer.aclose()
+            await close_async_clients()
+
+    else:
+        raise ValueError(f"Unknown stage {stage!r}, expected one of {', '.join(STAGES)}")
+
+def _worker(stage, url, path, drain, api_key, include_content):
+    """Entry point of one worker process"""
+    queue = open_queue(url, path)
+    try:
+        asyncio.run(run_stage(queue, stage, drain, api_key, include_content))
+    except KeyboardInterrupt:
+        pass  # Leases of unfinished tasks expire and other workers take them over
+    finally:
+        queue.close()
+
+def format_stats(stats):
+    """One status line per stage"""
+    return [
+        f"{stage:<8} queued {counts['queued']:>7} · leased {counts['leased']:>5} · "
+        f"done {counts['done']:>7} · failed {counts['failed']:>5}"
+        for stage in STAGES if (counts := stats.get(stage))
+    ]
+
+def run_pools(workers, url, path, drain=False, api_key=OPENAI_API_KEY, include_content=False):
+    """Start workers[stage] processes per stage and wait for them"""
+    # Spawned, not forked: every worker opens its own SQLite connection and clients
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker, args=(stage, url, path, drain, api_key, include_content),
+                        name=f"{stage}-{number}")
+        for stage in STAGES for number in range(workers[stage])
+    ]
+    for process in processes:
+        process.start()
+    print(f"🚀 {len(processes)} workers: " + ", ".join(f"{workers[stage]} {stage}" for stage in STAGES))
+
+    queue = open_queue(url, path)
+    try:
+        while any(process.is_alive() for process in processes):
+            for process in processes:
+                process.join(timeout=PROGRESS_INTERVAL / len(processes))
+            for line in format_stats(queue.stats()):
+                print(f"⏳ {line}")
+    except KeyboardInterrupt:
+        print("\n⏸️  Stopping workers; leased tasks return to the queue after their timeout")
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+    finally:
+        queue.close()
+
+def main():
+    from batch_cli import read_urls
+
+    parser = argparse.ArgumentParser(description="Durable multi-process queue for large backfills")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="Queue file (default: QUEUE_PATH)")
+    parser.add_argument("--url", default=QUEUE_URL, help="Queue broker URL instead of the file (default: QUEUE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Add URLs to the fetch stage")
+    enqueue.add_argument("input", nargs="?", default="-", help="File with one URL per line, or - for stdin")
+
+    work = commands.add_parser("work", help="Run worker pools on this machine")
+    work.add_argument("--fetch", type=int, default=QUEUE_FETCH_WORKERS, help="Fetch worker processes")
+    work.add_argument("--extract", type=int, default=QUEUE_EXTRACT_WORKERS, help="Extract worker processes")
+    work.add_argument("--analyze", type=int, default=QUEUE_ANALYZE_WORKERS, help="Analyze worker processes")
+    work.add_argument("--drain", action="store_true", help="Exit once the queue has no more work for a stage")
+    work.add_argument("--api-key", default=OPENAI_API_KEY, help="OpenAI API key (default: OPENAI_API_KEY)")
+    work.add_argument("--include-content", action="store_true", help="Keep extracted article text in the results")
+
+    commands.add_parser("status", help="Tasks per stage and recent failures")
+
+    export = commands.add_parser("export", help="Write analysis results as JSON lines")
+    export.add_argument("-o", "--output", default="-", help="JSONL output file, or - for stdout")
+
+    retry = commands.add_parser("retry-failed", help="Queue failed tasks again")
+    retry.add_argument("--stage", choices=STAGES, help="Only this stage")
+
+    serve = commands.add_parser("serve", help="Serve the queue file to workers on other machines")
+    serve.add_argument("--host", default=QUEUE_BROKER_HOST, help="Interface to listen on (default: QUEUE_BROKER_HOST)")
+    serve.add_argument("--port", type=int, default=QUEUE_BROKER_PORT, help="Port (default: QUEUE_BROKER_PORT)")
+    args = parser.parse_args()
+
+    if args.command == "work":
+        if args.analyze and args.api_key == "your_openai_api_key_here":
+            print("❌ OpenAI API key not configured. Set OPENAI_API_KEY or pass --api-key", file=sys.stderr)
+            sys.exit(1)
+        workers = {FETCH: args.fetch, EXTRACT: args.extract, ANALYZE: args.analyze}
+        run_pools(workers, args.url, args.queue, args.drain, args.api_key, args.include_content)
+        return
+
+    if args.command == "serve":
+        broker = QueueBroker(WorkQueue(args.queue), args.host, args.port)
+        print(f"📡 Serving {args.queue} at {broker.url}")
+        try:
+            broker.serve_forever()
+        except KeyboardInterrupt:
+            broker.stop()
+        return
+
+    queue = open_queue(args.url, args.queue)
+    try:
+        if args.command == "enqueue":
+            source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+            added = total = 0
+            with source:
+                batch = []
+                for url in read_urls(source):
+                    batch.append((url, {"url": url}))
+                    if len(batch) == ENQUEUE_BATCH:
+                        added += queue.put(FETCH, batch)
+                        total += len(batch)
+                        batch = []
+                if batch:
+                    added += queue.put(FETCH, batch)
+                    total += len(batch)
+            print(f"📥 Queued {added} new URLs ({total - added} already in the queue)")
+
+        elif args.command == "status":
+            lines = format_stats(queue.stats())
+            print("\n".join(lines) if lines else "📭 Queue is empty")
+            for stage, key, error in queue.failures()[-10:]:
+                print(f"❌ {stage} {key}: {error}")
+
+        elif args.command == "export":
+            output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+            exported, after = 0, 0
+            try:
+                while True:
+                    rows = queue.results(ANALYZE, after)
+                    if not rows:
+                        break
+                    for after, record in rows:
+                        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    exported += len(rows)
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+            print(f"📤 Exported {exported} results", file=sys.stderr)
+
+        elif args.command == "retry-failed":
+            print(f"🔁 Queued {queue.retry_failed(args.stage)} failed tasks again")
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
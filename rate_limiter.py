@@ -0,0 +1,289 @@
+"""
+Rate-limit-aware scheduling for OpenAI requests
+Every chat completion goes through one process-wide scheduler that
+keeps request and token usage just under the account limits
+(OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT scaled by RATE_LIMIT_HEADROOM).
+
+- Two token buckets, refilled continuously: requests and tokens. A
+  request costs its prompt tokens plus max_tokens up front; the unused
+  part is refunded once the response reports actual usage.
+- Priority lanes: INTERACTIVE (the Streamlit UI) goes ahead of BATCH
+  (engine, CLI, feed poller), which goes ahead of BACKGROUND (articles
+  the relevance classifier deferred). Each lane waits while a higher
+  one has requests queued, and only INTERACTIVE may spend the last
+  RATE_LIMIT_INTERACTIVE_RESERVE share of either bucket.
+- 429s and transient errors are retried with full-jitter exponential
+  backoff. A Retry-After header pauses every lane for that long, since
+  the limit is shared by the whole account.
+
+The OpenAI clients are created with max_retries=0 so retries happen here.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from core import completion_kwargs
+from metrics import count, stage
+from token_accounting import count_message_tokens, record_response
+from environment import (
+    OPENAI_BACKOFF_BASE,
+    OPENAI_BACKOFF_MAX,
+    OPENAI_MAX_RETRIES,
+    OPENAI_RPM_LIMIT,
+    OPENAI_TPM_LIMIT,
+    RATE_LIMIT_HEADROOM,
+    RATE_LIMIT_INTERACTIVE_RESERVE,
+)
+
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+LANES = (INTERACTIVE, BATCH, BACKGROUND)
+
+BURST_SECONDS = 10  # Bucket capacity, in seconds of sustained rate
+PREEMPTED_WAIT = 0.05  # Recheck interval for lanes held back by higher priority work
+
+class _Bucket:
+    """Continuously refilled token bucket; rate 0 means unlimited"""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+
+    def refill(self, elapsed):
+        if self.rate:
+            self.level = min(self.capacity, self.level + elapsed * self.rate)
+
+    def wait_for(self, amount):
+        """Seconds until the bucket holds amount (0 if it already does)"""
+        if not self.rate or self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+class RateLimiter:
+    """Request and token buckets with priority lanes, shared by threads and event loops"""
+
+    def __init__(self, rpm=OPENAI_RPM_LIMIT, tpm=OPENAI_TPM_LIMIT, headroom=RATE_LIMIT_HEADROOM,
+                 interactive_reserve=RATE_LIMIT_INTERACTIVE_RESERVE):
+        self.requests = _Bucket(rpm * headroom)
+        self.tokens = _Bucket(tpm * headroom)
+        self.interactive_reserve = interactive_reserve
+        self.paused_until = 0.0
+        self.throttled = 0  # 429 responses received
+        self.retries = 0
+        self._waiting = {lane: 0 for lane in LANES}
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self.requests.refill(elapsed)
+        self.tokens.refill(elapsed)
+
+    def cost(self, tokens):
+        """Token cost clamped so a single request always fits the bucket"""
+        if not self.tokens.rate:
+            return tokens
+        return min(tokens, self.tokens.capacity * (1 - self.interactive_reserve))
+
+    def try_acquire(self, tokens, priority):
+        """Take capacity for one request, or return the seconds to wait first"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                return self.paused_until - now
+            if any(self._waiting[lane] for lane in LANES if lane < priority):
+                return PREEMPTED_WAIT
+
+            reserve = 0.0 if priority == INTERACTIVE else self.interactive_reserve
+            # Never more than a full bucket, or a tiny limit would hold lower lanes back forever
+            need_requests = min(1 + reserve * self.requests.capacity, self.requests.capacity) if self.requests.rate else 1
+            need_tokens = min(tokens + reserve * self.tokens.capacity, self.tokens.capacity) if self.tokens.rate else tokens
+            wait = max(self.requests.wait_for(need_requests), self.tokens.wait_for(need_tokens))
+            if wait:
+                return wait
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            return 0.0
+
+    def settle(self, reserved, used):
+        """Refund the difference between reserved and actually used tokens"""
+        if used is None or not self.tokens.rate:
+            return
+        with self._lock:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + reserved - used)
+
+    def pause(self, seconds):
+        """Hold back every lane, e.g. for a Retry-After from the API"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _queue(self, priority, delta):
+        with self._lock:
+            self._waiting[priority] += delta
+
+    def acquire(self, tokens, priority=INTERACTIVE):
+        """Block the calling thread until the request may be sent"""
+        wait = self.try_acquire(tokens, priority)
+        if not wait:
+            return
+        self._queue(priority, 1)
+        try:
+            while wait:
+                time.sleep(wait)
+                wait = self.try_acquire(tokens, priority)
+        finally:
+            self._queue(priority, -1)
+
+    async def acquire_async(self, tokens, priority=BATCH):
+        """Wait on the event loop until the request may be sent"""
+        wait = self.try_acquire(tokens, priority)
+        if not wait:
+            return
+        self._queue(priority, 1)
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self.try_acquire(tokens, priority)
+        finally:
+            self._queue(priority, -1)
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "requests_available": self.requests.level if self.requests.rate else None,
+                "tokens_available": self.tokens.level if self.tokens.rate else None,
+                "waiting": dict(self._waiting),
+            }
+
+def retry_after(error):
+    """Seconds requested by the API's Retry-After headers, if any"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass  # HTTP-date form, fall back to backoff
+    return None
+
+def _backoff_delay(limiter, error, attempt):
+    """Delay before retry `attempt`, or None when the error is final"""
+    import openai  # Already loaded by the client that raised error
+
+    retryable = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+    if not isinstance(error, retryable) or attempt >= OPENAI_MAX_RETRIES:
+        return None
+    if isinstance(error, openai.RateLimitError):
+        if getattr(error, 'code', None) == 'insufficient_quota':
+            return None  # Billing problem, retrying will not help
+        limiter.throttled += 1
+    limiter.retries += 1
+
+    delay = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * 2 ** attempt))
+    requested = retry_after(error)
+    if requested is not None:
+        limiter.pause(requested)
+        delay = max(delay, requested)
+    return delay
+
+def estimate_tokens(messages, max_tokens):
+    """Upper bound on the tokens a request can consume"""
+    return count_message_tokens(messages) + max_tokens
+
+def _usage(response):
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'total_tokens', None)
+
+def _settled_stream(stream, limiter, tokens):
+    """Pass a streamed response through, settling tokens on its final usage chunk"""
+    for chunk in stream:
+        used = _usage(chunk)
+        if used is not None:
+            limiter.settle(tokens, used)
+        yield chunk
+
+async def _settled_stream_async(stream, limiter, tokens):
+    async for chunk in stream:
+        used = _usage(chunk)
+        if used is not None:
+            limiter.settle(tokens, used)
+        yield chunk
+
+def create_completion(client, messages, priority=INTERACTIVE, **kwargs):
+    """client.chat.completions.create with rate limiting and retries"""
+    limiter = get_rate_limiter()
+    request = {**completion_kwargs(), **kwargs}
+    tokens = limiter.cost(estimate_tokens(messages, request["max_tokens"]))
+    attempt = 0
+    while True:
+        with stage("rate_limit_wait"):
+            limiter.acquire(tokens, priority)
+        try:
+            with stage("llm_call"):
+                response = client.chat.completions.create(messages=messages, **request)
+        except Exception as e:
+            limiter.settle(tokens, 0)
+            delay = _backoff_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+            attempt += 1
+            count("llm_retries")
+            time.sleep(delay)
+            continue
+        if request.get("stream"):
+            # Usage arrives with the last chunk (stream_options include_usage)
+            return _settled_stream(response, limiter, tokens)
+        limiter.settle(tokens, _usage(response))
+        record_response(response, request["model"])
+        return response
+
+async def create_completion_async(client, messages, priority=BATCH, **kwargs):
+    """Async counterpart of create_completion for an AsyncOpenAI client"""
+    limiter = get_rate_limiter()
+    request = {**completion_kwargs(), **kwargs}
+    tokens = limiter.cost(estimate_tokens(messages, request["max_tokens"]))
+    attempt = 0
+    while True:
+        with stage("rate_limit_wait"):
+            await limiter.acquire_async(tokens, priority)
+        try:
+            with stage("llm_call"):
+                response = await client.chat.completions.create(messages=messages, **request)
+        except Exception as e:
+            limiter.settle(tokens, 0)
+            delay = _backoff_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+            attempt += 1
+            count("llm_retries")
+            await asyncio.sleep(delay)
+            continue
+        if request.get("stream"):
+            # Usage arrives with the last chunk (stream_options include_usage)
+            return _settled_stream_async(response, limiter, tokens)
+        limiter.settle(tokens, _usage(response))
+        record_response(response, request["model"])
+        return response
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Process-wide scheduler shared by every OpenAI client"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+    return _limiter
@@ -0,0 +1,246 @@
+"""
+Typed impact records and LLM output decoding
+ImpactRecord is the in-memory form of one impacted company: a
+__slots__ class validated against IMPACT_SCORE_RANGE, IMPACT_TYPES and
+LISTED_OPTIONS, a fraction of the size of the equivalent dict. The
+familiar JSON rows with spaced keys ("company name", "impact score", ...)
+are only produced at the edges: caches, downloads and JSON output.
+
+Completions are decoded with orjson when it is installed and never by
+a greedy regex; invalid entries are reported alongside the valid ones
+so callers can ask the model to repair just those.
+"""
+
+import json
+from metrics import stage
+from environment import (
+    IMPACT_SCORE_RANGE,
+    IMPACT_TYPES,
+    LISTED_OPTIONS,
+    STRUCTURED_OUTPUT,
+)
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library decoder
+    orjson = None
+
+# Attribute name -> JSON key
+FIELDS = {
+    "company_name": "company name",
+    "impact_type": "impact type",
+    "company_industry": "company industry",
+    "impact_score": "impact score",
+    "listed": "listed",
+    "ticker": "ticker",
+    "isin": "isin",
+}
+MAX_DECODE_ATTEMPTS = 16  # Bracket positions tried when JSON is embedded in prose
+LISTED_ALIASES = {"YES": "Y", "NO": "N", "TRUE": "Y", "FALSE": "N"}
+
+COMPANY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "company name": {"type": "string"},
+        "impact type": {"type": "string", "enum": list(IMPACT_TYPES)},
+        "company industry": {"type": "string"},
+        "impact score": {"type": "integer", "minimum": IMPACT_SCORE_RANGE[0], "maximum": IMPACT_SCORE_RANGE[1]},
+        "listed": {"type": "string", "enum": list(LISTED_OPTIONS)},
+    },
+    "required": ["company name", "impact type", "company industry", "impact score", "listed"],
+    "additionalProperties": False,
+}
+
+class ImpactRecord:
+    """One company impacted by an article"""
+
+    __slots__ = tuple(FIELDS)
+
+    def __init__(self, company_name, impact_type, company_industry, impact_score, listed, ticker="", isin=""):
+        self.company_name = company_name
+        self.impact_type = impact_type
+        self.company_industry = company_industry
+        self.impact_score = impact_score
+        self.listed = listed
+        self.ticker = ticker
+        self.isin = isin
+
+    @classmethod
+    def from_dict(cls, row):
+        """Validate a JSON row from the LLM or a cache
+
+        Raises ValueError naming the offending field.
+        """
+        if not isinstance(row, dict):
+            raise ValueError("entry is not a JSON object")
+
+        name = row.get("company name")
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("company name is missing")
+
+        impact_type = str(row.get("impact type", "")).strip().lower()
+        if impact_type not in IMPACT_TYPES:
+            raise ValueError(f"impact type must be one of {', '.join(IMPACT_TYPES)}")
+
+        score = row.get("impact score")
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            raise ValueError("impact score is not a number")
+        low, high = IMPACT_SCORE_RANGE
+        if not low <= score <= high:
+            raise ValueError(f"impact score must be between {low} and {high}")
+
+        listed = str(row.get("listed", "")).strip().upper()
+        listed = LISTED_ALIASES.get(listed, listed)
+        if listed not in LISTED_OPTIONS:
+            raise ValueError(f"listed must be one of {', '.join(LISTED_OPTIONS)}")
+
+        industry = row.get("company industry") or ""
+        return cls(
+            name.strip(),
+            impact_type,
+            industry.strip() if isinstance(industry, str) else str(industry),
+            int(round(score)),
+            listed,
+            str(row.get("ticker") or ""),
+            str(row.get("isin") or ""),
+        )
+
+    def to_dict(self):
+        """JSON row with the spaced keys used in outputs and caches"""
+        return {key: getattr(self, attr) for attr, key in FIELDS.items()}
+
+    def replace(self, **changes):
+        """Copy with some fields changed"""
+        values = {attr: getattr(self, attr) for attr in FIELDS}
+        values.update(changes)
+        return ImpactRecord(**values)
+
+    def __eq__(self, other):
+        if not isinstance(other, ImpactRecord):
+            return NotImplemented
+        return all(getattr(self, attr) == getattr(other, attr) for attr in FIELDS)
+
+    def __repr__(self):
+        return f"ImpactRecord({self.company_name!r}, {self.impact_type!r}, score={self.impact_score})"
+
+def to_dicts(records):
+    return [record.to_dict() for record in records]
+
+def from_dicts(rows):
+    """Records from trusted rows (caches), skipping any that no longer validate"""
+    records = []
+    for row in rows:
+        try:
+            records.append(ImpactRecord.from_dict(row))
+        except ValueError:
+            continue
+    return records
+
+def loads(text):
+    """Decode JSON text, with orjson when available"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def dumps(value):
+    """Encode value as a JSON string, with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value)
+
+def _strip_fences(text):
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        if text.rstrip().endswith('```'):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+def decode_json(text):
+    """First JSON value in a completion: the whole text, fenced, or embedded in prose"""
+    text = _strip_fences(text.strip())
+    try:
+        return loads(text)
+    except ValueError:
+        pass
+
+    decoder = json.JSONDecoder()
+    attempts = 0
+    for index, char in enumerate(text):
+        if char in '[{':
+            try:
+                return decoder.raw_decode(text, index)[0]
+            except ValueError:
+                attempts += 1
+                if attempts >= MAX_DECODE_ATTEMPTS:
+                    break
+    raise ValueError("Could not parse LLM response as JSON")
+
+def decode_companies(text):
+    """Decode a completion into (records, rejected)
+
+    rejected holds (entry, reason) pairs for entries that failed
+    validation. Raises ValueError when the completion is empty or holds
+    no company array.
+    """
+    with stage("json_decode"):
+        if not text or not text.strip():
+            raise ValueError("Empty response from OpenAI API")
+
+        payload = decode_json(text)
+        if isinstance(payload, dict):
+            if isinstance(payload.get("companies"), list):
+                payload = payload["companies"]
+            elif "company name" in payload:
+                payload = [payload]
+        if not isinstance(payload, list):
+            raise ValueError("Could not parse LLM response as JSON")
+
+        records, rejected = [], []
+        for entry in payload:
+            try:
+                records.append(ImpactRecord.from_dict(entry))
+            except ValueError as e:
+                rejected.append((entry, str(e)))
+        return records, rejected
+
+def response_format():
+    """response_format request parameter for STRUCTURED_OUTPUT, or None"""
+    if STRUCTURED_OUTPUT == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "impacted_companies",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {"companies": {"type": "array", "items": COMPANY_SCHEMA}},
+                    "required": ["companies"],
+                    "additionalProperties": False,
+                },
+            },
+        }
+    if STRUCTURED_OUTPUT == "json_object":
+        return {"type": "json_object"}
+    return None
+
+def packed_response_format(article_ids):
+    """response_format for a packed request keyed by article id, or None"""
+    if STRUCTURED_OUTPUT == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "impacted_companies_by_article",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        article_id: {"type": "array", "items": COMPANY_SCHEMA} for article_id in article_ids
+                    },
+                    "required": list(article_ids),
+                    "additionalProperties": False,
+                },
+            },
+        }
+    return response_format()
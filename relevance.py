@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Local market-relevance classifier for News Impact Analyzer
+Scores how likely an article is to name impacted Indian companies
+before any OpenAI request is made, so opinion pieces, lifestyle stories
+and index pages can be skipped (RELEVANCE_ACTION=skip) or sent in the
+rate limiter's lowest lane (RELEVANCE_ACTION=defer).
+
+Features are hashed word unigrams and bigrams with sublinear TF-IDF
+weights, L2-normalized; the model is a logistic regression over them.
+Everything is vectorized NumPy, so scoring an article takes a fraction
+of a millisecond.
+
+The model is a single float32 .npy array of shape (2, features + 1):
+row 0 holds the IDF weights, row 1 the coefficients with the intercept
+in the last column. It is opened with mmap_mode="r", so every worker
+process on a machine shares one copy through the page cache.
+
+Training data is our own history: batch_cli.py output written with
+--include-content, where an article is relevant when the LLM found at
+least one impacted company. Failed and gated (skipped) articles are left
+out unless a line carries an explicit "relevant" label (true/false or 1/0).
+
+Usage:
+    python relevance.py train results.jsonl                  # Writes RELEVANCE_MODEL_PATH
+    python relevance.py train results.jsonl -o model.npy --features 262144
+"""
+
+import argparse
+import json
+import os
+import string
+import sys
+import threading
+import zlib
+from environment import RELEVANCE_MODEL_PATH, RELEVANCE_THRESHOLD
+
+DEFAULT_FEATURES = 2 ** 18  # Hash buckets, a power of two
+HOLDOUT_SHARE = 0.2  # Labelled articles kept back for evaluation
+
+_PUNCTUATION = bytes.maketrans(string.punctuation.encode(), b" " * len(string.punctuation))
+BIGRAM_MULT = 0x100000001B3
+
+def feature_counts(text, features):
+    """(bucket indices, counts) of the hashed unigrams and bigrams of text"""
+    import numpy as np
+
+    # Splitting bytes and hashing with map() keeps Python out of the per-word loop
+    words = text.lower().encode("utf-8").translate(_PUNCTUATION).split()
+    if not words:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    unigrams = np.fromiter(map(zlib.crc32, words), dtype=np.uint64, count=len(words))
+    bigrams = unigrams[:-1] * np.uint64(BIGRAM_MULT) + unigrams[1:] + np.uint64(1)
+    hashes = np.concatenate((unigrams, bigrams)) & np.uint64(features - 1)
+    indices, counts = np.unique(hashes.astype(np.int64), return_counts=True)
+    return indices, counts.astype(np.float32)
+
+def _weights(counts, idf):
+    """Sublinear TF-IDF values, L2-normalized"""
+    import numpy as np
+
+    values = (1 + np.log(counts)) * idf
+    norm = np.linalg.norm(values)
+    return values / norm if norm else values
+
+class RelevanceModel:
+    """Hashed TF-IDF logistic regression; score() is the probability of relevance"""
+
+    def __init__(self, table):
+        self.table = table  # (2, features + 1) float32, possibly memory-mapped
+        self.features = table.shape[1] - 1
+        self.idf = table[0, :-1]
+        self.coef = table[1, :-1]
+        self.intercept = float(table[1, -1])
+
+    @classmethod
+    def load(cls, path=RELEVANCE_MODEL_PATH):
+        import numpy as np
+
+        table = np.load(path, mmap_mode="r")
+        if table.ndim != 2 or table.shape[0] != 2 or table.shape[1] - 1 & table.shape[1] - 2:
+            raise ValueError(f"{path} is not a relevance model")
+        return cls(table)
+
+    def save(self, path):
+        import numpy as np
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(path, np.ascontiguousarray(self.table, dtype=np.float32))
+
+    def score(self, text):
+        """Probability that text is market-relevant"""
+        import numpy as np
+
+        indices, counts = feature_counts(text, self.features)
+        if not len(indices):
+            return 0.0
+        margin = float(_weights(counts, self.idf[indices]) @ self.coef[indices]) + self.intercept
+        return float(1 / (1 + np.exp(-margin)))
+
+def _matrix(documents, idf):
+    """Sparse rows as (indices, values, row of each value)"""
+    import numpy as np
+
+    indices, values, rows = [], [], []
+    for row, (doc_indices, counts) in enumerate(documents):
+        indices.append(doc_indices)
+        values.append(_weights(counts, idf[doc_indices]))
+        rows.append(np.full(len(doc_indices), row, dtype=np.int64))
+    return np.concatenate(indices), np.concatenate(values), np.concatenate(rows)
+
+def train(texts, labels, features=DEFAULT_FEATURES, epochs=300, learning_rate=2.0, l2=1e-4):
+    """Fit a RelevanceModel by full-batch gradient descent on the log loss
+
+    Classes are weighted equally however unbalanced the history is.
+    """
+    import numpy as np
+
+    if features & (features - 1):
+        raise ValueError("features must be a power of two")
+    labels = np.asarray(labels, dtype=np.float32)
+    documents = [feature_counts(text, features) for text in texts]
+
+    document_frequency = np.zeros(features, dtype=np.float32)
+    for doc_indices, _ in documents:
+        document_frequency[doc_indices] += 1
+    idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    indices, values, rows = _matrix(documents, idf)
+    positives = labels.sum()
+    negatives = len(labels) - positives
+    sample_weight = np.where(labels == 1, len(labels) / (2 * max(positives, 1)), len(labels) / (2 * max(negatives, 1)))
+
+    coef = np.zeros(features, dtype=np.float64)
+    intercept = 0.0
+    for _ in range(epochs):
+        margins = np.bincount(rows, weights=values * coef[indices], minlength=len(labels)) + intercept
+        error = (1 / (1 + np.exp(-margins)) - labels) * sample_weight / len(labels)
+        coef -= learning_rate * (np.bincount(indices, weights=values * error[rows], minlength=features) + l2 * coef)
+        intercept -= learning_rate * error.sum()
+
+    table = np.empty((2, features + 1), dtype=np.float32)
+    table[0, :-1] = idf
+    table[0, -1] = 0.0
+    table[1, :-1] = coef
+    table[1, -1] = intercept
+    return RelevanceModel(table)
+
+def evaluate(model, texts, labels, threshold=RELEVANCE_THRESHOLD):
+    """Accuracy, precision and recall of relevance at threshold"""
+    import numpy as np
+
+    predicted = np.array([model.score(text) >= threshold for text in texts])
+    actual = np.asarray(labels, dtype=bool)
+    true_positives = int(np.sum(predicted & actual))
+    return {
+        "articles": len(actual),
+        "accuracy": float(np.mean(predicted == actual)) if len(actual) else 0.0,
+        "precision": true_positives / max(int(predicted.sum()), 1),
+        "recall": true_positives / max(int(actual.sum()), 1),
+        "gated_share": float(1 - predicted.mean()) if len(actual) else 0.0,
+    }
+
+def read_history(path):
+    """(texts, labels) from batch_cli.py JSONL written with --include-content"""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            label = record.get("relevant")
+            if label is None:
+                # Gated articles never reached the LLM, so their label would only echo the gate
+                if record.get("error") or record.get("skipped"):
+                    continue
+                label = bool(record.get("companies"))
+            if not record.get("content"):
+                continue
+            texts.append(record["content"])
+            labels.append(1 if label in (True, 1, "1", "true") else 0)
+    return texts, labels
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_relevance_model():
+    """Process-wide classifier, or None when no model file exists"""
+    global _model
+    if not RELEVANCE_MODEL_PATH or not os.path.exists(RELEVANCE_MODEL_PATH):
+        return None
+    with _model_lock:
+        if _model is None:
+            _model = RelevanceModel.load(RELEVANCE_MODEL_PATH)
+    return _model
+
+def main():
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Train the local market-relevance classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    training = commands.add_parser("train", help="Fit a model on labelled history")
+    training.add_argument("history", help="batch_cli.py JSONL output written with --include-content")
+    training.add_argument("-o", "--output", default=RELEVANCE_MODEL_PATH, help="Model file (default: RELEVANCE_MODEL_PATH)")
+    training.add_argument("--features", type=int, default=DEFAULT_FEATURES, help="Hash buckets, a power of two")
+    training.add_argument("--epochs", type=int, default=300)
+    args = parser.parse_args()
+
+    texts, labels = read_history(args.history)
+    if len(set(labels)) < 2:
+        print("❌ Training needs both relevant and irrelevant articles")
+        sys.exit(1)
+
+    # Deterministic holdout so reruns on the same history are comparable
+    order = np.random.default_rng(0).permutation(len(texts))
+    cut = int(len(texts) * HOLDOUT_SHARE)
+    test_texts = [texts[i] for i in order[:cut]]
+    test_labels = [labels[i] for i in order[:cut]]
+    train_texts = [texts[i] for i in order[cut:]]
+    train_labels = [labels[i] for i in order[cut:]]
+
+    print(f"🧠 Training on {len(train_texts)} articles ({sum(train_labels)} relevant), {args.features} features")
+    model = train(train_texts, train_labels, features=args.features, epochs=args.epochs)
+    if test_texts:
+        stats = evaluate(model, test_texts, test_labels)
+        print(
+            f"📊 Holdout of {stats['articles']} at threshold {RELEVANCE_THRESHOLD}: "
+            f"accuracy {stats['accuracy']:.1%}, precision {stats['precision']:.1%}, "
+            f"recall {stats['recall']:.1%}, gated {stats['gated_share']:.1%}"
+        )
+
+    # The shipped model learns from every labelled article
+    model = train(texts, labels, features=args.features, epochs=args.epochs)
+    model.save(args.output)
+    print(f"📤 Model saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
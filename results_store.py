@@ -0,0 +1,288 @@
+"""
+Persistent results store for News Impact Analyzer
+Every analysis is appended to SQLite with its URL, timestamp and model,
+one row per impacted company. A daily rollup per company and per
+industry is maintained in the same transaction, so dashboard queries
+read a few thousand pre-aggregated rows instead of scanning a year of
+raw impacts. Time series, rolling averages and top movers are then
+computed with vectorized pandas, imported on the first query so that
+recording analyses does not pay for it.
+
+Impact values are signed: positive impacts count +score, negative
+impacts -score, so a company's daily value is its net sentiment.
+
+    store = get_results_store()
+    store.record(url, companies)
+    store.time_series("company", ["Tata Motors Limited"], window=7)
+    store.top_movers("industry", days=7)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from environment import OPENAI_MODEL, RESULTS_STORE_ENABLED, RESULTS_STORE_PATH
+
+DIMENSIONS = ("company", "industry")
+
+def _day(timestamp):
+    """UTC calendar day of a unix timestamp"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d')
+
+def _bound(value):
+    """Accept dates, datetimes, timestamps or 'YYYY-MM-DD' strings as query bounds"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return _day(value)
+    return value.strftime('%Y-%m-%d')
+
+class ResultsStore:
+    """Append-only SQLite store of analyses with daily rollups"""
+
+    def __init__(self, path=RESULTS_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._drop_unique_url()
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " id INTEGER PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " analyzed_at REAL NOT NULL,"
+            " day TEXT NOT NULL,"
+            " model TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS impacts ("
+            " analysis_id INTEGER NOT NULL,"
+            " analyzed_at REAL NOT NULL,"
+            " day TEXT NOT NULL,"
+            " company TEXT NOT NULL,"
+            " ticker TEXT NOT NULL,"
+            " industry TEXT NOT NULL,"
+            " impact_type TEXT NOT NULL,"
+            " score INTEGER NOT NULL,"
+            " signed_score INTEGER NOT NULL,"
+            " listed TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS daily ("
+            " dimension TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " day TEXT NOT NULL,"
+            " mentions INTEGER NOT NULL,"
+            " signed_sum INTEGER NOT NULL,"
+            " PRIMARY KEY (dimension, name, day)) WITHOUT ROWID;"
+            "CREATE UNIQUE INDEX IF NOT EXISTS analyses_url_time ON analyses(url, analyzed_at);"
+            "CREATE INDEX IF NOT EXISTS analyses_day ON analyses(day);"
+            "CREATE INDEX IF NOT EXISTS impacts_company_day ON impacts(company, day);"
+            "CREATE INDEX IF NOT EXISTS impacts_industry_day ON impacts(industry, day);"
+            "CREATE INDEX IF NOT EXISTS impacts_day ON impacts(day);"
+            "CREATE INDEX IF NOT EXISTS daily_dimension_day ON daily(dimension, day);"
+        )
+
+    def _drop_unique_url(self):
+        """Stores created with one row per URL keep later analyses of it from now on"""
+        row = self._conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'analyses'").fetchone()
+        if row is None or "UNIQUE" not in row[0]:
+            return
+        self._conn.executescript(
+            "BEGIN;"
+            "ALTER TABLE analyses RENAME TO analyses_unique_url;"
+            "CREATE TABLE analyses ("
+            " id INTEGER PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " analyzed_at REAL NOT NULL,"
+            " day TEXT NOT NULL,"
+            " model TEXT NOT NULL);"
+            "INSERT INTO analyses SELECT id, url, analyzed_at, day, model FROM analyses_unique_url;"
+            "DROP TABLE analyses_unique_url;"
+            "COMMIT;"
+        )
+
+    def record(self, url, companies, model=OPENAI_MODEL, analyzed_at=None):
+        """Append one analysis, also for a URL analyzed before
+
+        Returns False if this url was already recorded at analyzed_at.
+        """
+        analyzed_at = time.time() if analyzed_at is None else analyzed_at
+        day = _day(analyzed_at)
+        rows = []
+        for company in companies:
+            signed = company.impact_score if company.impact_type == "positive" else -company.impact_score
+            rows.append((
+                analyzed_at, day, company.company_name, company.ticker, company.company_industry or "Unknown",
+                company.impact_type, company.impact_score, signed, company.listed
+            ))
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO analyses (url, analyzed_at, day, model) VALUES (?, ?, ?, ?)",
+                    (url, analyzed_at, day, model)
+                )
+                if not cursor.rowcount:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                analysis_id = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO impacts (analysis_id, analyzed_at, day, company, ticker, industry,"
+                    " impact_type, score, signed_score, listed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(analysis_id, *row) for row in rows]
+                )
+                self._conn.executemany(
+                    "INSERT INTO daily (dimension, name, day, mentions, signed_sum) VALUES (?, ?, ?, 1, ?)"
+                    " ON CONFLICT (dimension, name, day) DO UPDATE SET"
+                    " mentions = mentions + 1, signed_sum = signed_sum + excluded.signed_sum",
+                    [("company", row[2], day, row[7]) for row in rows] +
+                    [("industry", row[4], day, row[7]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _query(self, sql, params):
+        import pandas as pd
+
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchall()
+        return pd.DataFrame(rows, columns=[column[0] for column in cursor.description])
+
+    def daily(self, dimension="company", names=None, start=None, end=None):
+        """Daily rollup rows: day, name, mentions, signed_sum"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+        import pandas as pd
+
+        sql = "SELECT day, name, mentions, signed_sum FROM daily WHERE dimension = ?"
+        params = [dimension]
+        if start is not None:
+            sql += " AND day >= ?"
+            params.append(_bound(start))
+        if end is not None:
+            sql += " AND day <= ?"
+            params.append(_bound(end))
+        if names:
+            sql += f" AND name IN ({','.join('?' * len(names))})"
+            params.extend(names)
+        frame = self._query(sql, params)
+        frame["day"] = pd.to_datetime(frame["day"], format="%Y-%m-%d")
+        return frame
+
+    def time_series(self, dimension="company", names=None, start=None, end=None, window=None):
+        """Average signed impact per day, one column per company or industry
+
+        Days without mentions are NaN. With `window` (days), each value is
+        the mention-weighted rolling average over that many days.
+        """
+        import numpy as np
+        import pandas as pd
+
+        frame = self.daily(dimension, names, start, end)
+        if frame.empty:
+            return pd.DataFrame()
+        index = pd.date_range(frame["day"].min(), frame["day"].max(), freq="D")
+        signed = frame.pivot(index="day", columns="name", values="signed_sum").reindex(index)
+        mentions = frame.pivot(index="day", columns="name", values="mentions").reindex(index)
+        if window:
+            signed = signed.fillna(0).rolling(window, min_periods=1).sum()
+            mentions = mentions.fillna(0).rolling(window, min_periods=1).sum()
+        series = signed / mentions.replace(0, np.nan)
+        series.index.name = "day"
+        return series
+
+    def top_movers(self, dimension="company", days=7, baseline_days=30, limit=10, min_mentions=2, end=None):
+        """Biggest changes in average impact, recent window vs the baseline before it
+
+        Returns columns name, recent, baseline, change, mentions sorted by
+        absolute change. Names with fewer than min_mentions in the recent
+        window are ignored; a name absent from the baseline has baseline 0.
+        """
+        import numpy as np
+        import pandas as pd
+
+        end_day = pd.Timestamp(_bound(end) or _day(time.time()))
+        recent_start = end_day - timedelta(days=days - 1)
+        baseline_start = recent_start - timedelta(days=baseline_days)
+        frame = self.daily(dimension, start=baseline_start, end=end_day)
+        if frame.empty:
+            return pd.DataFrame(columns=["name", "recent", "baseline", "change", "mentions"])
+
+        is_recent = (frame["day"] >= recent_start).to_numpy()
+        totals = frame.assign(
+            recent_sum=np.where(is_recent, frame["signed_sum"], 0),
+            recent_mentions=np.where(is_recent, frame["mentions"], 0),
+            base_sum=np.where(is_recent, 0, frame["signed_sum"]),
+            base_mentions=np.where(is_recent, 0, frame["mentions"]),
+        ).groupby("name")[["recent_sum", "recent_mentions", "base_sum", "base_mentions"]].sum()
+
+        totals = totals[totals["recent_mentions"] >= min_mentions]
+        recent = totals["recent_sum"] / totals["recent_mentions"]
+        baseline = (totals["base_sum"] / totals["base_mentions"].replace(0, np.nan)).fillna(0.0)
+        movers = pd.DataFrame({
+            "recent": recent,
+            "baseline": baseline,
+            "change": recent - baseline,
+            "mentions": totals["recent_mentions"],
+        })
+        movers = movers.reindex(movers["change"].abs().sort_values(ascending=False).index).head(limit)
+        return movers.rename_axis("name").reset_index()
+
+    def history(self, company=None, industry=None, start=None, end=None, limit=1000):
+        """Raw impact rows with their article URL and model, newest first"""
+        sql = (
+            "SELECT i.day, i.analyzed_at, a.url, a.model, i.company, i.ticker, i.industry,"
+            " i.impact_type, i.score, i.listed FROM impacts i JOIN analyses a ON a.id = i.analysis_id WHERE 1 = 1"
+        )
+        params = []
+        if company is not None:
+            sql += " AND i.company = ?"
+            params.append(company)
+        if industry is not None:
+            sql += " AND i.industry = ?"
+            params.append(industry)
+        if start is not None:
+            sql += " AND i.day >= ?"
+            params.append(_bound(start))
+        if end is not None:
+            sql += " AND i.day <= ?"
+            params.append(_bound(end))
+        sql += " ORDER BY i.analyzed_at DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, params)
+
+    def names(self, dimension="company"):
+        """Every company or industry with recorded impacts"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT name FROM daily WHERE dimension = ? ORDER BY name", (dimension,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self):
+        with self._lock:
+            analyses = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            impacts = self._conn.execute("SELECT COUNT(*) FROM impacts").fetchone()[0]
+        return {"analyses": analyses, "impacts": impacts}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_results_store():
+    """Process-wide results store, or None when disabled"""
+    global _store
+    if not RESULTS_STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+    return _store
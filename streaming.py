@@ -0,0 +1,140 @@
+"""
+Streaming LLM analysis for News Impact Analyzer
+Requests a streamed completion and emits each company object as soon
+as its closing brace arrives, so the UI can show the first company
+long before the full completion has been generated.
+"""
+
+import json
+from core import build_messages
+from rate_limiter import INTERACTIVE, create_completion
+from records import ImpactRecord
+from structured import request_companies
+from metrics import count
+from token_accounting import completion_budget, note_model, record_response
+from environment import OPENAI_MAX_TOKENS, OPENAI_MODEL
+
+class JSONArrayStreamParser:
+    """Incremental parser for a JSON array of objects
+
+    feed() takes arbitrary text fragments and returns the objects
+    completed by that fragment. Text before the first '[' (prose, code
+    fences, a wrapping object key) is ignored.
+    """
+
+    def __init__(self):
+        self._text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+        self.started = False
+        self.finished = False
+        self.skipped = 0  # Objects that were complete but not valid JSON
+
+    def feed(self, fragment):
+        """Consume a text fragment and return newly completed objects"""
+        if self.finished or not fragment:
+            return []
+        self._text += fragment
+        completed = []
+
+        text = self._text
+        for index in range(self._pos, len(text)):
+            char = text[index]
+
+            if not self.started:
+                if char == '[':
+                    self.started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if char == '{' and self._depth == 1:
+                    self._object_start = index
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 1 and char == '}' and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(text[self._object_start:index + 1]))
+                    except ValueError:
+                        self.skipped += 1
+                    self._object_start = None
+                elif self._depth == 0:
+                    self.finished = True
+                    break
+
+        # Drop text that can no longer be part of an object
+        keep_from = self._object_start if self._object_start is not None else len(text)
+        if self._object_start is not None:
+            self._object_start = 0
+        self._text = text[keep_from:]
+        self._pos = len(self._text)
+        return completed
+
+def stream_companies(client, content, priority=INTERACTIVE):
+    """Yield ImpactRecords from a streamed completion as they complete
+
+    Entries that fail validation are skipped. Raises ValueError when the
+    completion contains no JSON array, the same way
+    core.parse_llm_response does for non-streamed calls.
+    """
+    parser = JSONArrayStreamParser()
+    messages = build_messages(content)
+    max_tokens = completion_budget(content)
+    stream = create_completion(
+        client, messages, priority=priority, stream=True, max_tokens=max_tokens,
+        stream_options={"include_usage": True}
+    )
+    received = False
+    reported = False
+    finish_reason = None
+    yielded = set()
+    for chunk in stream:
+        if getattr(chunk, 'usage', None):
+            record_response(chunk)  # Final chunk, sent because of include_usage
+            reported = True
+        if not chunk.choices:
+            continue
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        fragment = chunk.choices[0].delta.content
+        if fragment:
+            received = True
+            for row in parser.feed(fragment):
+                try:
+                    company = ImpactRecord.from_dict(row)
+                except ValueError:
+                    parser.skipped += 1
+                    continue
+                yielded.add(company.company_name)
+                yield company
+
+    if not reported:
+        note_model(OPENAI_MODEL)  # Server without include_usage support
+
+    if finish_reason == "length" and not parser.finished and max_tokens < OPENAI_MAX_TOKENS:
+        # Cut off by the expected-size budget: ask again with the full one
+        # and add the companies the stream did not get to
+        count("truncated_retries")
+        for company in request_companies(client, messages, priority=priority):
+            if company.company_name not in yielded:
+                yield company
+        return
+
+    if not received:
+        raise ValueError("Empty response from OpenAI API")
+    if not parser.started:
+        raise ValueError("Could not parse LLM response as JSON")
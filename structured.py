@@ -0,0 +1,166 @@
+"""
+Company analysis requests with targeted repair
+A completion that is not valid JSON, or has entries that fail
+ImpactRecord validation, is not thrown away. A short repair request
+sends back only the broken part (without the article) together with
+the validation errors, so fixing it costs far less than a fresh call.
+With a model cascade (cascade.py) only the last tier is repaired.
+"""
+
+import json
+import time
+from cascade import get_cascade, review
+from core import SYSTEM_PROMPT
+from rate_limiter import BATCH, INTERACTIVE, create_completion, create_completion_async
+from metrics import count
+from records import decode_companies
+from token_accounting import track_usage, truncated
+from environment import IMPACT_SCORE_RANGE, IMPACT_TYPES, LISTED_OPTIONS, STRUCTURED_REPAIR_RETRIES
+
+REPAIR_MAX_CHARS = 6000  # Broken output sent back for repair
+
+REPAIR_PROMPT = """
+Your previous answer could not be used: {problem}
+
+{broken}
+
+Return only the corrected data as a JSON object {{"companies": [...]}} where each company has exactly these fields:
+- company name: string
+- impact type: one of {impact_types}
+- company industry: string
+- impact score: integer from {low} to {high}
+- listed: one of {listed}
+"""
+
+def repair_messages(output, rejected, error=None):
+    """Chat messages asking the model to fix its own output"""
+    if rejected:
+        problem = "these company entries are invalid."
+        broken = "\n".join(f"- {json.dumps(entry, ensure_ascii=False)} ({reason})" for entry, reason in rejected)
+    else:
+        problem = f"it is not valid JSON ({error})."
+        broken = output[:REPAIR_MAX_CHARS]
+    prompt = REPAIR_PROMPT.format(
+        problem=problem,
+        broken=broken,
+        impact_types=", ".join(f'"{t}"' for t in IMPACT_TYPES),
+        low=IMPACT_SCORE_RANGE[0],
+        high=IMPACT_SCORE_RANGE[1],
+        listed=", ".join(f'"{o}"' for o in LISTED_OPTIONS),
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+class _Repair:
+    """Tracks one analysis through decoding and repair attempts"""
+
+    def __init__(self):
+        self.records = []
+        self.attempts = 0
+        self.decoded = False
+
+    def feed(self, text):
+        """Decode a completion; return repair messages or None when done
+
+        Raises ValueError once repairs are exhausted without any usable
+        output at all.
+        """
+        try:
+            records, rejected = decode_companies(text)
+            error = None
+        except ValueError as e:
+            if not text or not text.strip():
+                raise  # Nothing to repair
+            records, rejected, error = [], [], e
+
+        self.records.extend(records)
+        self.decoded = self.decoded or error is None
+        if error is None and not rejected:
+            return None
+        if self.attempts >= STRUCTURED_REPAIR_RETRIES:
+            if not self.decoded:
+                raise error
+            return None  # Keep what validated, drop the rest
+        self.attempts += 1
+        return repair_messages(text or "", rejected, error)
+
+def _content(response):
+    return response.choices[0].message.content
+
+def _budget(max_tokens):
+    return {"max_tokens": max_tokens} if max_tokens else {}
+
+def _model(model):
+    return {"model": model} if model else {}
+
+def _complete(client, messages, priority, max_tokens, model):
+    """One completion; asked again with the default budget if max_tokens cut it off"""
+    response = create_completion(client, messages, priority=priority, **_model(model), **_budget(max_tokens))
+    if max_tokens and truncated(response):
+        count("truncated_retries")
+        response = create_completion(client, messages, priority=priority, **_model(model))
+    return response
+
+def _request(client, messages, priority, max_tokens, model=None):
+    repair = _Repair()
+    follow_up = repair.feed(_content(_complete(client, messages, priority, max_tokens, model)))
+    while follow_up:
+        count("repair_requests")
+        follow_up = repair.feed(_content(create_completion(client, follow_up, priority=priority, **_model(model))))
+    return repair.records
+
+def request_companies(client, messages, priority=INTERACTIVE, max_tokens=None, first_tier=0):
+    """Run an analysis request and return validated ImpactRecords
+
+    max_tokens defaults to OPENAI_MAX_TOKENS; a completion cut off by a
+    smaller budget is requested again with the default. With a model
+    cascade, tiers from first_tier on answer in turn until one is kept.
+    """
+    cascade = get_cascade()
+    if cascade is None:
+        return _request(client, messages, priority, max_tokens)
+    for tier, model, last in cascade.tiers()[first_tier:]:
+        start = time.perf_counter()
+        with track_usage() as usage:
+            if last:
+                records, reason = _request(client, messages, priority, max_tokens, model), None
+            else:
+                records, reason = review(_content(_complete(client, messages, priority, max_tokens, model)))
+        cascade.record(tier, time.perf_counter() - start, usage.cost, reason)
+        if reason is None:
+            return records
+
+async def _complete_async(client, messages, priority, max_tokens, model):
+    response = await create_completion_async(client, messages, priority=priority, **_model(model), **_budget(max_tokens))
+    if max_tokens and truncated(response):
+        count("truncated_retries")
+        response = await create_completion_async(client, messages, priority=priority, **_model(model))
+    return response
+
+async def _request_async(client, messages, priority, max_tokens, model=None):
+    repair = _Repair()
+    follow_up = repair.feed(_content(await _complete_async(client, messages, priority, max_tokens, model)))
+    while follow_up:
+        count("repair_requests")
+        response = await create_completion_async(client, follow_up, priority=priority, **_model(model))
+        follow_up = repair.feed(_content(response))
+    return repair.records
+
+async def request_companies_async(client, messages, priority=BATCH, max_tokens=None, first_tier=0):
+    """Async counterpart of request_companies"""
+    cascade = get_cascade()
+    if cascade is None:
+        return await _request_async(client, messages, priority, max_tokens)
+    for tier, model, last in cascade.tiers()[first_tier:]:
+        start = time.perf_counter()
+        with track_usage() as usage:
+            if last:
+                records, reason = await _request_async(client, messages, priority, max_tokens, model), None
+            else:
+                response = await _complete_async(client, messages, priority, max_tokens, model)
+                records, reason = review(_content(response))
+        cascade.record(tier, time.perf_counter() - start, usage.cost, reason)
+        if reason is None:
+            return records
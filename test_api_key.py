@@ -12,16 +12,11 @@ def test_api_key(api_key):
         print("🔍 Testing API key...")
         client = OpenAI(api_key=api_key)
         
-        # Make a simple test call
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": "Say 'Hello World'"}],
-            max_tokens=10
-        )
+        # List models: authenticates the key without spending tokens
+        models = client.models.list()
         
-        result = response.choices[0].message.content
         print(f"✅ API key is valid!")
-        print(f"Response: {result}")
+        print(f"Models available: {len(models.data)}")
         return True
         
     except Exception as e:
@@ -0,0 +1,223 @@
+"""
+Token accounting for News Impact Analyzer
+Counts prompt tokens locally with the model's tokenizer, sizes
+max_tokens from the number of companies an article is expected to
+produce, and records the usage every OpenAI response reports, priced
+per model, so each analysis knows what it cost.
+
+Usage is collected per scope: any code inside `with track_usage() as
+usage:` (including async tasks and threads started with the copied
+context) adds its requests to that Usage, and every request also counts
+towards the process-wide totals of get_usage_tracker().
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from chunking import count_tokens
+from core import company_hints
+from metrics import count
+from environment import (
+    COMPLETION_EXTRA_COMPANIES,
+    COMPLETION_TOKENS_PER_COMPANY,
+    DYNAMIC_MAX_TOKENS,
+    OPENAI_CACHED_INPUT_PRICE,
+    OPENAI_INPUT_PRICE,
+    OPENAI_MAX_TOKENS,
+    OPENAI_MODEL,
+    OPENAI_OUTPUT_PRICE,
+)
+
+# USD per 1M tokens: (prompt, cached prompt, completion). Matched on the
+# longest model name prefix, so dated snapshots share their family's price.
+PRICES = {
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+MESSAGE_OVERHEAD_TOKENS = 3  # Role and separators around every chat message
+REPLY_PRIMING_TOKENS = 3  # Tokens that start the assistant reply
+COMPLETION_OVERHEAD_TOKENS = 20  # JSON wrapper around the company entries
+
+def model_prices(model=OPENAI_MODEL):
+    """(prompt, cached prompt, completion) USD per 1M tokens for model"""
+    prompt, cached, completion = 0.0, 0.0, 0.0
+    matches = [name for name in PRICES if model.startswith(name)]
+    if matches:
+        prompt, cached, completion = PRICES[max(matches, key=len)]
+    if model != OPENAI_MODEL:
+        return prompt, cached, completion  # Price overrides are for OPENAI_MODEL, not cascade tiers
+    if OPENAI_INPUT_PRICE is not None:
+        prompt = cached = OPENAI_INPUT_PRICE
+    if OPENAI_CACHED_INPUT_PRICE is not None:
+        cached = OPENAI_CACHED_INPUT_PRICE
+    if OPENAI_OUTPUT_PRICE is not None:
+        completion = OPENAI_OUTPUT_PRICE
+    return prompt, cached, completion
+
+def count_message_tokens(messages):
+    """Prompt tokens of a chat request, as the API counts them"""
+    return REPLY_PRIMING_TOKENS + sum(
+        MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "") for message in messages
+    )
+
+def expected_companies(content):
+    """Companies an analysis of content is likely to return"""
+    return len(company_hints(content)) + COMPLETION_EXTRA_COMPANIES
+
+def completion_budget(content):
+    """max_tokens for analyzing content: room for the expected companies
+
+    Capped at OPENAI_MAX_TOKENS; a completion cut off by this budget is
+    requested again with the full OPENAI_MAX_TOKENS.
+    """
+    if not DYNAMIC_MAX_TOKENS:
+        return OPENAI_MAX_TOKENS
+    budget = COMPLETION_OVERHEAD_TOKENS + expected_companies(content) * COMPLETION_TOKENS_PER_COMPANY
+    return min(OPENAI_MAX_TOKENS, budget)
+
+def truncated(response):
+    """True when a completion stopped at max_tokens"""
+    choices = getattr(response, 'choices', None)
+    return bool(choices) and choices[0].finish_reason == "length"
+
+class Usage:
+    """Tokens and cost of one or more requests"""
+
+    __slots__ = ("requests", "prompt_tokens", "cached_tokens", "completion_tokens", "content_tokens", "cost", "models")
+    COUNTS = __slots__[:-1]
+
+    def __init__(self, requests=0, prompt_tokens=0, cached_tokens=0, completion_tokens=0, content_tokens=0, cost=0.0,
+                 models=None):
+        self.requests = requests
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
+        self.completion_tokens = completion_tokens
+        self.content_tokens = content_tokens  # Article tokens, counted locally
+        self.cost = cost
+        self.models = models or {}  # Requests per model; reused answers count with 0
+
+    @classmethod
+    def from_response(cls, usage, model=OPENAI_MODEL):
+        """Usage of one response from its `usage` field"""
+        prompt = getattr(usage, 'prompt_tokens', 0) or 0
+        completion = getattr(usage, 'completion_tokens', 0) or 0
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', 0) or 0
+        prompt_price, cached_price, completion_price = model_prices(model)
+        cost = ((prompt - cached) * prompt_price + cached * cached_price + completion * completion_price) / 1e6
+        return cls(1, prompt, cached, completion, 0, cost, {model: 1})
+
+    def add(self, other, share=1.0):
+        """Add other, or a share of it when one request served several articles"""
+        for field in self.COUNTS:
+            setattr(self, field, getattr(self, field) + getattr(other, field) * share)
+        for model, requests in other.models.items():
+            self.models[model] = self.models.get(model, 0) + requests * share
+
+    def to_dict(self):
+        return {
+            "requests": round(self.requests, 3),
+            "prompt_tokens": round(self.prompt_tokens),
+            "cached_tokens": round(self.cached_tokens),
+            "completion_tokens": round(self.completion_tokens),
+            "content_tokens": round(self.content_tokens),
+            "cost_usd": round(self.cost, 6),
+        }
+
+_scopes = contextvars.ContextVar("usage_scopes", default=())
+
+@contextmanager
+def track_usage(isolated=False):
+    """Collect the usage of every request made inside the block
+
+    Nested scopes all receive the request; isolated=True starts a fresh
+    chain, for work done on behalf of several articles at once.
+    """
+    usage = Usage()
+    token = _scopes.set((usage,) if isolated else _scopes.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _scopes.reset(token)
+
+def current_scopes():
+    """Usage scopes of the running context, to hand over to other tasks"""
+    return _scopes.get()
+
+@contextmanager
+def attach_scopes(scopes):
+    """Make requests in the block count towards scopes from another context"""
+    token = _scopes.set(scopes)
+    try:
+        yield
+    finally:
+        _scopes.reset(token)
+
+def record_response(response, model=OPENAI_MODEL):
+    """Record the usage a response reports; returns it as a Usage, or None"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return None
+    recorded = Usage.from_response(usage, model)
+    get_usage_tracker().add(recorded)
+    count("prompt_tokens", recorded.prompt_tokens)
+    count("cached_prompt_tokens", recorded.cached_tokens)
+    count("completion_tokens", recorded.completion_tokens)
+    for scope in _scopes.get():
+        scope.add(recorded)
+    return recorded
+
+def note_model(model):
+    """Count model towards the current scopes without a request
+
+    For answers reused from the cache or a near-duplicate, and streams
+    that reported no usage.
+    """
+    for scope in _scopes.get():
+        scope.models.setdefault(model, 0)
+
+class UsageTracker:
+    """Process-wide token and cost totals"""
+
+    def __init__(self):
+        self.total = Usage()
+        self.articles = 0
+        self._lock = threading.Lock()
+
+    def add(self, usage):
+        with self._lock:
+            self.total.add(usage)
+
+    def add_article(self, usage, content):
+        """Count one article analyzed by the LLM (not cached or reused)"""
+        tokens = count_tokens(content)
+        usage.content_tokens += tokens
+        with self._lock:
+            self.articles += 1
+            self.total.content_tokens += tokens
+
+    def stats(self):
+        with self._lock:
+            total, articles = self.total, self.articles
+            stats = total.to_dict()
+            stats.update(
+                articles=articles,
+                cost_per_article=total.cost / articles if articles else 0.0,
+                prompt_tokens_per_article=total.prompt_tokens / articles if articles else 0.0,
+                completion_tokens_per_article=total.completion_tokens / articles if articles else 0.0,
+                # Share of prompt tokens spent on instructions rather than article text
+                overhead_share=1 - total.content_tokens / total.prompt_tokens if total.prompt_tokens else 0.0,
+                cached_share=total.cached_tokens / total.prompt_tokens if total.prompt_tokens else 0.0,
+            )
+        return stats
+
+_tracker = UsageTracker()
+
+def get_usage_tracker():
+    """Process-wide usage totals"""
+    return _tracker
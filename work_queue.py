@@ -0,0 +1,404 @@
+"""
+Durable work queue for News Impact Analyzer backfills
+Tasks live in one SQLite file and move through stages (fetch, extract,
+analyze), each served by its own pool of worker processes, see
+queue_worker.py.
+
+- Leases: a worker takes tasks with a lease token and the task stays
+  invisible to everyone else for QUEUE_VISIBILITY_TIMEOUT seconds.
+  Workers extend leases of long-running tasks; a worker that dies simply
+  lets its leases expire and the tasks are handed out again.
+- At-least-once: completing a task and enqueueing its next stage happen
+  in one transaction, and only with a still-valid lease. A task may run
+  twice after a lease expired, never zero times. Enqueueing is
+  idempotent per (stage, key), so duplicates collapse.
+- Failures are retried after QUEUE_RETRY_DELAY, doubling per attempt,
+  until QUEUE_MAX_ATTEMPTS; then the task is marked failed.
+
+Processes on one machine open the file directly (WAL mode). Machines
+sharing it over a network filesystem need QUEUE_SHARED_FILE=true, since
+WAL does not work there; alternatively one machine runs the broker
+(QueueBroker, `python queue_worker.py serve`) and the others reach the
+queue over HTTP with QUEUE_URL.
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from environment import (
+    QUEUE_BROKER_HOST,
+    QUEUE_BROKER_PORT,
+    QUEUE_BROKER_TOKEN,
+    QUEUE_MAX_ATTEMPTS,
+    QUEUE_PATH,
+    QUEUE_RETRY_DELAY,
+    QUEUE_SHARED_FILE,
+    QUEUE_URL,
+    QUEUE_VISIBILITY_TIMEOUT,
+)
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+BUSY_TIMEOUT_MS = 30000  # Wait this long for another process's write transaction
+
+Task = namedtuple("Task", "id stage key payload body attempts lease")
+
+class WorkQueue:
+    """SQLite-backed task queue with leases and visibility timeouts"""
+
+    def __init__(self, path=QUEUE_PATH, visibility_timeout=QUEUE_VISIBILITY_TIMEOUT,
+                 max_attempts=QUEUE_MAX_ATTEMPTS, retry_delay=QUEUE_RETRY_DELAY, shared_file=QUEUE_SHARED_FILE):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=BUSY_TIMEOUT_MS / 1000)
+        self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._conn.execute("PRAGMA journal_mode=" + ("DELETE" if shared_file else "WAL"))
+        self._conn.execute("PRAGMA synchronous=" + ("FULL" if shared_file else "NORMAL"))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id INTEGER PRIMARY KEY,"
+            " stage TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " body BLOB,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " visible_at REAL NOT NULL,"  # Leasable from then on; lease expiry while leased
+            " lease TEXT,"
+            " error TEXT,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS tasks_key ON tasks(stage, key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_ready ON tasks(stage, state, visible_at)")
+
+    def _write(self, work):
+        """Run work(now) in one write transaction, taken before reading"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(time.time())
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def put(self, stage, items):
+        """Enqueue (key, payload) pairs for stage; returns how many were new"""
+        def insert(now):
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tasks (stage, key, payload, state, visible_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(stage, key, json.dumps(payload, ensure_ascii=False), PENDING, now, now) for key, payload in items]
+            )
+            return self._conn.total_changes - before
+        return self._write(insert)
+
+    def lease(self, stage, limit=1, visibility_timeout=None):
+        """Take up to limit visible tasks of stage; each comes with its lease token
+
+        Tasks whose lease expired QUEUE_MAX_ATTEMPTS times are marked
+        failed instead of being handed out again.
+        """
+        timeout = visibility_timeout or self.visibility_timeout
+
+        def take(now):
+            rows = self._conn.execute(
+                "SELECT id, key, payload, body, attempts FROM tasks"
+                " WHERE stage = ? AND state = ? AND visible_at <= ? ORDER BY visible_at LIMIT ?",
+                (stage, PENDING, now, limit)
+            ).fetchall()
+            tasks = []
+            for task_id, key, payload, body, attempts in rows:
+                if attempts >= self.max_attempts:
+                    # The body stays, so retry_failed can run the task again
+                    self._conn.execute(
+                        "UPDATE tasks SET state = ?, lease = NULL, updated_at = ?,"
+                        " error = COALESCE(error, 'Lease expired on every attempt') WHERE id = ?",
+                        (FAILED, now, task_id)
+                    )
+                    continue
+                lease = uuid.uuid4().hex
+                self._conn.execute(
+                    "UPDATE tasks SET attempts = attempts + 1, visible_at = ?, lease = ?, updated_at = ? WHERE id = ?",
+                    (now + timeout, lease, now, task_id)
+                )
+                tasks.append(Task(task_id, stage, key, json.loads(payload), body, attempts + 1, lease))
+            return tasks
+        return self._write(take)
+
+    def extend(self, task_id, lease, visibility_timeout=None):
+        """Push back the visibility timeout of a leased task; False once the lease is lost"""
+        timeout = visibility_timeout or self.visibility_timeout
+        with self._lock:
+            now = time.time()
+            cursor = self._conn.execute(
+                "UPDATE tasks SET visible_at = ?, updated_at = ? WHERE id = ? AND lease = ? AND state = ?",
+                (now + timeout, now, task_id, lease, PENDING)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, lease, result=None, next_stage=None, payload=None, body=None):
+        """Finish a leased task, optionally handing payload/body on to next_stage
+
+        result replaces the stored payload (kept for export). Returns False,
+        changing nothing, when the lease was lost to another worker.
+        """
+        def finish(now):
+            row = self._conn.execute(
+                "SELECT key, payload FROM tasks WHERE id = ? AND lease = ? AND state = ?", (task_id, lease, PENDING)
+            ).fetchone()
+            if row is None:
+                return False
+            key, stored = row
+            self._conn.execute(
+                "UPDATE tasks SET state = ?, payload = ?, body = NULL, lease = NULL, error = NULL, updated_at = ?"
+                " WHERE id = ?",
+                (DONE, stored if result is None else json.dumps(result, ensure_ascii=False), now, task_id)
+            )
+            if next_stage is not None:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO tasks (stage, key, payload, body, state, visible_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (next_stage, key, json.dumps(payload, ensure_ascii=False), body, PENDING, now, now)
+                )
+            return True
+        return self._write(finish)
+
+    def fail(self, task_id, lease, error, retry=True):
+        """Give a leased task back for a later retry, or mark it failed
+
+        Returns False when the lease was lost to another worker.
+        """
+        def release(now):
+            row = self._conn.execute(
+                "SELECT attempts FROM tasks WHERE id = ? AND lease = ? AND state = ?", (task_id, lease, PENDING)
+            ).fetchone()
+            if row is None:
+                return False
+            if retry and row[0] < self.max_attempts:
+                delay = self.retry_delay * 2 ** (row[0] - 1)
+                self._conn.execute(
+                    "UPDATE tasks SET visible_at = ?, lease = NULL, error = ?, updated_at = ? WHERE id = ?",
+                    (now + delay, str(error), now, task_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE tasks SET state = ?, lease = NULL, error = ?, updated_at = ? WHERE id = ?",
+                    (FAILED, str(error), now, task_id)
+                )
+            return True
+        return self._write(release)
+
+    def retry_failed(self, stage=None):
+        """Put failed tasks back in the queue with fresh attempts; returns how many"""
+        def requeue(now):
+            query = "UPDATE tasks SET state = ?, attempts = 0, visible_at = ?, updated_at = ? WHERE state = ?"
+            params = [PENDING, now, now, FAILED]
+            if stage:
+                query += " AND stage = ?"
+                params.append(stage)
+            return self._conn.execute(query, params).rowcount
+        return self._write(requeue)
+
+    def pending(self, stages):
+        """Pending (queued or leased) tasks across stages"""
+        marks = ",".join("?" * len(stages))
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM tasks WHERE state = ? AND stage IN ({marks})", (PENDING, *stages)
+            ).fetchone()[0]
+
+    def results(self, stage, after_id=0, limit=1000):
+        """(id, stored payload) of done tasks of stage, in id order after after_id"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM tasks WHERE stage = ? AND state = ? AND id > ? ORDER BY id LIMIT ?",
+                (stage, DONE, after_id, limit)
+            ).fetchall()
+        return [(task_id, json.loads(payload)) for task_id, payload in rows]
+
+    def failures(self, stage=None):
+        """(stage, key, error) of failed tasks"""
+        query, params = "SELECT stage, key, error FROM tasks WHERE state = ?", [FAILED]
+        if stage:
+            query += " AND stage = ?"
+            params.append(stage)
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(query + " ORDER BY id", params)]
+
+    def stats(self):
+        """Tasks per stage: queued, leased, done and failed"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, state, lease IS NOT NULL AND visible_at > ?, COUNT(*) FROM tasks GROUP BY 1, 2, 3",
+                (now,)
+            ).fetchall()
+        stats = {}
+        for stage, state, leased, tasks in rows:
+            counts = stats.setdefault(stage, {"queued": 0, "leased": 0, DONE: 0, FAILED: 0})
+            name = state if state != PENDING else ("leased" if leased else "queued")
+            counts[name] += tasks
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _encode(value):
+    """JSON-safe form of queue arguments and results (bytes as base64)"""
+    if isinstance(value, bytes):
+        return {"$bytes": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, Task):
+        return {"$task": [_encode(field) for field in value]}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    return value
+
+def _decode(value):
+    if isinstance(value, dict) and "$bytes" in value:
+        return base64.b64decode(value["$bytes"])
+    if isinstance(value, dict) and "$task" in value:
+        return Task(*(_decode(field) for field in value["$task"]))
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _decode(item) for key, item in value.items()}
+    return value
+
+BROKER_METHODS = ("put", "lease", "extend", "complete", "fail", "retry_failed", "pending", "results", "failures", "stats")
+
+class _BrokerHandler(BaseHTTPRequestHandler):
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        broker = self.server.broker
+        if broker.token and self.headers.get("Authorization") != f"Bearer {broker.token}":
+            self._send(401, {"error": "Invalid or missing bearer token"})
+            return
+        method = self.path.strip("/")
+        if method not in BROKER_METHODS:
+            self._send(404, {"error": f"Unknown method {method}"})
+            return
+        try:
+            kwargs = _decode(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0)))))
+            result = getattr(broker.queue, method)(**kwargs)
+        except (TypeError, ValueError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        except Exception as e:  # E.g. a busy database, the worker backs off and asks again
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._send(200, {"result": _encode(result)})
+
+    def log_message(self, format, *args):
+        pass  # One line per lease would drown the console
+
+class QueueBroker:
+    """Serves a WorkQueue over HTTP so workers on other machines can share it"""
+
+    def __init__(self, queue, host=QUEUE_BROKER_HOST, port=QUEUE_BROKER_PORT, token=QUEUE_BROKER_TOKEN):
+        self.queue = queue
+        self.token = token
+        self._httpd = ThreadingHTTPServer((host, port), _BrokerHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.broker = self
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        """Serve from a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+class RemoteQueue:
+    """WorkQueue interface backed by a QueueBroker"""
+
+    def __init__(self, url=QUEUE_URL, token=QUEUE_BROKER_TOKEN):
+        import httpx
+
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._http = httpx.Client(base_url=url.rstrip("/"), headers=headers, timeout=BUSY_TIMEOUT_MS / 1000 + 30)
+        self._lock = threading.Lock()
+
+    def _call(self, method, **kwargs):
+        with self._lock:  # httpx.Client is not safe to share across threads
+            response = self._http.post(f"/{method}", json=_encode(kwargs))
+        if response.status_code != 200:
+            raise RuntimeError(f"Queue broker {method} failed: {response.json().get('error', response.text)}")
+        return _decode(response.json()["result"])
+
+    def put(self, stage, items):
+        return self._call("put", stage=stage, items=[list(item) for item in items])
+
+    def lease(self, stage, limit=1, visibility_timeout=None):
+        return self._call("lease", stage=stage, limit=limit, visibility_timeout=visibility_timeout)
+
+    def extend(self, task_id, lease, visibility_timeout=None):
+        return self._call("extend", task_id=task_id, lease=lease, visibility_timeout=visibility_timeout)
+
+    def complete(self, task_id, lease, result=None, next_stage=None, payload=None, body=None):
+        return self._call("complete", task_id=task_id, lease=lease, result=result, next_stage=next_stage,
+                          payload=payload, body=body)
+
+    def fail(self, task_id, lease, error, retry=True):
+        return self._call("fail", task_id=task_id, lease=lease, error=error, retry=retry)
+
+    def retry_failed(self, stage=None):
+        return self._call("retry_failed", stage=stage)
+
+    def pending(self, stages):
+        return self._call("pending", stages=list(stages))
+
+    def results(self, stage, after_id=0, limit=1000):
+        return self._call("results", stage=stage, after_id=after_id, limit=limit)
+
+    def failures(self, stage=None):
+        return self._call("failures", stage=stage)
+
+    def stats(self):
+        return self._call("stats")
+
+    def close(self):
+        self._http.close()
+
+def open_queue(url=QUEUE_URL, path=QUEUE_PATH):
+    """RemoteQueue for a broker url, otherwise the WorkQueue file at path"""
+    return RemoteQueue(url) if url else WorkQueue(path)